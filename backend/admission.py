@@ -0,0 +1,371 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+from fastapi import APIRouter
+
+# Client budget for a request, in milliseconds; tightens the route's own queueing deadline
+DEADLINE_HEADER = b'x-request-deadline-ms'
+
+# Routes gated by default: path -> (concurrency, queue size, max queue wait ms, cached response TTL s)
+DEFAULT_LIMITS = {
+    '/api/analyze-traffic': (8, 64, 250, 30),
+    '/api/analyze-traffic/batch': (2, 8, 1000, 0),
+    '/api/analyze-urban-area': (4, 16, 500, 300),
+    '/api/scenarios/simulate': (1, 4, 2000, 0)
+}
+
+# Route whose requests MicroBatcher (TRAFFIC_BATCHING=1) groups into batches
+BATCHED_ROUTE = '/api/analyze-traffic'
+
+# Responses larger than this are not kept for degraded answers
+CACHE_MAX_BYTES = 256 * 1024
+
+
+class Rejected(Exception):
+    def __init__(self, status_code, reason, retry_after):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class ResponseCache:
+    """Recent successful responses of a route by request key, served stale when the route sheds load"""
+
+    def __init__(self, ttl, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, headers, body):
+        self._entries[key] = (time.monotonic(), headers, body)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RouteGate:
+    """
+    Concurrency limit with a bounded FIFO queue for one route.
+
+    Up to ``concurrency`` requests run at once and up to ``queue_size`` wait.
+    A request is turned away immediately with 429 when the queue is full, and
+    with 503 when the expected wait (queue position times the recent mean
+    service time) already exceeds its deadline; a queued request that reaches
+    its deadline is dropped with 503 as well. Rejections carry a Retry-After
+    estimate of when the backlog will have drained.
+    """
+
+    def __init__(self, path, concurrency, queue_size, max_wait_ms, cache_ttl=0, window=10000):
+        self.path = path
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.max_wait = max_wait_ms / 1000
+        self.cache = ResponseCache(cache_ttl) if cache_ttl > 0 else None
+        self.active = 0
+        self._waiters = deque()
+        # Exponentially weighted mean service time, seeded low so a cold route admits freely
+        self.service_time = 0.01
+
+        # Statistics, timings kept for the most recent `window` requests
+        self.admitted = 0
+        self.queued = 0
+        self.rejected_full = 0
+        self.rejected_deadline = 0
+        self.expired = 0
+        self.degraded = 0
+        self._queue_waits = deque(maxlen=window)
+        self._service_times = deque(maxlen=window)
+
+    def expected_wait(self, position):
+        """Seconds until a request ``position`` places back in the queue gets a slot"""
+        return position / self.concurrency * self.service_time
+
+    def retry_after(self):
+        return max(1, math.ceil(self.expected_wait(len(self._waiters) + self.active)))
+
+    async def acquire(self, deadline):
+        """Wait for a slot within ``deadline`` seconds; returns the time spent queued"""
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            self._queue_waits.append(0.0)
+            return 0.0
+        if len(self._waiters) >= self.queue_size:
+            self.rejected_full += 1
+            raise Rejected(429, f"{self.path} queue is full", self.retry_after())
+        if self.expected_wait(len(self._waiters) + 1) > deadline:
+            self.rejected_deadline += 1
+            raise Rejected(503, f"{self.path} cannot start within the deadline", self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), deadline)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done():
+                # The slot was handed over just as the wait ended; give it back
+                self.release(0.0, record=False)
+            else:
+                self._waiters.remove(waiter)
+                waiter.cancel()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.expired += 1
+            raise Rejected(503, f"{self.path} queue wait exceeded the deadline", self.retry_after())
+        waited = time.perf_counter() - started
+        self.admitted += 1
+        self._queue_waits.append(waited)
+        return waited
+
+    def release(self, service_time, record=True):
+        """Free a slot, handing it straight to the oldest waiter"""
+        if record:
+            self.service_time += 0.2 * (service_time - self.service_time)
+            self._service_times.append(service_time)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # The slot moves to the waiter; active stays the same
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self):
+        def percentiles(values):
+            if not values:
+                return {}
+            values = np.asarray(values) * 1000
+            return {f'p{q}': float(np.percentile(values, q)) for q in (50, 90, 99)}
+
+        return {
+            'concurrency': self.concurrency,
+            'queue_size': self.queue_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'active': self.active,
+            'queue_depth': len(self._waiters),
+            'admitted': self.admitted,
+            'queued': self.queued,
+            'rejected_queue_full': self.rejected_full,
+            'rejected_deadline': self.rejected_deadline,
+            'expired_in_queue': self.expired,
+            'degraded': self.degraded,
+            'cached_responses': len(self.cache) if self.cache is not None else None,
+            'mean_service_ms': self.service_time * 1000,
+            'queue_wait_ms': percentiles(self._queue_waits),
+            'service_ms': percentiles(self._service_times)
+        }
+
+
+def parse_limits(spec):
+    """``path=concurrency:queue:max_wait_ms[:cache_ttl_s],...`` into {path: limits}"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        path, _, values = item.partition('=')
+        numbers = [float(v) for v in values.split(':')]
+        if len(numbers) not in (3, 4):
+            raise ValueError(f"Expected path=concurrency:queue:max_wait_ms[:cache_ttl], got {item}")
+        concurrency, queue_size = int(numbers[0]), int(numbers[1])
+        limits[path] = (concurrency, queue_size, numbers[2], numbers[3] if len(numbers) == 4 else 0)
+    return limits
+
+
+def batched_concurrency():
+    """
+    Requests BATCHED_ROUTE has to admit at once for every batching worker to
+    get a full batch (TRAFFIC_BATCH_MAX_SIZE x TRAFFIC_BATCH_WORKERS), or 0
+    when batching is off
+    """
+    if os.environ.get('TRAFFIC_BATCHING', '').lower() not in ('1', 'true', 'yes'):
+        return 0
+    max_batch_size = int(os.environ.get('TRAFFIC_BATCH_MAX_SIZE', 64))
+    return max_batch_size * max(int(os.environ.get('TRAFFIC_BATCH_WORKERS', 2)), 1)
+
+
+class AdmissionController:
+    """The gates of all limited routes, keyed by path"""
+
+    def __init__(self, limits=None, enabled=True):
+        self.enabled = enabled
+        self.gates = {path: RouteGate(path, *values) for path, values in (limits or {}).items()}
+
+    @classmethod
+    def from_env(cls):
+        """
+        DEFAULT_LIMITS overridden per path by ADMISSION_LIMITS; ADMISSION_ENABLED=0 turns gating off.
+        With batching on, the batched route's default concurrency is raised to batched_concurrency(),
+        since requests held back at the gate never reach the batcher
+        """
+        limits = dict(DEFAULT_LIMITS)
+        batched = batched_concurrency()
+        concurrency, *rest = limits[BATCHED_ROUTE]
+        limits[BATCHED_ROUTE] = (max(concurrency, batched), *rest)
+        overrides = parse_limits(os.environ.get('ADMISSION_LIMITS', ''))
+        if BATCHED_ROUTE in overrides and overrides[BATCHED_ROUTE][0] < batched:
+            print(f"Warning: ADMISSION_LIMITS admits {overrides[BATCHED_ROUTE][0]} concurrent {BATCHED_ROUTE} "
+                  f"requests, fewer than the {batched} needed to fill the traffic batches")
+        limits.update(overrides)
+        enabled = os.environ.get('ADMISSION_ENABLED', '1').lower() not in ('0', 'false', 'no')
+        return cls(limits, enabled)
+
+    def gate(self, path):
+        return self.gates.get(path) if self.enabled else None
+
+    def stats(self):
+        return {'enabled': self.enabled, 'routes': {path: gate.stats() for path, gate in self.gates.items()}}
+
+
+def _deadline(gate, scope):
+    for name, value in scope.get('headers', ()):
+        if name == DEADLINE_HEADER:
+            try:
+                return max(0.0, min(gate.max_wait, float(value) / 1000))
+            except ValueError:
+                break
+    return gate.max_wait
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware putting the limited routes behind their RouteGate.
+
+    Requests to other paths pass straight through. When a gate rejects a
+    request and the route keeps cached responses, the last successful
+    response to an identical request (same tenant, query and body) is
+    returned instead, marked ``X-Degraded: cached``; otherwise the client
+    gets the 429/503 with ``Retry-After``.
+    """
+
+    def __init__(self, app, controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        gate = self.controller.gate(scope['path']) if scope['type'] == 'http' else None
+        if gate is None:
+            await self.app(scope, receive, send)
+            return
+
+        key = None
+        if gate.cache is not None:
+            body = await _read_body(receive)
+            # Everything the response can depend on, including its negotiated format and encoding
+            headers = dict(scope['headers'])
+            key = hashlib.sha1(b'\0'.join([
+                str(scope.get('tenant_id')).encode(), scope.get('query_string', b''), body,
+                *(headers.get(name, b'') for name in (b'x-tenant-id', b'accept', b'accept-encoding'))
+            ])).hexdigest()
+            receive = _replay(body, receive)
+
+        try:
+            await gate.acquire(_deadline(gate, scope))
+        except Rejected as rejected:
+            cached = gate.cache.get(key) if key is not None else None
+            if cached is not None:
+                gate.degraded += 1
+                await _send_cached(send, cached)
+            else:
+                await _send_rejection(send, rejected)
+            return
+
+        captured = _Capture(send) if key is not None else None
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, captured.send if captured is not None else send)
+        finally:
+            gate.release(time.perf_counter() - started)
+        if captured is not None and captured.cacheable:
+            gate.cache.put(key, captured.headers, b''.join(captured.body))
+
+
+def _replay(body, receive):
+    sent = False
+
+    async def replayed():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        return await receive()
+    return replayed
+
+
+class _Capture:
+    """Forwards a response while keeping a copy of small successful ones"""
+
+    def __init__(self, send):
+        self._send = send
+        self.headers = None
+        self.body = []
+        self.size = 0
+        self.cacheable = False
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            self.cacheable = message['status'] == 200
+            self.headers = [(name, value) for name, value in message.get('headers', [])
+                            if name.lower() != b'content-length']
+        elif message['type'] == 'http.response.body' and self.cacheable:
+            self.body.append(message.get('body', b''))
+            self.size += len(self.body[-1])
+            if self.size > CACHE_MAX_BYTES:
+                self.cacheable = False
+                self.body = []
+        await self._send(message)
+
+
+async def _send_cached(send, cached):
+    stored_at, headers, body = cached
+    headers = headers + [(b'content-length', str(len(body)).encode()), (b'x-degraded', b'cached'),
+                         (b'age', str(int(time.monotonic() - stored_at)).encode())]
+    await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _send_rejection(send, rejected):
+    body = json.dumps({'detail': rejected.reason}).encode()
+    await send({'type': 'http.response.start', 'status': rejected.status_code, 'headers': [
+        (b'content-type', b'application/json'),
+        (b'content-length', str(len(body)).encode()),
+        (b'retry-after', str(rejected.retry_after).encode())
+    ]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+admission_controller = AdmissionController.from_env()
+router = APIRouter()
+
+
+@router.get("/api/admission/stats")
+async def get_admission_stats():
+    return admission_controller.stats()
@@ -0,0 +1,632 @@
+"""
+Load test of the API served by a real uvicorn process, driven by a
+synthetic sensor feed.
+
+Run from the backend directory:
+
+    python -m benchmarks.load_test                                  # this tree, 20 rps for 30 s
+    python -m benchmarks.load_test --rps 200 --concurrency 64 --duration 60 --workers 2
+    python -m benchmarks.load_test --rps 0 --concurrency 16         # closed loop, as fast as it answers
+    python -m benchmarks.load_test --routes analyze-traffic,observations --output run.json
+    python -m benchmarks.load_test --revisions HEAD~5 WORKTREE --output comparison.json
+    python -m benchmarks.load_test --compare-reports before.json after.json
+
+Each target is served from a scratch copy: ``WORKTREE`` copies this backend
+directory (uncommitted and untracked files included), any other name is a
+git revision exported with ``git archive``. Requests, the sensor rows in
+them and their order come from one seeded generator, so two targets see the
+same load. Latency is measured from each request's scheduled start, so a
+server that falls behind is not hidden by the client waiting for it.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from benchmarks.run_benchmarks import ROUTE_SAMPLES, environment_info
+from ml.trafficanalysis.create_traffic_dataset import create_synthetic_traffic_data
+
+WORKTREE = 'WORKTREE'
+
+# Share of the request mix per route; routes not listed get DEFAULT_WEIGHT
+ROUTE_WEIGHTS = {
+    ('POST', '/api/analyze-traffic'): 30,
+    ('POST', '/api/traffic-observations'): 15,
+    ('POST', '/api/analyze-traffic/batch'): 5,
+    ('POST', '/api/predict-traffic'): 5,
+    ('POST', '/api/road-network/congestion'): 5,
+    ('POST', '/api/route'): 5,
+    ('POST', '/api/analyze-urban-area'): 5,
+    ('POST', '/api/urban-zones/query'): 5,
+    ('GET', '/api/sustainability-metrics'): 4,
+    ('GET', '/api/sustainability-recommendations'): 2,
+    ('GET', '/api/hourly-distribution'): 3,
+    ('GET', '/api/historical-accuracy'): 3,
+}
+DEFAULT_WEIGHT = 1
+
+# Routes the benchmarks leave out because they write to disk; harmless against a scratch copy
+WRITE_ROUTES = {('POST', '/api/traffic-observations')}
+
+# Scratch copies leave out caches and anything a run writes
+COPY_IGNORE = shutil.ignore_patterns('__pycache__', '*.pyc', 'profiles', 'tenants', 'build', 'reports',
+                                     'observations.csv', 'suggestions.npz')
+
+# Sensor rows drawn from, and rows per batch request
+FEED_ROWS = 10_000
+BATCH_ROWS = 64
+
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+class SensorFeed:
+    """
+    Seeded stream of API requests carrying synthetic sensor readings.
+
+    Readings are rows of ``create_synthetic_traffic_data`` (same hour, day,
+    vehicle count, weather and road type distributions the model was trained
+    on); road network, route and zone requests pick nodes, areas and viewports
+    from the shipped data. Routes without a generator replay their
+    ``ROUTE_SAMPLES`` entry.
+    """
+
+    def __init__(self, routes, seed=0, weights=None):
+        self.routes = list(routes)
+        self.seed = seed
+        weights = dict(ROUTE_WEIGHTS, **(weights or {}))
+        self.weights = np.array([weights.get(route, DEFAULT_WEIGHT) for route in self.routes], dtype=np.float64)
+        self.weights /= self.weights.sum()
+
+        self.readings = create_synthetic_traffic_data(num_samples=FEED_ROWS)
+        self.nodes = pd.read_csv(os.path.join(BACKEND_DIR, 'ml', 'roadnetwork', 'nodes.csv'))['node_id'].to_numpy()
+        zones = pd.read_csv(os.path.join(BACKEND_DIR, 'ml', 'urban_analysis', 'zones.csv'))
+        self.areas = sorted(set(zones['area_type'])) + ['downtown'] + zones['name'].tolist()[:50]
+        self.extent = (zones['min_x'].min(), zones['min_y'].min(), zones['max_x'].max(), zones['max_y'].max())
+        self._builders = {
+            ('POST', '/api/analyze-traffic'): lambda rng: {'json': self._features(rng)},
+            ('POST', '/api/analyze-traffic/batch'): self._batch,
+            ('POST', '/api/traffic-observations'): self._observations,
+            ('POST', '/api/predict-traffic'): lambda rng: {'json': {
+                'location': str(rng.choice(['downtown', 'suburbs', 'industrial', 'harbour'])),
+                'timeframe': str(rng.choice(['1-hour', '6-hours', '24-hours'])),
+                'features': self._features(rng) if rng.random() < 0.5 else None}},
+            ('POST', '/api/road-network/congestion'): self._congestion,
+            ('POST', '/api/route'): self._route,
+            ('POST', '/api/analyze-urban-area'): lambda rng: {'json': {
+                'area': str(rng.choice(self.areas)), 'include_suggestions': bool(rng.random() < 0.5)}},
+            ('POST', '/api/urban-zones/query'): self._viewport,
+        }
+
+    def _row(self, rng):
+        return self.readings.iloc[int(rng.integers(len(self.readings)))]
+
+    def _features(self, rng, row=None):
+        row = self._row(rng) if row is None else row
+        return {column: int(row[column])
+                for column in ('time_of_day', 'day_of_week', 'vehicle_count', 'weather_condition', 'road_type')}
+
+    def _batch(self, rng):
+        start = int(rng.integers(len(self.readings) - BATCH_ROWS))
+        rows = self.readings.iloc[start:start + BATCH_ROWS]
+        return {'json': {'items': [self._features(rng, row) for _, row in rows.iterrows()]}}
+
+    def _observations(self, rng):
+        # A sensor reports a few readings at a time
+        items = []
+        for _ in range(int(rng.integers(1, 9))):
+            row = self._row(rng)
+            items.append(dict(self._features(rng, row), congestion_level=float(row['congestion_level'])))
+        return {'json': {'items': items}}
+
+    def _congestion(self, rng):
+        row = self._row(rng)
+        return {'json': {'node_id': int(rng.choice(self.nodes)), 'hops': int(rng.integers(1, 4)),
+                         'time_of_day': int(row['time_of_day']), 'day_of_week': int(row['day_of_week']),
+                         'weather_condition': int(row['weather_condition'])}}
+
+    def _route(self, rng):
+        row = self._row(rng)
+        origin, destination = (int(node) for node in rng.choice(self.nodes, 2, replace=False))
+        return {'json': {'origin': origin, 'destination': destination,
+                         'departure_hour': int(row['time_of_day']), 'day_of_week': int(row['day_of_week']),
+                         'weather_condition': int(row['weather_condition'])}}
+
+    def _viewport(self, rng):
+        min_x, min_y, max_x, max_y = self.extent
+        width = rng.uniform(0.05, 0.3) * (max_x - min_x)
+        height = rng.uniform(0.05, 0.3) * (max_y - min_y)
+        x = rng.uniform(min_x, max_x - width)
+        y = rng.uniform(min_y, max_y - height)
+        return {'json': {'min_x': float(x), 'min_y': float(y), 'max_x': float(x + width), 'max_y': float(y + height),
+                         'include_zones': bool(rng.random() < 0.5)}}
+
+    def request(self, route, rng):
+        """Request kwargs for one call of ``route``"""
+        builder = self._builders.get(route)
+        return builder(rng) if builder is not None else dict(ROUTE_SAMPLES.get(route) or {})
+
+    def requests(self):
+        """Endless (route index, method, path, request kwargs), the same sequence for the same seed"""
+        rng = np.random.default_rng(self.seed)
+        while True:
+            for index in rng.choice(len(self.routes), size=1024, p=self.weights):
+                method, path = self.routes[index]
+                yield int(index), method, path, self.request((method, path), rng)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def prepare_target(target, directory):
+    """A scratch backend directory for ``target``, with the revision it came from"""
+    if target == WORKTREE:
+        destination = os.path.join(directory, 'backend')
+        shutil.copytree(BACKEND_DIR, destination, ignore=COPY_IGNORE)
+        revision = environment_info()['revision']
+        return destination, f'{revision}+worktree' if revision else WORKTREE
+    revision = subprocess.run(['git', 'rev-parse', '--short', f'{target}^{{commit}}'], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    prefix = subprocess.run(['git', 'rev-parse', '--show-prefix'], cwd=BACKEND_DIR,
+                            capture_output=True, text=True, check=True).stdout.strip()
+    toplevel = subprocess.run(['git', 'rev-parse', '--show-toplevel'], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    archive = subprocess.run(['git', 'archive', '--format=tar', revision, prefix], cwd=toplevel,
+                             capture_output=True, check=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        # Only regular members inside the directory, where tarfile can enforce it
+        tar.extractall(directory, **({'filter': 'data'} if hasattr(tarfile, 'data_filter') else {}))
+    return os.path.join(directory, prefix), revision
+
+
+class ServerProcess:
+    """``uvicorn main:app`` for a backend directory, on a free local port"""
+
+    def __init__(self, backend_dir, workers=1, env=None):
+        self.backend_dir = backend_dir
+        self.workers = workers
+        self.port = _free_port()
+        self.url = f'http://127.0.0.1:{self.port}'
+        self.env = dict(os.environ, **(env or {}))
+        self.env.pop('PYTHONPATH', None)
+        self.log_path = os.path.join(backend_dir, 'load_test_server.log')
+        self.process = None
+
+    def start(self, timeout=180):
+        """Start the server and wait until it answers"""
+        import httpx
+
+        log = open(self.log_path, 'w')
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', str(self.port),
+             '--workers', str(self.workers), '--log-level', 'warning'],
+            cwd=self.backend_dir, env=self.env, stdout=log, stderr=subprocess.STDOUT)
+        log.close()
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Server exited with status {self.process.returncode}:\n{self.log_tail()}")
+            try:
+                if httpx.get(f'{self.url}/openapi.json', timeout=2).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.5)
+        self.stop()
+        raise RuntimeError(f"Server did not answer within {timeout}s:\n{self.log_tail()}")
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+
+    def log_tail(self, lines=40):
+        with open(self.log_path) as f:
+            return ''.join(f.readlines()[-lines:])
+
+    def routes(self):
+        """(method, path) of every API route the server exposes, from its OpenAPI schema"""
+        import httpx
+
+        schema = httpx.get(f'{self.url}/openapi.json', timeout=10).json()
+        return sorted((method.upper(), path) for path, operations in schema['paths'].items()
+                      for method in operations)
+
+
+def _process_tree(root):
+    """``root`` and all its descendants"""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    # The command name may contain spaces; fields resume after its closing parenthesis
+                    ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+    tree, pending = [], [root]
+    while pending:
+        pid = pending.pop()
+        tree.append(pid)
+        pending.extend(children.get(pid, ()))
+    return tree
+
+
+def _cpu_and_rss(pid):
+    """(CPU seconds, resident bytes) of one process"""
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    with open(f'/proc/{pid}/statm') as f:
+        resident_pages = int(f.read().split()[1])
+    # utime and stime are fields 14 and 15 of stat, 12 and 13 after the name
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS, resident_pages * PAGE_SIZE
+
+
+class ResourceSampler:
+    """
+    CPU and resident memory of a server and its worker processes over time,
+    read from /proc every ``interval`` seconds on a background thread
+    """
+
+    def __init__(self, pid, interval=0.5):
+        self.pid = pid
+        self.interval = interval
+        self.available = os.path.exists(f'/proc/{pid}/stat')
+        self.samples = []
+        self._cpu = {}
+        self._started = self._last = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if not self.available:
+            print("Warning: /proc is unavailable; CPU and memory will not be recorded", file=sys.stderr)
+            return
+        self._started = time.perf_counter()
+        self._sample(record=False)
+        self._thread = threading.Thread(target=self._run, name='resource-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self, record=True):
+        now = time.perf_counter()
+        cpu_seconds, rss, processes = 0.0, 0, 0
+        current = {}
+        for pid in _process_tree(self.pid):
+            try:
+                cpu, resident = _cpu_and_rss(pid)
+            except (OSError, IndexError, ValueError):
+                continue
+            current[pid] = cpu
+            # Only CPU spent since the last sample; a new process counts from zero
+            cpu_seconds += cpu - self._cpu.get(pid, 0.0)
+            rss += resident
+            processes += 1
+        if record:
+            elapsed = now - self._last
+            self.samples.append({
+                't': round(now - self._started, 3),
+                'cpu_percent': 100 * cpu_seconds / elapsed if elapsed > 0 else 0.0,
+                'rss_mb': rss / (1 << 20),
+                'processes': processes
+            })
+        self._cpu = current
+        self._last = now
+
+    def summary(self):
+        if not self.samples:
+            return {'samples': []}
+        cpu = np.array([s['cpu_percent'] for s in self.samples])
+        rss = np.array([s['rss_mb'] for s in self.samples])
+        return {
+            'cpu_percent': {'mean': float(cpu.mean()), 'p90': float(np.percentile(cpu, 90)), 'max': float(cpu.max())},
+            'rss_mb': {'mean': float(rss.mean()), 'max': float(rss.max()), 'last': float(rss[-1])},
+            'samples': self.samples
+        }
+
+
+async def drive(url, feed, rps, concurrency, duration, timeout=10.0):
+    """
+    Send the feed's requests for ``duration`` seconds: ``rps`` per second on a
+    fixed schedule with at most ``concurrency`` in flight, or with ``rps=0``
+    from ``concurrency`` clients that each send the next request as soon as
+    the previous one is answered. Returns one record per request.
+    """
+    import httpx
+
+    records = []
+    requests = feed.requests()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        started = time.perf_counter()
+
+        async def send(index, method, path, kwargs, scheduled):
+            sent = time.perf_counter()
+            try:
+                status = (await client.request(method, path, **kwargs)).status_code
+            except httpx.HTTPError:
+                status = 0
+            finished = time.perf_counter()
+            records.append((index, scheduled - started, finished - started, finished - scheduled,
+                            finished - sent, status))
+
+        if rps > 0:
+            slots = asyncio.Semaphore(concurrency)
+            pending = set()
+
+            async def scheduled_send(request, scheduled):
+                try:
+                    await send(*request, scheduled)
+                finally:
+                    slots.release()
+
+            for i, request in enumerate(requests):
+                scheduled = started + i / rps
+                if scheduled - started >= duration:
+                    break
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await slots.acquire()
+                task = asyncio.create_task(scheduled_send(request, scheduled))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            await asyncio.gather(*pending)
+        else:
+            async def client_loop():
+                while time.perf_counter() - started < duration:
+                    await send(*next(requests), time.perf_counter())
+            await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    return records
+
+
+def _latencies(values):
+    if len(values) == 0:
+        return {}
+    values = np.asarray(values) * 1000
+    summary = {f'p{q}': float(np.percentile(values, q)) for q in (50, 90, 99)}
+    summary.update(mean=float(values.mean()), max=float(values.max()))
+    return summary
+
+
+def summarize(records, routes, duration):
+    """Overall, per-route and per-second latency and error figures of a run"""
+    if not records:
+        return {'summary': {'requests': 0}, 'routes': {}, 'timeline': []}
+    index, _, finished, latency, service, status = (np.array(column) for column in zip(*records))
+    errors = (status == 0) | (status >= 400)
+
+    def block(mask):
+        codes, counts = np.unique(status[mask], return_counts=True)
+        return {
+            'requests': int(mask.sum()),
+            'errors': int(errors[mask].sum()),
+            'error_rate': float(errors[mask].mean()) if mask.any() else 0.0,
+            'rps': float(mask.sum() / duration),
+            'status_codes': {str(code): int(count) for code, count in zip(codes, counts)},
+            'latency_ms': _latencies(latency[mask]),
+            'service_ms': _latencies(service[mask])
+        }
+
+    second = finished.astype(np.int64)
+    timeline = []
+    for t in range(int(second.max()) + 1):
+        mask = second == t
+        timeline.append({'t': t, 'requests': int(mask.sum()), 'errors': int(errors[mask].sum()),
+                         'latency_ms': _latencies(latency[mask])})
+    return {
+        'summary': block(np.ones(len(records), dtype=bool)),
+        'routes': {f'{method} {path}': block(index == i) for i, (method, path) in enumerate(routes)
+                   if (index == i).any()},
+        'timeline': timeline
+    }
+
+
+def select_routes(available, patterns=None):
+    """The routes to load: every route the server has a request for, optionally filtered by substrings"""
+    routes = [route for route in available
+              if '{' not in route[1] and (ROUTE_SAMPLES.get(route) is not None or route in WRITE_ROUTES)]
+    if patterns:
+        routes = [route for route in routes if any(p in route[1] for p in patterns)]
+    return routes
+
+
+def discover_routes(backend_dir):
+    """The routes a backend directory serves, from a short-lived server"""
+    server = ServerProcess(backend_dir)
+    server.start()
+    try:
+        return server.routes()
+    finally:
+        server.stop()
+
+
+def run_target(target, backend_dir, revision, args, routes=None):
+    """Serve a prepared backend directory, prime every route, load it and report"""
+    print(f"[load] {target} ({revision}): starting {args.workers} worker(s)", file=sys.stderr)
+    server = ServerProcess(backend_dir, workers=args.workers)
+    server.start()
+    try:
+        routes = [route for route in select_routes(server.routes(), args.routes)
+                  if routes is None or route in routes]
+        feed = SensorFeed(routes, seed=args.seed)
+        # One call per route first, so lazy loads are not part of the numbers
+        for route in routes:
+            asyncio.run(_prime(server.url, feed, route))
+        if args.warmup > 0:
+            asyncio.run(drive(server.url, SensorFeed(routes, seed=args.seed + 1), args.rps,
+                              args.concurrency, args.warmup, args.timeout))
+
+        sampler = ResourceSampler(server.process.pid, args.sample_interval)
+        sampler.start()
+        print(f"[load] {len(routes)} routes, rps={args.rps or 'max'} concurrency={args.concurrency} "
+              f"for {args.duration}s", file=sys.stderr)
+        records = asyncio.run(drive(server.url, feed, args.rps, args.concurrency, args.duration, args.timeout))
+        sampler.stop()
+    finally:
+        server.stop()
+
+    report = summarize(records, routes, args.duration)
+    report['resources'] = sampler.summary()
+    report['target'] = {'name': target, 'revision': revision}
+    report['config'] = {key: getattr(args, key) for key in
+                        ('rps', 'concurrency', 'duration', 'warmup', 'workers', 'seed', 'timeout', 'routes')}
+    report['environment'] = environment_info()
+    return report
+
+
+async def _prime(url, feed, route):
+    import httpx
+
+    async with httpx.AsyncClient(base_url=url, timeout=120) as client:
+        try:
+            await client.request(*route, **feed.request(route, np.random.default_rng(0)))
+        except httpx.HTTPError:
+            pass
+
+
+def _ratio(before, after):
+    return after / before if before else float('nan')
+
+
+def compare_reports(before, after, tolerance=0.25):
+    """
+    Route-by-route comparison of two load test reports. A route regresses when
+    its p99 latency grows by more than ``tolerance`` or its error rate rises
+    by more than a percentage point.
+    """
+    comparison = {'before': before['target'], 'after': after['target'], 'routes': {}, 'regressions': []}
+    names = ['(all)'] + sorted(set(before['routes']) & set(after['routes']))
+    for name in names:
+        old = before['summary'] if name == '(all)' else before['routes'][name]
+        new = after['summary'] if name == '(all)' else after['routes'][name]
+        entry = {}
+        for key in ('p50', 'p99'):
+            entry[f'{key}_ms'] = [old['latency_ms'].get(key), new['latency_ms'].get(key),
+                                  _ratio(old['latency_ms'].get(key), new['latency_ms'].get(key))]
+        entry['rps'] = [old['rps'], new['rps'], _ratio(old['rps'], new['rps'])]
+        entry['error_rate'] = [old['error_rate'], new['error_rate'], new['error_rate'] - old['error_rate']]
+        regressed = entry['p99_ms'][2] > 1 + tolerance or entry['error_rate'][2] > 0.01
+        entry['regressed'] = bool(regressed)
+        if regressed:
+            comparison['regressions'].append(name)
+        comparison['routes'][name] = entry
+    for side, report in (('before', before), ('after', after)):
+        comparison.setdefault('resources', {})[side] = {
+            key: report['resources'].get(key) for key in ('cpu_percent', 'rss_mb')}
+    return comparison
+
+
+def print_comparison(comparison):
+    before, after = comparison['before']['revision'], comparison['after']['revision']
+    print(f"\n{before} -> {after}", file=sys.stderr)
+    print(f"  {'route':<50} {'p50 ms':>17} {'p99 ms':>17} {'rps':>15} {'errors':>13}", file=sys.stderr)
+    for name, entry in comparison['routes'].items():
+        def pair(values, fmt='.1f'):
+            old, new, _ = values
+            return f"{old:{fmt}}->{new:{fmt}}" if old is not None and new is not None else '-'
+        status = 'REGRESSED' if entry['regressed'] else ''
+        print(f"  {name:<50} {pair(entry['p50_ms']):>17} {pair(entry['p99_ms']):>17} {pair(entry['rps']):>15} "
+              f"{pair(entry['error_rate'], '.1%'):>13} {status}", file=sys.stderr)
+    for side in ('before', 'after'):
+        resources = comparison['resources'][side]
+        if resources.get('cpu_percent'):
+            print(f"  {side:>6}: cpu mean {resources['cpu_percent']['mean']:.0f}% max "
+                  f"{resources['cpu_percent']['max']:.0f}%, rss max {resources['rss_mb']['max']:.0f} MB",
+                  file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the API with a synthetic sensor feed")
+    parser.add_argument('--rps', type=float, default=20, help="Requests per second (0: closed loop, as fast as possible)")
+    parser.add_argument('--concurrency', type=int, default=32, help="Most requests in flight")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds of measured load")
+    parser.add_argument('--warmup', type=float, default=5, help="Seconds of unmeasured load first")
+    parser.add_argument('--workers', type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the request feed")
+    parser.add_argument('--timeout', type=float, default=10, help="Per-request timeout in seconds")
+    parser.add_argument('--sample-interval', type=float, default=0.5, help="Seconds between CPU/RSS samples")
+    parser.add_argument('--routes', type=lambda v: [p for p in v.split(',') if p],
+                        help="Comma separated substrings; only matching routes are loaded")
+    parser.add_argument('--revisions', nargs=2, metavar=('BEFORE', 'AFTER'),
+                        help=f"Load two git revisions ({WORKTREE} for this checkout) and compare them")
+    parser.add_argument('--compare-reports', nargs=2, metavar=('BEFORE', 'AFTER'),
+                        help="Compare two saved reports without running anything")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Allowed relative p99 growth before a route counts as regressed")
+    parser.add_argument('--output', help="Write the report JSON to this path")
+    args = parser.parse_args()
+
+    if args.compare_reports:
+        reports = []
+        for path in args.compare_reports:
+            with open(path) as f:
+                reports.append(json.load(f))
+        payload = compare_reports(*reports, tolerance=args.tolerance)
+    else:
+        with tempfile.TemporaryDirectory(prefix='urbandev-load-') as directory:
+            targets = [(target, *prepare_target(target, os.path.join(directory, str(i))))
+                       for i, target in enumerate(args.revisions or [WORKTREE])]
+            routes = None
+            if args.revisions:
+                # Only routes both revisions serve, so both get the same request sequence
+                routes = set.intersection(*(set(discover_routes(backend_dir)) for _, backend_dir, _ in targets))
+            reports = [run_target(*target, args, routes) for target in targets]
+        if args.revisions:
+            payload = {'before': reports[0], 'after': reports[1],
+                       'comparison': compare_reports(*reports, tolerance=args.tolerance)}
+        else:
+            payload = reports[0]
+
+    text = json.dumps(payload, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    comparison = payload if args.compare_reports else payload.get('comparison')
+    if comparison is None:
+        summary = payload['summary']
+        print(f"\n{summary['requests']} requests, {summary.get('error_rate', 0):.1%} errors, "
+              f"p50 {summary['latency_ms'].get('p50', 0):.1f} ms, p99 {summary['latency_ms'].get('p99', 0):.1f} ms",
+              file=sys.stderr)
+        return
+    print_comparison(comparison)
+    if comparison['regressions']:
+        print(f"\n{len(comparison['regressions'])} route(s) regressed", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+"""
+Benchmark harness for the API routes and the ML hot paths.
+
+Run from the backend directory:
+
+    python -m benchmarks.run_benchmarks                      # default sizes, print JSON
+    python -m benchmarks.run_benchmarks --full               # 1k .. 10M rows
+    python -m benchmarks.run_benchmarks --output results.json
+    python -m benchmarks.run_benchmarks --compare benchmarks/baseline.json
+    python -m benchmarks.run_benchmarks --update-baseline
+
+Every result is recorded as ``{"metric", "value", "higher_is_better", ...}`` so
+that the comparison step does not need to know what a benchmark measures. A
+comparison exits with status 1 when any shared benchmark regresses by more
+than ``--tolerance`` against the baseline.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from ml.trafficanalysis.trafficanalysis import TrafficAnalyzer
+from ml.trafficanalysis.compression import CompressedForest, compress_forest
+from ml.trafficanalysis.create_traffic_dataset import create_synthetic_traffic_data
+from ml.featurestore.store import FeatureStore
+from ml.sustainablitycheck.check import SustainabilityAnalyzer
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+FULL_SIZES = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+HISTORY_SIZES = [100, 1_000, 10_000, 100_000]
+BATCH_SIZES = [1, 64, 1024]
+CONCURRENCY_LEVELS = [1, 4, 16]
+
+FEATURE_COLUMNS = ['time_of_day', 'day_of_week', 'vehicle_count', 'weather_condition', 'road_type']
+
+SAMPLE_FEATURES = {
+    'time_of_day': 8,
+    'day_of_week': 2,
+    'vehicle_count': 400,
+    'weather_condition': 1,
+    'road_type': 2
+}
+
+# One sample request per API route. Every route registered on the app must
+# appear here (``None`` marks a route that is deliberately not benchmarked),
+# so new endpoints cannot silently drop out of the throughput numbers.
+ROUTE_SAMPLES = {
+    ('POST', '/api/predict-traffic'): {'json': {'location': 'downtown', 'timeframe': '1-hour'}},
+    ('POST', '/api/analyze-traffic'): {'json': SAMPLE_FEATURES},
+    ('POST', '/api/analyze-traffic/batch'): {'json': {'items': [SAMPLE_FEATURES] * 64}},
+    ('GET', '/api/analyze-traffic/batching-stats'): {},
+    # Appends to the observation log on disk
+    ('POST', '/api/traffic-observations'): None,
+    ('GET', '/api/traffic-model'): {},
+    ('POST', '/api/road-network/congestion'): {
+        'json': {'node_id': 435, 'hops': 3, 'time_of_day': 8, 'day_of_week': 2, 'weather_condition': 1}},
+    ('POST', '/api/route'): {
+        'json': {'origin': 31, 'destination': 868, 'departure_hour': 8, 'day_of_week': 2, 'weather_condition': 1}},
+    ('GET', '/api/sustainability-metrics'): {},
+    ('GET', '/api/sustainability-recommendations'): {},
+    ('POST', '/api/analyze-urban-area'): {'json': {'area': 'downtown', 'include_suggestions': True}},
+    ('POST', '/api/urban-zones/query'): {
+        'json': {'min_x': 2000, 'min_y': 2000, 'max_x': 5000, 'max_y': 5000, 'include_zones': True}},
+    ('POST', '/api/urban-zones/suggestions/refresh'): {},
+    ('POST', '/api/scenarios/simulate'): {'json': {'presets': ['congestion_pricing']}},
+    ('GET', '/api/hourly-distribution'): {},
+    ('GET', '/api/historical-accuracy'): {},
+    ('GET', '/api/profiles'): {},
+    ('GET', '/api/profiles/{profile_id}'): None,
+    ('GET', '/api/tenants'): {},
+    ('GET', '/api/admission/stats'): {},
+}
+
+
+def time_call(func, min_repeat=5, min_time=0.2, max_repeat=10_000):
+    """Time ``func`` until both ``min_repeat`` calls and ``min_time`` seconds have elapsed"""
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < max_repeat:
+        t0 = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - t0)
+        if len(timings) >= min_repeat and time.perf_counter() - started >= min_time:
+            break
+    timings = np.asarray(timings)
+    return {
+        'metric': 'median_s',
+        'value': float(np.median(timings)),
+        'higher_is_better': False,
+        'mean_s': float(timings.mean()),
+        'p95_s': float(np.percentile(timings, 95)),
+        'min_s': float(timings.min()),
+        'repeat': int(len(timings))
+    }
+
+
+def write_traffic_dataset(directory, num_rows):
+    """Write a synthetic traffic dataset with ``num_rows`` rows and return its path"""
+    path = os.path.join(directory, f'traffic_data_{num_rows}.csv')
+    if not os.path.exists(path):
+        create_synthetic_traffic_data(num_samples=num_rows).to_csv(path, index=False)
+    return path
+
+
+def bench_traffic(sizes, workdir, min_time):
+    """Benchmark TrafficAnalyzer hot paths across dataset sizes"""
+    results = {}
+    for num_rows in sizes:
+        print(f"[traffic] rows={num_rows}", file=sys.stderr)
+        analyzer = TrafficAnalyzer(data_path=write_traffic_dataset(workdir, num_rows),
+                                   feature_store=FeatureStore(os.path.join(workdir, 'features')))
+        if analyzer.model is None:
+            raise RuntimeError("Traffic model is not available, train it before benchmarking")
+
+        results[f'traffic.predict_congestion.single[rows={num_rows}]'] = time_call(
+            lambda: analyzer.predict_congestion(dict(SAMPLE_FEATURES)), min_repeat=3, min_time=min_time)
+        results[f'traffic.get_hourly_distribution[rows={num_rows}]'] = time_call(
+            analyzer.get_hourly_distribution, min_repeat=3, min_time=min_time)
+        results[f'traffic.get_historical_accuracy[rows={num_rows}]'] = time_call(
+            analyzer.get_historical_accuracy, min_repeat=1, min_time=min_time)
+
+    # Model scoring does not depend on the dataset size, only on the batch size
+    analyzer = TrafficAnalyzer()
+    data = create_synthetic_traffic_data(num_samples=max(BATCH_SIZES))
+    rows = data[FEATURE_COLUMNS]
+    for batch_size in BATCH_SIZES:
+        batch = rows.iloc[:batch_size]
+        results[f'traffic.predict_congestion.batch[batch={batch_size}]'] = time_call(
+            lambda: analyzer.predict_levels(batch.to_numpy()), min_time=min_time)
+        # Per-tree matrix and percentiles, to compare against the plain predict above
+        results[f'traffic.predict_intervals.batch[batch={batch_size}]'] = time_call(
+            lambda: analyzer.predict_intervals(batch.to_numpy()), min_time=min_time)
+
+    # The same paths served by the served forest compressed on these rows
+    if not isinstance(analyzer.model, CompressedForest):
+        scaled = analyzer.scaler.transform(rows.to_numpy(dtype=np.float64))
+        compressed, _ = compress_forest(analyzer.model, analyzer.scaler, scaled, data['congestion_level'].to_numpy())
+        analyzer = TrafficAnalyzer()
+        analyzer.swap_model(compressed, analyzer.scaler)
+        for batch_size in BATCH_SIZES:
+            batch = rows.iloc[:batch_size]
+            results[f'traffic.compressed.predict_congestion.batch[batch={batch_size}]'] = time_call(
+                lambda: analyzer.predict_levels(batch.to_numpy()), min_time=min_time)
+            results[f'traffic.compressed.predict_intervals.batch[batch={batch_size}]'] = time_call(
+                lambda: analyzer.predict_intervals(batch.to_numpy()), min_time=min_time)
+    return results
+
+
+def write_sustainability_history(path, num_rows):
+    """Write ``num_rows`` rows of synthetic sustainability history to ``path``"""
+    rng = np.random.default_rng(42)
+    history = pd.DataFrame({
+        'timestamp': pd.date_range('2024-01-01', periods=num_rows, freq='min'),
+        'emissions': rng.uniform(20, 80, num_rows),
+        'energy': rng.uniform(40, 90, num_rows),
+        'green_infra': rng.uniform(30, 70, num_rows),
+        'public_transport': rng.uniform(20, 60, num_rows),
+        'walking_cycling': rng.uniform(30, 80, num_rows)
+    })
+    history.to_csv(path, index=False)
+
+
+def bench_sustainability(history_sizes, workdir, min_time):
+    """Benchmark SustainabilityAnalyzer.calculate_metrics as the stored history grows"""
+    results = {}
+    for num_rows in history_sizes:
+        print(f"[sustainability] history={num_rows}", file=sys.stderr)
+        path = os.path.join(workdir, f'sustainability_{num_rows}.csv')
+        write_sustainability_history(path, num_rows)
+        analyzer = SustainabilityAnalyzer(data_path=path)
+        results[f'sustainability.calculate_metrics[history={num_rows}]'] = time_call(
+            analyzer.calculate_metrics, min_repeat=3, min_time=min_time)
+    return results
+
+
+def collect_routes(app):
+    """Return (method, path) pairs for every API route registered on ``app``"""
+    from fastapi.routing import APIRoute
+
+    routes = []
+    for route in app.routes:
+        if isinstance(route, APIRoute):
+            for method in sorted(route.methods):
+                routes.append((method, route.path))
+    missing = [r for r in routes if r not in ROUTE_SAMPLES]
+    if missing:
+        raise RuntimeError(f"No benchmark sample for routes: {missing}")
+    return [r for r in routes if ROUTE_SAMPLES[r] is not None]
+
+
+async def _drive_route(client, method, path, request_kwargs, total, concurrency):
+    """Fire ``total`` requests with ``concurrency`` in flight and return latencies and errors"""
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            t0 = time.perf_counter()
+            response = await client.request(method, path, **request_kwargs)
+            latencies.append(time.perf_counter() - t0)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started, np.asarray(latencies), errors
+
+
+def bench_routes(concurrency_levels, requests_per_level, workdir):
+    """Measure end-to-end throughput of every FastAPI route with an in-process client"""
+    import httpx
+    import main
+    from tenancy import DEFAULT_TENANT
+
+    # Keep the benchmark from appending to the real sustainability history; routes use the default tenant's
+    main.sustainability_analyzer = SustainabilityAnalyzer(
+        data_path=os.path.join(workdir, 'route_sustainability.csv'))
+    default = main.tenant_registry.get(DEFAULT_TENANT)
+    default.sustainability = main.sustainability_analyzer
+    main.tenant_registry.release(default)
+
+    async def run():
+        results = {}
+        async with httpx.AsyncClient(app=main.app, base_url='http://benchmark') as client:
+            for method, path in collect_routes(main.app):
+                request_kwargs = ROUTE_SAMPLES[(method, path)]
+                for concurrency in concurrency_levels:
+                    print(f"[routes] {method} {path} c={concurrency}", file=sys.stderr)
+                    total = max(requests_per_level, concurrency)
+                    elapsed, latencies, errors = await _drive_route(
+                        client, method, path, request_kwargs, total, concurrency)
+                    results[f'route.{method} {path}[c={concurrency}]'] = {
+                        'metric': 'rps',
+                        'value': total / elapsed,
+                        'higher_is_better': True,
+                        'p50_s': float(np.percentile(latencies, 50)),
+                        'p95_s': float(np.percentile(latencies, 95)),
+                        'requests': total,
+                        'errors': errors
+                    }
+        return results
+
+    return asyncio.run(run())
+
+
+def environment_info():
+    """Describe the machine and revision the numbers were taken on"""
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    import sklearn
+    return {
+        'timestamp': pd.Timestamp.now().isoformat(),
+        'revision': revision,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Compare results with a baseline, returning a list of regression descriptions"""
+    regressions = []
+    for name, current in sorted(results.items()):
+        previous = baseline.get(name)
+        if previous is None:
+            print(f"  new       {name}: {current['value']:.6g} {current['metric']}", file=sys.stderr)
+            continue
+        if previous['metric'] != current['metric'] or previous['value'] <= 0:
+            continue
+        ratio = current['value'] / previous['value']
+        if current['higher_is_better']:
+            regressed = ratio < 1 / (1 + tolerance)
+        else:
+            regressed = ratio > 1 + tolerance
+        status = 'REGRESSED' if regressed else 'ok'
+        print(f"  {status:<9} {name}: {previous['value']:.6g} -> {current['value']:.6g} "
+              f"{current['metric']} (x{ratio:.2f})", file=sys.stderr)
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API routes and ML hot paths")
+    parser.add_argument('--sizes', type=lambda v: [int(x) for x in v.split(',')],
+                        help="Comma separated traffic dataset sizes (default: 1k,10k,100k)")
+    parser.add_argument('--full', action='store_true', help="Run dataset sizes from 1k up to 10M rows")
+    parser.add_argument('--only', choices=['traffic', 'sustainability', 'routes'], action='append',
+                        help="Restrict to one or more benchmark groups")
+    parser.add_argument('--requests', type=int, default=200, help="Requests per route and concurrency level")
+    parser.add_argument('--min-time', type=float, default=0.2, help="Minimum seconds spent per timing")
+    parser.add_argument('--output', help="Write results JSON to this path")
+    parser.add_argument('--compare', metavar='BASELINE', help="Fail when results regress against BASELINE")
+    parser.add_argument('--update-baseline', action='store_true', help=f"Overwrite {DEFAULT_BASELINE}")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Allowed relative slowdown before a benchmark counts as regressed")
+    args = parser.parse_args()
+
+    sizes = args.sizes or (FULL_SIZES if args.full else DEFAULT_SIZES)
+    groups = args.only or ['traffic', 'sustainability', 'routes']
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='urbandev-bench-') as workdir:
+        if 'traffic' in groups:
+            results.update(bench_traffic(sizes, workdir, args.min_time))
+        if 'sustainability' in groups:
+            results.update(bench_sustainability(HISTORY_SIZES, workdir, args.min_time))
+        if 'routes' in groups:
+            results.update(bench_routes(CONCURRENCY_LEVELS, args.requests, workdir))
+
+    report = {'environment': environment_info(), 'results': results}
+    payload = json.dumps(report, indent=2, sort_keys=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(payload + '\n')
+    if args.update_baseline:
+        with open(DEFAULT_BASELINE, 'w') as f:
+            f.write(payload + '\n')
+    if not args.output and not args.update_baseline:
+        print(payload)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        print(f"\nComparing against {args.compare} (tolerance {args.tolerance:.0%})", file=sys.stderr)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) regressed:", file=sys.stderr)
+            for name in regressions:
+                print(f"  {name}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
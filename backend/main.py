@@ -1,13 +1,29 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional, Dict
+import os
 import pickle
+import threading
+import numpy as np
 import pandas as pd
 from ml.newpredection.prediction import predict_traffic
 from ml.urban_analysis.layout import analyze_urban_area
+from ml.urban_analysis.spatial_index import ZoneIndex
+from ml.urban_analysis.serving import UrbanSuggestionCache
 from ml.trafficanalysis.trafficanalysis import TrafficAnalyzer
+from ml.trafficanalysis.batching import MicroBatcher
+from ml.trafficanalysis.online import ObservationLog, RetrainScheduler
 from ml.sustainablitycheck.check import SustainabilityAnalyzer
+from ml.roadnetwork.graph import RoadGraph, SegmentCongestion
+from ml.roadnetwork.routing import RoutePlanner
+from ml.scenarios.simulator import ScenarioPool, ScenarioSimulator, PRESET_SCENARIOS
+from profiling import ProfilingMiddleware, profiler, router as profiling_router
+from serialization import (JSON_MEDIA_TYPE, binary_response, check_layout, columnar_response, json_response,
+                           negotiate, tabular)
+from admission import AdmissionMiddleware, admission_controller, router as admission_router
+from tenancy import TenantContext, TenantMiddleware, current_tenant, tenant_registry, router as tenancy_router
 
 app = FastAPI()
 
@@ -15,6 +31,50 @@ app = FastAPI()
 traffic_analyzer = TrafficAnalyzer()
 sustainability_analyzer = SustainabilityAnalyzer()
 
+# Seconds between checks for a newly published traffic model (0 disables hot reload)
+model_watch_interval = float(os.environ.get('TRAFFIC_MODEL_WATCH_INTERVAL', 5))
+
+# Optional micro-batching of /api/analyze-traffic predictions across worker processes
+traffic_batcher = None
+if os.environ.get('TRAFFIC_BATCHING', '').lower() in ('1', 'true', 'yes'):
+    traffic_batcher = MicroBatcher.from_env(analyzer=traffic_analyzer, watch_interval=model_watch_interval)
+
+# Newly observed traffic rows, and optional incremental retraining from them in a background process
+traffic_observations = ObservationLog()
+retrain_scheduler = None
+if float(os.environ.get('TRAFFIC_RETRAIN_INTERVAL', 0)) > 0:
+    retrain_scheduler = RetrainScheduler.from_env()
+
+# Worker processes for large scenario batches, started with the app (SCENARIO_WORKERS=0 evaluates in the request thread)
+scenario_workers = int(os.environ.get('SCENARIO_WORKERS', 0))
+scenario_pool = ScenarioPool(scenario_workers) if scenario_workers > 1 else None
+
+# Per-city analyzers, loaded on demand; these module-level ones serve the default tenant
+tenant_registry.register(TenantContext('default', traffic_analyzer, sustainability_analyzer, traffic_observations))
+
+@app.on_event("startup")
+async def start_traffic_services():
+    if model_watch_interval > 0:
+        traffic_analyzer.start_watcher(model_watch_interval)
+    if traffic_batcher is not None:
+        await traffic_batcher.start()
+    if retrain_scheduler is not None:
+        retrain_scheduler.start()
+    if scenario_pool is not None:
+        scenario_pool.start()
+
+@app.on_event("shutdown")
+async def stop_traffic_services():
+    if retrain_scheduler is not None:
+        retrain_scheduler.stop()
+    if traffic_batcher is not None:
+        await traffic_batcher.stop()
+    if scenario_pool is not None:
+        scenario_pool.close()
+    traffic_analyzer.close()
+    sustainability_analyzer.close()
+    tenant_registry.close()
+
 # Enable CORS
 app.add_middleware(
     CORSMiddleware,
@@ -24,10 +84,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in request profiling (see profiling.py for the environment switches)
+app.add_middleware(ProfilingMiddleware, profiler=profiler)
+app.include_router(profiling_router)
+
+# Per-route concurrency limits and bounded queues for the expensive routes; added before
+# TenantMiddleware so it sees tenant-prefixed paths already rewritten
+app.add_middleware(AdmissionMiddleware, controller=admission_controller)
+app.include_router(admission_router)
+
+# Tenant selection by /api/tenants/<tenant>/... path prefix (X-Tenant-ID header otherwise)
+app.add_middleware(TenantMiddleware)
+app.include_router(tenancy_router)
+
+# Traffic Analysis Models
+class TrafficAnalysisRequest(BaseModel):
+    time_of_day: int
+    day_of_week: int
+    vehicle_count: int
+    weather_condition: int
+    road_type: int
+
 # Traffic Prediction Models
 class TrafficPredictionRequest(BaseModel):
     location: str
     timeframe: str
+    # Observed conditions at the location; when given, confidence comes from the traffic forest
+    features: Optional[TrafficAnalysisRequest] = None
 
 class TrafficPredictionResponse(BaseModel):
     prediction: float
@@ -35,34 +118,37 @@ class TrafficPredictionResponse(BaseModel):
     recommendations: List[str]
 
 @app.post("/api/predict-traffic", response_model=TrafficPredictionResponse)
-async def predict_traffic_route(request: TrafficPredictionRequest):
+async def predict_traffic_route(request: TrafficPredictionRequest, tenant: TenantContext = Depends(current_tenant)):
     try:
         prediction_result = predict_traffic(request.location, request.timeframe)
+        confidence = prediction_result["confidence"]
+        if request.features is not None and tenant.traffic.model is not None:
+            # Confidence from how closely the forest's trees agree on the given conditions
+            interval = tenant.traffic.predict_intervals([request.features.dict()])
+            confidence = float(np.clip(1 - (interval['upper'][0] - interval['lower'][0]), 0, 1))
         return TrafficPredictionResponse(
             prediction=prediction_result["prediction"],
-            confidence=prediction_result["confidence"],
+            confidence=confidence,
             recommendations=prediction_result["recommendations"]
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-# Traffic Analysis Models
-class TrafficAnalysisRequest(BaseModel):
-    time_of_day: int
-    day_of_week: int
-    vehicle_count: int
-    weather_condition: int
-    road_type: int
+class PredictionInterval(BaseModel):
+    lower: float
+    upper: float
+    std: float
 
 class TrafficAnalysisResponse(BaseModel):
     congestion_level: float
+    prediction_interval: Optional[PredictionInterval]
     feature_importance: Dict[str, float]
     congestion_category: str
     hourly_distribution: Dict[int, float]
     historical_accuracy: Dict[str, float]
 
 @app.post("/api/analyze-traffic", response_model=TrafficAnalysisResponse)
-async def analyze_traffic_route(request: TrafficAnalysisRequest):
+async def analyze_traffic_route(request: TrafficAnalysisRequest, tenant: TenantContext = Depends(current_tenant)):
     try:
         features = {
             'time_of_day': request.time_of_day,
@@ -71,11 +157,197 @@ async def analyze_traffic_route(request: TrafficAnalysisRequest):
             'weather_condition': request.weather_condition,
             'road_type': request.road_type
         }
-        result = traffic_analyzer.predict_congestion(features)
+        # The batcher's workers serve the default tenant's model
+        if traffic_batcher is not None and tenant.traffic is traffic_analyzer:
+            prediction, interval = await traffic_batcher.predict(features)
+            result = traffic_analyzer.describe_prediction(prediction, interval)
+        else:
+            result = tenant.traffic.predict_congestion(features)
         return TrafficAnalysisResponse(**result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+class TrafficBatchAnalysisRequest(BaseModel):
+    items: List[TrafficAnalysisRequest]
+
+class TrafficBatchAnalysisResponse(BaseModel):
+    congestion_levels: List[float]
+    congestion_categories: List[str]
+    prediction_intervals: List[PredictionInterval]
+    feature_importance: Dict[str, float]
+
+@app.post("/api/analyze-traffic/batch", response_model=TrafficBatchAnalysisResponse)
+async def analyze_traffic_batch_route(request: TrafficBatchAnalysisRequest, http_request: Request, layout: str = 'rows',
+                                      tenant: TenantContext = Depends(current_tenant)):
+    media_type = negotiate(http_request)
+    check_layout(layout)
+    try:
+        rows = [item.dict() for item in request.items]
+        result = tenant.traffic.predict_intervals(rows) if rows else {key: np.empty(0) for key in ('mean', 'lower', 'upper', 'std')}
+        categories = tenant.traffic.congestion_categories(result['mean']).tolist()
+        if media_type != JSON_MEDIA_TYPE:
+            return binary_response({
+                'congestion_level': result['mean'],
+                'congestion_category': categories,
+                'lower': result['lower'],
+                'upper': result['upper'],
+                'std': result['std']
+            }, media_type, metadata={'feature_importance': tenant.traffic.get_feature_importance()})
+        intervals = {'lower': result['lower'], 'upper': result['upper'], 'std': result['std']}
+        return json_response({
+            'congestion_levels': result['mean'],
+            'congestion_categories': categories,
+            'prediction_intervals': tabular(intervals, layout),
+            'feature_importance': tenant.traffic.get_feature_importance()
+        }, http_request, headers={'Vary': 'Accept'})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/analyze-traffic/batching-stats")
+async def get_traffic_batching_stats():
+    if traffic_batcher is None:
+        return {"running": False}
+    return traffic_batcher.stats()
+
+# Traffic Observation and Model Version Models
+class TrafficObservation(TrafficAnalysisRequest):
+    congestion_level: float
+
+class TrafficObservationBatch(BaseModel):
+    items: List[TrafficObservation]
+
+@app.post("/api/traffic-observations")
+async def ingest_traffic_observations(request: TrafficObservationBatch,
+                                      tenant: TenantContext = Depends(current_tenant)):
+    try:
+        appended = tenant.observations.append([item.dict() for item in request.items])
+        return {"appended": appended}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/traffic-model")
+async def get_traffic_model_info(tenant: TenantContext = Depends(current_tenant)):
+    try:
+        store = tenant.traffic.store
+        versions = []
+        for version in store.versions()[::-1]:
+            metadata = store.metadata(version)
+            versions.append({key: metadata.get(key) for key in (
+                'version', 'published_at', 'update', 'new_rows', 'trees',
+                'validation_r2', 'previous_validation_r2', 'test_r2', 'accepted')})
+        return {
+            "served_version": tenant.traffic.model_version,
+            "current_version": store.current_version(),
+            "versions": versions,
+            "retraining": (retrain_scheduler.status() if retrain_scheduler is not None and tenant.traffic is traffic_analyzer
+                           else {"running": False})
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Road Network Models
+road_congestion = None
+
+def get_road_congestion():
+    """Load the road graph on first use"""
+    global road_congestion
+    if road_congestion is None:
+        road_congestion = SegmentCongestion(RoadGraph.from_csv(), traffic_analyzer)
+    return road_congestion
+
+class RoadCongestionRequest(BaseModel):
+    node_id: int
+    hops: int = 2
+    time_of_day: int
+    day_of_week: int
+    weather_condition: int = 1
+    limit: int = 500
+
+class RoadSegmentCongestion(BaseModel):
+    edge_id: int
+    source: int
+    target: int
+    hops: int
+    congestion_level: float
+
+class RoadCongestionResponse(BaseModel):
+    node_id: int
+    hops: int
+    segment_count: int
+    mean_congestion: float
+    max_congestion: float
+    segments: List[RoadSegmentCongestion]
+
+@app.post("/api/road-network/congestion", response_model=RoadCongestionResponse)
+async def road_congestion_route(request: RoadCongestionRequest):
+    try:
+        congestion = get_road_congestion()
+        levels = congestion.levels(request.time_of_day, request.day_of_week, request.weather_condition)
+        hits = congestion.graph.congestion_within(request.node_id, request.hops, levels)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    # Most congested segments first
+    order = np.argsort(-hits['congestion'], kind='stable')[:request.limit]
+    segments = [
+        RoadSegmentCongestion(edge_id=edge_id, source=source, target=target, hops=hops, congestion_level=level)
+        for edge_id, source, target, hops, level in zip(
+            hits['edge_ids'][order].tolist(), hits['source_ids'][order].tolist(),
+            hits['target_ids'][order].tolist(), hits['hops'][order].tolist(), hits['congestion'][order].tolist())
+    ]
+    count = len(hits['edges'])
+    return RoadCongestionResponse(
+        node_id=request.node_id,
+        hops=request.hops,
+        segment_count=count,
+        mean_congestion=float(hits['congestion'].mean()) if count else 0.0,
+        max_congestion=float(hits['congestion'].max()) if count else 0.0,
+        segments=segments
+    )
+
+route_planner = None
+
+def get_route_planner():
+    """Precompute routing landmarks on first use"""
+    global route_planner
+    if route_planner is None:
+        route_planner = RoutePlanner(get_road_congestion().graph, get_road_congestion())
+    return route_planner
+
+class RouteRequest(BaseModel):
+    origin: int
+    destination: int
+    departure_hour: int
+    day_of_week: int
+    weather_condition: int = 1
+
+class RouteResponse(BaseModel):
+    nodes: List[int]
+    edges: List[int]
+    travel_time_s: float
+    free_flow_time_s: float
+    distance_m: float
+    mean_congestion: float
+    settled_nodes: int
+    elapsed_ms: float
+
+@app.post("/api/route", response_model=RouteResponse)
+async def route_route(request: RouteRequest):
+    try:
+        result = get_route_planner().route(request.origin, request.destination, request.departure_hour,
+                                           request.day_of_week, request.weather_condition)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail="No route between these nodes")
+    result['nodes'] = result['nodes'].tolist()
+    result['edges'] = result['edges'].tolist()
+    return RouteResponse(**result)
+
 # Sustainability Models
 class TrendData(BaseModel):
     direction: str
@@ -90,9 +362,9 @@ class SustainabilityMetrics(BaseModel):
     trend_analysis: Dict[str, TrendData]
 
 @app.get("/api/sustainability-metrics", response_model=SustainabilityMetrics)
-async def get_sustainability_metrics():
+async def get_sustainability_metrics(tenant: TenantContext = Depends(current_tenant)):
     try:
-        metrics = sustainability_analyzer.calculate_metrics()
+        metrics = tenant.sustainability.calculate_metrics()
         return SustainabilityMetrics(**metrics)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -103,9 +375,9 @@ class SustainabilityRecommendation(BaseModel):
     suggestions: List[str]
 
 @app.get("/api/sustainability-recommendations", response_model=List[SustainabilityRecommendation])
-async def get_sustainability_recommendations():
+async def get_sustainability_recommendations(tenant: TenantContext = Depends(current_tenant)):
     try:
-        recommendations = sustainability_analyzer.get_recommendations()
+        recommendations = tenant.sustainability.get_recommendations()
         return [SustainabilityRecommendation(**rec) for rec in recommendations]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -126,16 +398,20 @@ class UrbanAnalysisResponse(BaseModel):
     green_space_ratio: float
     public_transport_coverage: float
     optimization_suggestions: Optional[List[str]]
+    # Classifier probability of each suggestion, when the area is a scored zone or area type
+    suggestion_scores: Optional[Dict[str, float]] = None
     hourly_distribution: Dict[int, float]
     historical_data: Dict[str, float]
     area_distribution: List[AreaDistribution]
 
 @app.post("/api/analyze-urban-area", response_model=UrbanAnalysisResponse)
-async def analyze_urban_area_route(request: UrbanAnalysisRequest):
+async def analyze_urban_area_route(request: UrbanAnalysisRequest, tenant: TenantContext = Depends(current_tenant)):
     try:
-        analysis_result = analyze_urban_area(request.area)
-        hourly_data = traffic_analyzer.get_hourly_distribution()
-        historical_data = traffic_analyzer.get_historical_accuracy()
+        # The first call loads the classifier and scores the zones; keep that off the event loop
+        suggestions = urban_suggestions if urban_suggestions_loaded else await run_in_threadpool(get_urban_suggestions)
+        analysis_result = analyze_urban_area(request.area, suggestions)
+        hourly_data = tenant.traffic.get_hourly_distribution()
+        historical_data = tenant.traffic.get_historical_accuracy()
         # Placeholder area distribution data
         area_distribution = [
             {"category": "Residential", "percentage": 40},
@@ -147,6 +423,7 @@ async def analyze_urban_area_route(request: UrbanAnalysisRequest):
             "green_space_ratio": analysis_result["green_space_ratio"],
             "public_transport_coverage": analysis_result["public_transport_coverage"],
             "optimization_suggestions": analysis_result.get("suggestions") if request.include_suggestions else [],
+            "suggestion_scores": analysis_result.get("suggestion_scores") if request.include_suggestions else None,
             "hourly_distribution": hourly_data,
             "historical_data": historical_data,
             "area_distribution": area_distribution
@@ -154,17 +431,174 @@ async def analyze_urban_area_route(request: UrbanAnalysisRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Zone Query Models
+zone_index = None
+
+def get_zone_index():
+    """Build the zone spatial index on first use"""
+    global zone_index
+    if zone_index is None:
+        zone_index = ZoneIndex.from_csv()
+    return zone_index
+
+# Urban optimization suggestions per zone, scored once and served from the cache
+urban_suggestions = None
+urban_suggestions_loaded = False
+# Serializes the first load and refreshes, so concurrent callers wait for a fully scored cache
+urban_suggestions_lock = threading.Lock()
+
+def get_urban_suggestions():
+    """Load the classifier and score every zone on first use (blocking); None if no urban model was trained"""
+    global urban_suggestions, urban_suggestions_loaded
+    if urban_suggestions_loaded:
+        return urban_suggestions
+    with urban_suggestions_lock:
+        if not urban_suggestions_loaded:
+            cache = UrbanSuggestionCache.load()
+            if cache is not None:
+                # Start from the nightly refresh's scores; only zones changed since are scored here
+                cache.restore()
+                cache.refresh(get_zone_index().zones)
+            urban_suggestions = cache
+            urban_suggestions_loaded = True
+    return urban_suggestions
+
+class ZoneSuggestionRefreshResponse(BaseModel):
+    zones: int
+    rescored: int
+    removed: int
+    seconds: float
+
+@app.post("/api/urban-zones/suggestions/refresh", response_model=ZoneSuggestionRefreshResponse)
+def refresh_zone_suggestions_route():
+    """Reload zones.csv, re-score the zones whose features changed and save the cache"""
+    global zone_index
+    cache = get_urban_suggestions()
+    if cache is None:
+        raise HTTPException(status_code=404, detail="No urban optimization model has been trained")
+    try:
+        with urban_suggestions_lock:
+            zone_index = ZoneIndex.from_csv()
+            stats = cache.refresh(zone_index.zones)
+            cache.save()
+        return stats
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+class ZoneQueryRequest(BaseModel):
+    # Either a viewport (min_x, min_y, max_x, max_y) or a point and radius, in metres
+    min_x: Optional[float] = None
+    min_y: Optional[float] = None
+    max_x: Optional[float] = None
+    max_y: Optional[float] = None
+    x: Optional[float] = None
+    y: Optional[float] = None
+    radius: Optional[float] = None
+    include_zones: bool = False
+
+class ZoneSummary(BaseModel):
+    zone_id: int
+    name: str
+    area_type: str
+    congestion_score: float
+    green_space_ratio: float
+    public_transport_coverage: float
+
+class ZoneQueryResponse(BaseModel):
+    zone_count: int
+    total_area_m2: float
+    congestion_score: Optional[float]
+    green_space_ratio: Optional[float]
+    public_transport_coverage: Optional[float]
+    area_type_counts: Dict[str, int]
+    zones: Optional[List[ZoneSummary]]
+
+@app.post("/api/urban-zones/query", response_model=ZoneQueryResponse)
+async def query_urban_zones_route(request: ZoneQueryRequest):
+    bbox = (request.min_x, request.min_y, request.max_x, request.max_y)
+    point = (request.x, request.y, request.radius)
+    if all(v is not None for v in bbox):
+        query = lambda index: index.query_bbox(*bbox)
+    elif all(v is not None for v in point):
+        query = lambda index: index.query_radius(*point)
+    else:
+        raise HTTPException(status_code=422, detail="Provide min_x/min_y/max_x/max_y or x/y/radius")
+    try:
+        index = get_zone_index()
+        result = index.aggregate(query(index))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    hits = result.pop('zones')
+    if result['zone_count'] == 0:
+        for metric in ('congestion_score', 'green_space_ratio', 'public_transport_coverage'):
+            result[metric] = None
+    result['zones'] = None
+    if request.include_zones:
+        columns = list(ZoneSummary.__fields__)
+        result['zones'] = index.zones.iloc[hits][columns].to_dict('records')
+    return result
+
+# Scenario Simulation Models
+scenario_simulators = {}
+
+def get_scenario_simulator(tenant, weather_condition):
+    """One simulator per tenant and weather condition, rebuilt when the tenant's traffic model changes"""
+    key = (tenant.tenant_id, weather_condition, tenant.traffic.model_version)
+    if key not in scenario_simulators:
+        if len(scenario_simulators) >= 4:
+            scenario_simulators.clear()
+        scenario_simulators[key] = ScenarioSimulator(analyzer=tenant.traffic, weather_condition=weather_condition)
+    return scenario_simulators[key]
+
+class ScenarioSpec(BaseModel):
+    name: Optional[str] = None
+    preset: Optional[str] = None
+    # feature -> {"scale": x} | {"add": x} | {"set": x}
+    changes: Dict[str, Dict[str, float]] = {}
+
+class ScenarioSimulationRequest(BaseModel):
+    scenarios: List[ScenarioSpec] = []
+    presets: List[str] = []
+    weather_condition: int = 1
+
+class ScenarioSimulationResponse(BaseModel):
+    model_version: Optional[str]
+    baseline_rows: int
+    scenarios: List[Dict]
+
+@app.post("/api/scenarios/simulate", response_model=ScenarioSimulationResponse)
+def simulate_scenarios_route(request: ScenarioSimulationRequest, tenant: TenantContext = Depends(current_tenant)):
+    scenarios = list(request.presets) + [spec.dict(exclude_none=True) for spec in request.scenarios]
+    if not scenarios:
+        scenarios = list(PRESET_SCENARIOS)
+    try:
+        scenarios = [ScenarioSimulator.resolve(s) for s in scenarios]
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    try:
+        simulator = get_scenario_simulator(tenant, request.weather_condition)
+        reports = simulator.run(scenarios, pool=scenario_pool)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {
+        'model_version': simulator.model_version,
+        'baseline_rows': len(simulator.traffic_base),
+        'scenarios': reports
+    }
+
 # New Endpoints
 class HourlyDistributionResponse(BaseModel):
     hour: int
     traffic_volume: float
 
 @app.get("/api/hourly-distribution", response_model=List[HourlyDistributionResponse])
-async def get_hourly_distribution():
+async def get_hourly_distribution(request: Request, layout: str = 'rows', tenant: TenantContext = Depends(current_tenant)):
+    media_type = negotiate(request)
+    check_layout(layout)
     try:
-        # Assuming we have a function to get hourly distribution
-        hourly_data = traffic_analyzer.get_hourly_distribution()
-        return [HourlyDistributionResponse(hour=hour, traffic_volume=volume) for hour, volume in hourly_data.items()]
+        hours, volumes = tenant.traffic.hourly_distribution_arrays()
+        return columnar_response({'hour': hours, 'traffic_volume': volumes}, request, media_type, layout)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -173,27 +607,13 @@ class HistoricalAccuracyResponse(BaseModel):
     accuracy: float
 
 @app.get("/api/historical-accuracy", response_model=List[HistoricalAccuracyResponse])
-async def get_historical_accuracy():
-    try:
-        # Add logging to debug the issue
-        historical_data = traffic_analyzer.get_historical_accuracy()
-        print(f"Historical data: {historical_data}")  # Debug print
-        
-        # Convert the data to the response model
-        response_data = []
-        for timestamp, accuracy in historical_data.items():
-            try:
-                response_data.append(HistoricalAccuracyResponse(
-                    timestamp=str(timestamp),  # Ensure timestamp is string
-                    accuracy=float(accuracy)   # Ensure accuracy is float
-                ))
-            except Exception as conversion_error:
-                print(f"Error converting data for timestamp {timestamp}: {conversion_error}")
-                continue
-                
-        return response_data
+async def get_historical_accuracy(request: Request, layout: str = 'rows', tenant: TenantContext = Depends(current_tenant)):
+    media_type = negotiate(request)
+    check_layout(layout)
+    try:
+        timestamps, accuracy = tenant.traffic.historical_accuracy_arrays()
+        return columnar_response({'timestamp': timestamps, 'accuracy': accuracy}, request, media_type, layout)
     except Exception as e:
-        print(f"Error in get_historical_accuracy endpoint: {str(e)}")  # Debug print
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 if __name__ == "__main__":
@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+class CategoricalEncoder:
+    """
+    Fitted category vocabularies for a set of columns.
+
+    Categories are sorted like ``pd.get_dummies`` orders them, and with
+    ``drop_first`` the first one becomes the all-zero baseline, so the one-hot
+    columns match ``get_dummies(drop_first=True)``. Once fitted the encoder
+    maps any frame, chunk or single serving row to the same integer codes or
+    one-hot columns; categories it has not seen encode as -1 / all zeros.
+
+    ``partial_fit`` grows the vocabularies chunk by chunk, so a CSV read with
+    ``chunksize`` is encoded in one pass without building the whole frame.
+    """
+
+    def __init__(self, columns=(), drop_first=False):
+        self.columns = list(columns)
+        self.drop_first = drop_first
+        self.categories_ = None
+
+    def partial_fit(self, df):
+        """Add the categories seen in ``df``"""
+        if self.categories_ is None:
+            self.categories_ = {column: [] for column in self.columns}
+        for column in self.columns:
+            seen = set(self.categories_[column])
+            new = [value for value in pd.unique(df[column].dropna()) if value not in seen]
+            if new:
+                self.categories_[column] = sorted(self.categories_[column] + list(new))
+        return self
+
+    def fit(self, data):
+        """Fit on a DataFrame or an iterable of DataFrame chunks"""
+        self.categories_ = None
+        for chunk in ([data] if isinstance(data, pd.DataFrame) else data):
+            self.partial_fit(chunk)
+        if self.categories_ is None:
+            self.categories_ = {column: [] for column in self.columns}
+        return self
+
+    def _check_fitted(self):
+        if self.categories_ is None:
+            raise Exception("CategoricalEncoder is not fitted")
+
+    def codes(self, df):
+        """(rows, columns) int32 codes into each column's vocabulary, -1 for unseen or missing"""
+        self._check_fitted()
+        out = np.empty((len(df), len(self.columns)), dtype=np.int32)
+        for j, column in enumerate(self.columns):
+            out[:, j] = pd.Categorical(df[column], categories=self.categories_[column]).codes
+        return out
+
+    def feature_names(self):
+        """One-hot column names, ``<column>_<category>`` as get_dummies names them"""
+        self._check_fitted()
+        names = []
+        for column in self.columns:
+            vocabulary = self.categories_[column]
+            names += [f'{column}_{category}' for category in (vocabulary[1:] if self.drop_first else vocabulary)]
+        return names
+
+    def one_hot_codes(self, codes):
+        """Sparse (rows, one-hot columns) CSR matrix from integer codes"""
+        n_rows = len(codes)
+        indices, offset = [], 0
+        rows = []
+        for j, column in enumerate(self.columns):
+            width = len(self.categories_[column]) - (1 if self.drop_first else 0)
+            column_codes = codes[:, j] - (1 if self.drop_first else 0)
+            present = column_codes >= 0
+            rows.append(np.flatnonzero(present))
+            indices.append(column_codes[present] + offset)
+            offset += max(width, 0)
+        row = np.concatenate(rows) if rows else np.empty(0, dtype=np.intp)
+        col = np.concatenate(indices) if indices else np.empty(0, dtype=np.intp)
+        data = np.ones(row.size, dtype=np.float32)
+        return sparse.csr_matrix((data, (row, col)), shape=(n_rows, offset))
+
+    def one_hot(self, df, dense=False):
+        """One-hot columns for ``df``, sparse CSR unless ``dense``"""
+        matrix = self.one_hot_codes(self.codes(df))
+        return matrix.toarray() if dense else matrix
+
+    def to_dict(self):
+        self._check_fitted()
+        return {'columns': self.columns, 'drop_first': self.drop_first, 'categories': self.categories_}
+
+    @classmethod
+    def from_dict(cls, state):
+        encoder = cls(state['columns'], state['drop_first'])
+        encoder.categories_ = {column: list(values) for column, values in state['categories'].items()}
+        return encoder
+
+
+def encode_chunks(chunks, encoder, numeric, target=None, fill='ffill', fit=True,
+                  numeric_dtype=np.float32, target_dtype=np.float64):
+    """
+    Encode DataFrame chunks in a single pass: numeric columns as a
+    ``numeric_dtype`` block, the encoder's columns as integer codes and
+    ``target`` (if given) as a ``target_dtype`` array. With ``numeric_dtype``
+    or ``target_dtype`` None the columns keep their own dtypes and come back
+    as a DataFrame / Series with the chunks' index. A chunk that introduces a
+    new category shifts the sorted codes of earlier chunks; those are
+    remapped once at the end.
+    Returns (numeric block, codes, target or None).
+    """
+    numeric_blocks, code_blocks, targets, vocabularies = [], [], [], []
+    last_row = None
+    for chunk in chunks:
+        if fill == 'ffill':
+            if last_row is not None:
+                # Carry the previous chunk's last values into this chunk's leading gaps
+                chunk = pd.concat([last_row, chunk]).ffill().iloc[1:]
+            else:
+                chunk = chunk.ffill()
+            if len(chunk):
+                last_row = chunk.iloc[[-1]]
+        if fit:
+            encoder.partial_fit(chunk)
+        if numeric_dtype is None:
+            numeric_blocks.append(chunk[numeric])
+        else:
+            numeric_blocks.append(chunk[numeric].to_numpy(dtype=numeric_dtype).reshape(len(chunk), len(numeric)))
+        code_blocks.append(encoder.codes(chunk))
+        if target is not None:
+            targets.append(chunk[target] if target_dtype is None else chunk[target].to_numpy(dtype=target_dtype))
+        vocabularies.append({column: list(values) for column, values in encoder.categories_.items()})
+
+    if encoder.categories_ is None:
+        encoder.fit([])
+    if not code_blocks:
+        numeric_block = (pd.DataFrame(columns=numeric) if numeric_dtype is None
+                         else np.empty((0, len(numeric)), dtype=numeric_dtype))
+        y = None
+        if target is not None:
+            y = pd.Series(name=target, dtype=object) if target_dtype is None else np.empty(0, dtype=target_dtype)
+        return numeric_block, np.empty((0, len(encoder.columns)), dtype=np.int32), y
+
+    # Remap codes assigned against an earlier, smaller vocabulary
+    # (the trailing -1 in each lookup keeps unseen values at -1)
+    final = encoder.categories_
+    for block, vocabulary in zip(code_blocks, vocabularies):
+        for j, column in enumerate(encoder.columns):
+            if vocabulary[column] != final[column]:
+                positions = {value: i for i, value in enumerate(final[column])}
+                lookup = np.asarray([positions[value] for value in vocabulary[column]] + [-1], dtype=np.int32)
+                block[:, j] = lookup[block[:, j]]
+    concat = pd.concat if numeric_dtype is None else np.concatenate
+    y = None
+    if target is not None:
+        y = pd.concat(targets) if target_dtype is None else np.concatenate(targets)
+    return concat(numeric_blocks), np.concatenate(code_blocks), y
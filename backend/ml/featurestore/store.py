@@ -0,0 +1,256 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from ml.featurestore.encoding import CategoricalEncoder, encode_chunks
+
+SCHEMA_FILE = 'schema.json'
+FEATURES_FILE = 'features.npy'
+TARGET_FILE = 'target.npy'
+
+# Rows parsed per CSV chunk while materializing
+CHUNK_ROWS = 100_000
+
+
+class FeatureSpec:
+    """
+    How a feature matrix is built from a CSV: numeric columns as-is, then
+    one-hot columns for each categorical column (named and ordered like
+    ``pd.get_dummies``), and an optional target. A categorical target is
+    stored as integer codes into its recorded classes.
+    """
+
+    def __init__(self, name, numeric=(), categorical=(), target=None, drop_first=False,
+                 fill='ffill', categorical_target=False):
+        self.name = name
+        self.numeric = list(numeric)
+        self.categorical = list(categorical)
+        self.target = target
+        self.drop_first = drop_first
+        self.fill = fill
+        self.categorical_target = categorical_target
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'numeric': self.numeric,
+            'categorical': self.categorical,
+            'target': self.target,
+            'drop_first': self.drop_first,
+            'fill': self.fill,
+            'categorical_target': self.categorical_target
+        }
+
+    def digest(self):
+        return hashlib.sha256(json.dumps(self.to_dict(), sort_keys=True).encode()).hexdigest()
+
+
+class FeatureMatrix:
+    """
+    A materialized feature set: ``X`` (float32, C-contiguous) and ``y`` are
+    memory-mapped read-only, ``schema`` records the column order and the
+    category vocabularies, and ``encode`` turns raw rows into the same layout.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, SCHEMA_FILE)) as f:
+            self.schema = json.load(f)
+        self.X = np.load(os.path.join(path, FEATURES_FILE), mmap_mode='r')
+        target_path = os.path.join(path, TARGET_FILE)
+        self.y = np.load(target_path, mmap_mode='r') if os.path.exists(target_path) else None
+        self.encoder = CategoricalEncoder.from_dict({
+            'columns': list(self.schema['categories']),
+            'drop_first': self.schema['drop_first'],
+            'categories': self.schema['categories']
+        })
+
+    @property
+    def version(self):
+        return self.schema['version']
+
+    @property
+    def columns(self):
+        return self.schema['columns']
+
+    def column(self, name):
+        """One feature column as a (strided) view of the matrix"""
+        return self.X[:, self.columns.index(name)]
+
+    def target_labels(self):
+        """The target with categorical codes mapped back to their labels"""
+        classes = self.schema.get('target_classes')
+        return np.asarray(classes, dtype=object)[self.y] if classes is not None else self.y
+
+    def encode(self, rows):
+        """
+        Encode raw rows (a DataFrame, or a list of dicts) with the recorded
+        column order and vocabularies. Categories unseen when the matrix was
+        built get all-zero one-hot columns.
+        """
+        df = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(list(rows))
+        numeric = self.schema['numeric']
+        return _assemble(df[numeric].to_numpy(dtype=np.float32).reshape(len(df), len(numeric)),
+                         self.encoder, self.encoder.codes(df))
+
+
+def _assemble(numeric_block, encoder, codes):
+    """Numeric columns followed by the one-hot columns, as one contiguous float32 matrix"""
+    one_hot = encoder.one_hot_codes(codes).toarray().astype(np.float32)
+    return np.ascontiguousarray(np.hstack([numeric_block, one_hot]), dtype=np.float32)
+
+
+class FeatureStore:
+    """
+    Versioned feature matrices shared by training and serving.
+
+    ``materialize`` parses a source CSV once into a float32 matrix and a
+    target array saved as .npy next to a schema. The version is derived from
+    the spec and the source contents, so unchanged data is never parsed
+    again; a source whose size and modification time match a materialized
+    version is resolved without even hashing it. Versions are written to a
+    staging directory and renamed into place, like model artifacts.
+    """
+
+    def __init__(self, root=None):
+        if root is None:
+            root = os.environ.get('FEATURE_STORE_DIR') or os.path.join(os.path.dirname(__file__), 'data')
+        self.root = root
+        self._open = {}
+        self._lock = threading.Lock()
+
+    def versions(self, name):
+        """Materialized versions of a feature set, oldest first"""
+        path = os.path.join(self.root, name)
+        if not os.path.isdir(path):
+            return []
+        versions = [v for v in os.listdir(path) if not v.startswith('.')]
+        return sorted(versions, key=lambda v: os.path.getmtime(os.path.join(path, v)))
+
+    def open(self, name, version=None):
+        """Memory-map a version of a feature set, the latest one by default"""
+        if version is None:
+            versions = self.versions(name)
+            if not versions:
+                raise FileNotFoundError(f"No materialized versions of feature set {name}")
+            version = versions[-1]
+        return FeatureMatrix(os.path.join(self.root, name, version))
+
+    def materialize(self, spec, source):
+        """Return the feature matrix of ``source`` under ``spec``, building it on first use"""
+        source = os.path.abspath(source)
+        stat = os.stat(source)
+        fingerprint = (spec.digest(), stat.st_size, stat.st_mtime_ns)
+        key = (spec.name, source)
+        with self._lock:
+            cached = self._open.get(key)
+            if cached is not None and cached[0] == fingerprint:
+                return cached[1]
+
+            matrix = self._find(spec, source, stat)
+            if matrix is None:
+                version = hashlib.sha256((spec.digest() + _file_hash(source)).encode()).hexdigest()[:16]
+                path = os.path.join(self.root, spec.name, version)
+                if not os.path.isdir(path):
+                    self._write(spec, source, stat, version)
+                else:
+                    # Same contents under a new path or timestamp; record the new source on it
+                    self._touch_source(path, source, stat)
+                matrix = FeatureMatrix(path)
+            self._open[key] = (fingerprint, matrix)
+            return matrix
+
+    def _find(self, spec, source, stat):
+        """An existing version built from this source file as it is now"""
+        for version in reversed(self.versions(spec.name)):
+            path = os.path.join(self.root, spec.name, version)
+            try:
+                with open(os.path.join(path, SCHEMA_FILE)) as f:
+                    schema = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for recorded in schema['sources']:
+                if (recorded['path'] == source and recorded['size'] == stat.st_size
+                        and recorded['mtime_ns'] == stat.st_mtime_ns and schema['spec_digest'] == spec.digest()):
+                    return FeatureMatrix(path)
+        return None
+
+    def _write(self, spec, source, stat, version):
+        # One chunked pass over the CSV; a categorical target is encoded alongside the features
+        columns = spec.categorical + ([spec.target] if spec.categorical_target else [])
+        encoder = CategoricalEncoder(columns, drop_first=spec.drop_first)
+        chunks = pd.read_csv(source, chunksize=CHUNK_ROWS)
+        numeric_target = spec.target if spec.target is not None and not spec.categorical_target else None
+        numeric_block, codes, y = encode_chunks(chunks, encoder, spec.numeric, target=numeric_target, fill=spec.fill)
+
+        categories = {column: encoder.categories_[column] for column in spec.categorical}
+        features = CategoricalEncoder.from_dict({'columns': spec.categorical, 'drop_first': spec.drop_first,
+                                                 'categories': categories})
+        X = _assemble(numeric_block, features, codes[:, :len(spec.categorical)])
+        columns = list(spec.numeric) + features.feature_names()
+
+        schema = {
+            'name': spec.name,
+            'version': version,
+            'spec': spec.to_dict(),
+            'spec_digest': spec.digest(),
+            'columns': columns,
+            'numeric': spec.numeric,
+            'categories': categories,
+            'drop_first': spec.drop_first,
+            'dtype': 'float32',
+            'rows': int(len(X)),
+            'target': spec.target,
+            'sources': [{'path': source, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}],
+            'created_at': time.time()
+        }
+
+        staging = os.path.join(self.root, spec.name, f'.staging-{version}-{uuid.uuid4().hex[:6]}')
+        os.makedirs(staging)
+        try:
+            np.save(os.path.join(staging, FEATURES_FILE), X)
+            if spec.target is not None:
+                if spec.categorical_target:
+                    schema['target_classes'] = encoder.categories_[spec.target]
+                    np.save(os.path.join(staging, TARGET_FILE), codes[:, -1])
+                else:
+                    np.save(os.path.join(staging, TARGET_FILE), y)
+            with open(os.path.join(staging, SCHEMA_FILE), 'w') as f:
+                json.dump(schema, f, indent=2)
+            os.rename(staging, os.path.join(self.root, spec.name, version))
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+            # Another process materialized the same version first
+            if not os.path.isdir(os.path.join(self.root, spec.name, version)):
+                raise
+
+    def _touch_source(self, path, source, stat):
+        schema_path = os.path.join(path, SCHEMA_FILE)
+        with open(schema_path) as f:
+            schema = json.load(f)
+        schema['sources'] = [s for s in schema['sources'] if s['path'] != source]
+        schema['sources'].append({'path': source, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns})
+        tmp_path = f'{schema_path}.{uuid.uuid4().hex[:6]}'
+        with open(tmp_path, 'w') as f:
+            json.dump(schema, f, indent=2)
+        os.replace(tmp_path, schema_path)
+
+    def prune(self, name, keep=5):
+        """Delete the oldest versions of a feature set beyond ``keep``"""
+        for version in self.versions(name)[:-keep] if keep > 0 else self.versions(name):
+            shutil.rmtree(os.path.join(self.root, name, version), ignore_errors=True)
+
+
+def _file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
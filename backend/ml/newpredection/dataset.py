@@ -1,11 +1,29 @@
 # dataset.py
+import itertools
+import os
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
+from scipy import sparse
 import logging
 
+from ml.featurestore.store import FeatureSpec, FeatureStore
+from ml.featurestore.encoding import CategoricalEncoder, encode_chunks
+
 logging.basicConfig(level=logging.INFO)
 
+DATA_PATH = os.path.join(os.path.dirname(__file__), 'traffic_data.csv')
+
+# Same columns as pd.get_dummies(data, drop_first=True) on traffic_data.csv, minus the target
+TRAFFIC_PREDICTION_FEATURES = FeatureSpec(
+    'traffic_prediction',
+    numeric=['hour', 'day_of_week'],
+    categorical=['weather_condition'],
+    target='traffic_flow',
+    drop_first=True
+)
+
 def load_data(file_path):
     """
     Load the dataset from a CSV file.
@@ -18,33 +36,83 @@ def load_data(file_path):
         logging.error(f"Error loading data: {e}")
         raise
 
-def preprocess_data(data, target_column, scale_features=False):
+def preprocess_data(data, target_column, scale_features=False, encoder=None, encoding='onehot',
+                    return_encoder=False):
     """
     Preprocess the dataset: handle missing values, encode categorical variables, etc.
+    data: a DataFrame, or an iterable of DataFrame chunks (e.g. pd.read_csv(..., chunksize=...))
+    encoder: a fitted CategoricalEncoder to reuse (inference); by default one is
+        fitted on the object columns, with the same drop_first layout as get_dummies
+    encoding: 'onehot' (DataFrame with get_dummies columns), 'sparse' (CSR matrix)
+        or 'codes' (DataFrame with one integer code column per categorical column)
+    Numeric columns and the target keep their dtypes and index, and the one-hot
+    columns are bool, like get_dummies.
     """
     try:
-        # Fill missing values
-        data.fillna(method='ffill', inplace=True)
-        
-        # Convert categorical variables to numerical
-        data = pd.get_dummies(data, drop_first=True)
-        
-        # Separate features and target
-        X = data.drop(target_column, axis=1)
-        y = data[target_column]
-        
+        chunks = iter([data] if isinstance(data, pd.DataFrame) else data)
+        first = next(chunks, None)
+        if first is None:
+            raise ValueError("No data to preprocess")
+        chunks = itertools.chain([first], chunks)
+
+        if encoder is None:
+            categorical = [c for c in first.columns
+                           if c != target_column and first[c].dtype in (object, 'category')]
+            encoder = CategoricalEncoder(categorical, drop_first=True)
+            fit = True
+        else:
+            fit = False
+        numeric = [c for c in first.columns if c != target_column and c not in encoder.columns]
+
+        # Fill missing values and encode categorical variables in one pass over the chunks
+        X_numeric, codes, y = encode_chunks(chunks, encoder, numeric, target=target_column, fit=fit,
+                                            numeric_dtype=None, target_dtype=None)
+
+        if encoding == 'codes':
+            X = X_numeric.copy()
+            for j, column in enumerate(encoder.columns):
+                X[column] = codes[:, j]
+        elif encoding == 'sparse':
+            X = sparse.hstack([sparse.csr_matrix(X_numeric.to_numpy(dtype=np.float64)),
+                               encoder.one_hot_codes(codes)], format='csr')
+        else:
+            dummies = pd.DataFrame(encoder.one_hot_codes(codes).toarray().astype(bool),
+                                   columns=encoder.feature_names(), index=X_numeric.index)
+            X = pd.concat([X_numeric, dummies], axis=1)
+
         # Feature scaling (optional)
         if scale_features:
-            scaler = StandardScaler()
-            X = pd.DataFrame(scaler.fit_transform(X), columns=X.columns)
+            if encoding == 'sparse':
+                X = StandardScaler(with_mean=False).fit_transform(X)
+            else:
+                X = pd.DataFrame(StandardScaler().fit_transform(X), columns=X.columns)
             logging.info("Features scaled.")
-        
+
         logging.info("Data preprocessing completed.")
-        return X, y
+        return (X, y, encoder) if return_encoder else (X, y)
     except Exception as e:
         logging.error(f"Error preprocessing data: {e}")
         raise
 
+def load_features(file_path, scale_features=False, store=None):
+    """
+    Load the feature matrix for a CSV from the feature store, parsing and
+    encoding it only the first time. Column order and weather categories
+    are recorded in the store's schema, so they cannot drift between runs.
+    """
+    try:
+        features = (store or FeatureStore()).materialize(TRAFFIC_PREDICTION_FEATURES, file_path)
+        X = np.asarray(features.X)
+        y = np.asarray(features.y)
+        if scale_features:
+            X = StandardScaler().fit_transform(X)
+            logging.info("Features scaled.")
+        logging.info(f"Features loaded: {features.columns} (version {features.version}).")
+        return X, y
+    except Exception as e:
+        logging.error(f"Error loading features: {e}")
+        raise
+
 def split_data(X, y, test_size=0.2, random_state=42):
     """
     Split the dataset into training and testing sets.
@@ -1,15 +1,28 @@
 # train.py
 import logging
+import os
 import pandas as pd
 from sklearn.model_selection import train_test_split, GridSearchCV
 from sklearn.metrics import mean_absolute_error
 import xgboost as xgb
 import joblib
-from dataset import load_data, preprocess_data, split_data
+
+from ml.newpredection.dataset import DATA_PATH, load_features, split_data
 
 logging.basicConfig(level=logging.INFO)
 
-def train_model(X_train, y_train):
+MODEL_PATH = os.path.join(os.path.dirname(__file__), 'traffic_prediction_model.pkl')
+
+# Hyperparameter grid
+PARAM_GRID = {
+    'n_estimators': [50, 100, 200],
+    'max_depth': [3, 5, 7],
+    'learning_rate': [0.01, 0.1, 0.2],
+    'subsample': [0.8, 1.0],
+    'colsample_bytree': [0.8, 1.0]
+}
+
+def train_model(X_train, y_train, param_grid=None, n_jobs=-1):
     """
     Train an XGBoost Regressor model with hyperparameter tuning.
     """
@@ -17,17 +30,9 @@ def train_model(X_train, y_train):
         # Define the model
         model = xgb.XGBRegressor(random_state=42)
 
-        # Hyperparameter grid
-        param_grid = {
-            'n_estimators': [50, 100, 200],
-            'max_depth': [3, 5, 7],
-            'learning_rate': [0.01, 0.1, 0.2],
-            'subsample': [0.8, 1.0],
-            'colsample_bytree': [0.8, 1.0]
-        }
-
         # Grid search for hyperparameter tuning
-        grid_search = GridSearchCV(estimator=model, param_grid=param_grid, cv=3, scoring='neg_mean_absolute_error', n_jobs=-1)
+        grid_search = GridSearchCV(estimator=model, param_grid=param_grid or PARAM_GRID, cv=3,
+                                   scoring='neg_mean_absolute_error', n_jobs=n_jobs)
         grid_search.fit(X_train, y_train)
 
         # Best model
@@ -62,15 +67,11 @@ def save_model(model, file_path):
         logging.error(f"Error saving model: {e}")
         raise
 
-def main():
+def main(file_path=DATA_PATH, model_path=MODEL_PATH):
     try:
-        # Step 1: Load and preprocess data
-        file_path = 'traffic_data.csv'
-        logging.info("Loading data...")
-        data = load_data(file_path)
-        
-        logging.info("Preprocessing data...")
-        X, y = preprocess_data(data, target_column='traffic_flow', scale_features=True)
+        # Step 1: Load the preprocessed feature matrix
+        logging.info("Loading features...")
+        X, y = load_features(file_path, scale_features=True)
         
         # Step 2: Split data
         logging.info("Splitting data into training and testing sets...")
@@ -86,7 +87,7 @@ def main():
         
         # Step 5: Save the model
         logging.info("Saving the model...")
-        save_model(model, 'traffic_prediction_model.pkl')
+        save_model(model, model_path)
         
         logging.info("Training pipeline completed successfully.")
     except Exception as e:
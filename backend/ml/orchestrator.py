@@ -0,0 +1,531 @@
+"""
+Builds every model under ml/ as one dependency graph:
+
+    dataset -> features -> train -> evaluate -> publish
+
+per pipeline (traffic, prediction, sustainability, urban). Independent
+stages run concurrently in worker processes within a global core budget,
+and a stage is skipped when its code, parameters, input files and upstream
+outputs hash the same as on its last successful run.
+
+    python -m ml.orchestrator                      # everything
+    python -m ml.orchestrator traffic urban        # some pipelines
+    python -m ml.orchestrator --cores 4 --set traffic.train.n_estimators=200
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import joblib
+import numpy as np
+
+
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+BUILD_DIR = os.path.join(ML_DIR, 'build')
+MANIFEST_FILE = 'manifest.json'
+
+
+def _source(*parts):
+    return os.path.join(ML_DIR, *parts)
+
+
+def _dump(obj, path):
+    """joblib.dump through a temporary file, so readers never see a partial pickle"""
+    tmp_path = f'{path}.tmp-{os.getpid()}'
+    joblib.dump(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _stage_dir(build_dir, pipeline):
+    path = os.path.join(build_dir, pipeline)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+# Traffic analysis (trafficanalysis/): served through the ArtifactStore
+
+def traffic_dataset(params, upstream, n_jobs, build_dir):
+    from ml.trafficanalysis.train_traffic_model import DATA_PATH, ensure_dataset
+    return {'data_path': ensure_dataset(DATA_PATH, params['num_samples'])}, [DATA_PATH]
+
+
+def traffic_features(params, upstream, n_jobs, build_dir):
+    from ml.featurestore.store import FeatureStore, FEATURES_FILE
+    from ml.trafficanalysis.trafficanalysis import TRAFFIC_FEATURES
+    features = FeatureStore().materialize(TRAFFIC_FEATURES, upstream['traffic.dataset']['data_path'])
+    return {'feature_version': features.version, 'features_path': features.path}, [os.path.join(features.path, FEATURES_FILE)]
+
+
+def traffic_train(params, upstream, n_jobs, build_dir):
+    from ml.featurestore.store import FeatureMatrix
+    from ml.trafficanalysis.train_traffic_model import fit_model
+    features = FeatureMatrix(upstream['traffic.features']['features_path'])
+    model, scaler, holdout, scores = fit_model(np.asarray(features.X, dtype=np.float64), np.asarray(features.y),
+                                               params, n_jobs=n_jobs)
+    out = _stage_dir(build_dir, 'traffic')
+    paths = [os.path.join(out, name) for name in ('model.joblib', 'scaler.joblib', 'holdout.npy')]
+    _dump(model, paths[0])
+    _dump(scaler, paths[1])
+    np.save(paths[2], holdout)
+    return dict(scores, model_path=paths[0], scaler_path=paths[1], holdout_path=paths[2]), paths
+
+
+def traffic_evaluate(params, upstream, n_jobs, build_dir):
+    from ml.featurestore.store import FeatureMatrix
+    from ml.trafficanalysis.evaluation import error_sums, metrics_from_sums
+    trained = upstream['traffic.train']
+    features = FeatureMatrix(upstream['traffic.features']['features_path'])
+    holdout = np.load(trained['holdout_path'])
+    model, scaler = joblib.load(trained['model_path']), joblib.load(trained['scaler_path'])
+    X = np.asarray(features.X, dtype=np.float64)[holdout]
+    y = np.asarray(features.y, dtype=np.float64)[holdout]
+    metrics = metrics_from_sums(error_sums(y, model.predict((X - scaler.mean_) / scaler.scale_)))
+    return {'metrics': metrics}, []
+
+
+def traffic_compress(params, upstream, n_jobs, build_dir):
+    from ml.featurestore.store import FeatureMatrix
+    from ml.trafficanalysis.compression import compress_forest, compression_report, split_holdout
+    trained = upstream['traffic.train']
+    features = FeatureMatrix(upstream['traffic.features']['features_path'])
+    selection_rows, evaluation_rows = split_holdout(np.load(trained['holdout_path']))
+    model, scaler = joblib.load(trained['model_path']), joblib.load(trained['scaler_path'])
+    X = (np.asarray(features.X, dtype=np.float64) - scaler.mean_) / scaler.scale_
+    y = np.asarray(features.y, dtype=np.float64)
+    compressed, selection = compress_forest(model, scaler, X[selection_rows], y[selection_rows], params['tolerance'])
+    path = os.path.join(_stage_dir(build_dir, 'traffic'), 'compressed.joblib')
+    _dump(compressed, path)
+    report = compression_report(model, compressed, X[evaluation_rows], y[evaluation_rows])
+    return {'model_path': path, 'selection': selection, 'report': report}, [path]
+
+
+def traffic_publish(params, upstream, n_jobs, build_dir):
+    from ml.trafficanalysis.artifacts import MODEL_FILE
+    from ml.trafficanalysis.train_traffic_model import publish_model
+    trained, metrics = upstream['traffic.train'], upstream['traffic.evaluate']['metrics']
+    if params.get('min_r2') is not None and metrics['R2'] < params['min_r2']:
+        raise Exception(f"Holdout R² {metrics['R2']:.4f} is below min_r2 {params['min_r2']}; not published")
+    metadata = {
+        'data_path': upstream['traffic.dataset']['data_path'],
+        'feature_version': upstream['traffic.features']['feature_version'],
+        'train_r2': trained['train_r2'],
+        'test_r2': trained['test_r2'],
+        'holdout_metrics': metrics,
+        'update': 'orchestrator'
+    }
+    model_path = trained['model_path']
+    if params.get('compressed'):
+        compressed = upstream['traffic.compress']
+        model_path = compressed['model_path']
+        metadata.update(test_r2=compressed['report']['compressed']['r2'], trees=compressed['report']['compressed']['trees'],
+                        selection=compressed['selection'], compression=compressed['report'])
+    store, version = publish_model(joblib.load(model_path), joblib.load(trained['scaler_path']), metadata)
+    return {'version': version}, [os.path.join(store.version_path(version), MODEL_FILE)]
+
+
+# Traffic prediction (newpredection/): XGBoost grid search
+
+def prediction_features(params, upstream, n_jobs, build_dir):
+    from ml.featurestore.store import FeatureStore, FEATURES_FILE
+    from ml.newpredection.dataset import DATA_PATH, TRAFFIC_PREDICTION_FEATURES
+    features = FeatureStore().materialize(TRAFFIC_PREDICTION_FEATURES, DATA_PATH)
+    return {'data_path': DATA_PATH, 'feature_version': features.version}, [os.path.join(features.path, FEATURES_FILE)]
+
+
+def prediction_train(params, upstream, n_jobs, build_dir):
+    from ml.newpredection.dataset import load_features, split_data
+    from ml.newpredection.train import train_model
+    X, y = load_features(upstream['prediction.features']['data_path'], scale_features=True)
+    X_train, X_test, y_train, y_test = split_data(X, y)
+    model = train_model(X_train, y_train, param_grid=params.get('param_grid'), n_jobs=n_jobs)
+    path = os.path.join(_stage_dir(build_dir, 'prediction'), 'model.joblib')
+    _dump(model, path)
+    return {'model_path': path}, [path]
+
+
+def prediction_evaluate(params, upstream, n_jobs, build_dir):
+    from ml.newpredection.dataset import load_features, split_data
+    from ml.newpredection.train import evaluate_model
+    X, y = load_features(upstream['prediction.features']['data_path'], scale_features=True)
+    X_train, X_test, y_train, y_test = split_data(X, y)
+    mae = evaluate_model(joblib.load(upstream['prediction.train']['model_path']), X_test, y_test)
+    return {'metrics': {'MAE': float(mae)}}, []
+
+
+def prediction_publish(params, upstream, n_jobs, build_dir):
+    from ml.newpredection.train import MODEL_PATH
+    _dump(joblib.load(upstream['prediction.train']['model_path']), MODEL_PATH)
+    return {'model_path': MODEL_PATH}, [MODEL_PATH]
+
+
+# Sustainability (sustainablitycheck/): one forest per metric
+
+def sustainability_dataset(params, upstream, n_jobs, build_dir):
+    from ml.sustainablitycheck.create_sustainability_dataset import DATA_PATH, create_sustainability_data
+    if not os.path.exists(DATA_PATH):
+        create_sustainability_data(params['num_samples']).to_csv(DATA_PATH, index=False)
+    return {'data_path': DATA_PATH}, [DATA_PATH]
+
+
+def sustainability_train(params, upstream, n_jobs, build_dir):
+    from ml.sustainablitycheck.train_sustainability_model import load_dataset, split_dataset, train_models
+    X, Y = load_dataset(upstream['sustainability.dataset']['data_path'])
+    X_train, X_test, Y_train, Y_test = split_dataset(X, Y)
+    models = train_models(X_train, Y_train, params, n_jobs=n_jobs)
+    out = _stage_dir(build_dir, 'sustainability')
+    paths = [os.path.join(out, 'models.joblib'), os.path.join(out, 'holdout.npy')]
+    _dump(models, paths[0])
+    np.save(paths[1], X_test.index.to_numpy())
+    return {'models_path': paths[0], 'holdout_path': paths[1]}, paths
+
+
+def sustainability_evaluate(params, upstream, n_jobs, build_dir):
+    from ml.sustainablitycheck.train_sustainability_model import evaluate_models, load_dataset
+    X, Y = load_dataset(upstream['sustainability.dataset']['data_path'])
+    holdout = np.load(upstream['sustainability.train']['holdout_path'])
+    models = joblib.load(upstream['sustainability.train']['models_path'])
+    return {'metrics': {f'{target}_MAE': mae for target, mae in
+                        evaluate_models(models, X.loc[holdout], Y.loc[holdout]).items()}}, []
+
+
+def sustainability_publish(params, upstream, n_jobs, build_dir):
+    from ml.sustainablitycheck.train_sustainability_model import MODEL_DIR, TARGETS
+    models = joblib.load(upstream['sustainability.train']['models_path'])
+    paths = []
+    for target, model in models.items():
+        paths.append(os.path.join(MODEL_DIR, TARGETS[target][0]))
+        _dump(model, paths[-1])
+    return {'model_paths': paths}, paths
+
+
+# Urban optimization (urban_analysis/): suggestion classifier
+
+def urban_dataset(params, upstream, n_jobs, build_dir):
+    from ml.urban_analysis.create_urban_dataset import DATA_PATH, create_urban_data
+    if not os.path.exists(DATA_PATH):
+        create_urban_data(params['num_samples']).to_csv(DATA_PATH, index=False)
+    return {'data_path': DATA_PATH}, [DATA_PATH]
+
+
+def urban_features(params, upstream, n_jobs, build_dir):
+    from ml.featurestore.store import FeatureStore, FEATURES_FILE
+    from ml.urban_analysis.train_urban_model import URBAN_FEATURES
+    features = FeatureStore().materialize(URBAN_FEATURES, upstream['urban.dataset']['data_path'])
+    return {'feature_version': features.version, 'features_path': features.path}, [os.path.join(features.path, FEATURES_FILE)]
+
+
+def urban_train(params, upstream, n_jobs, build_dir):
+    from ml.featurestore.store import FeatureMatrix
+    from ml.urban_analysis.train_urban_model import fit_model
+    features = FeatureMatrix(upstream['urban.features']['features_path'])
+    model, holdout, accuracy = fit_model(np.asarray(features.X), features.target_labels(), params, n_jobs=n_jobs)
+    out = _stage_dir(build_dir, 'urban')
+    paths = [os.path.join(out, 'model.joblib'), os.path.join(out, 'holdout.npy')]
+    _dump(model, paths[0])
+    np.save(paths[1], holdout)
+    return {'model_path': paths[0], 'holdout_path': paths[1], 'test_accuracy': accuracy}, paths
+
+
+def urban_evaluate(params, upstream, n_jobs, build_dir):
+    from sklearn.metrics import accuracy_score, f1_score
+    from ml.featurestore.store import FeatureMatrix
+    features = FeatureMatrix(upstream['urban.features']['features_path'])
+    holdout = np.load(upstream['urban.train']['holdout_path'])
+    y_true = features.target_labels()[holdout]
+    y_pred = joblib.load(upstream['urban.train']['model_path']).predict(np.asarray(features.X)[holdout])
+    return {'metrics': {'accuracy': float(accuracy_score(y_true, y_pred)),
+                        'macro_f1': float(f1_score(y_true, y_pred, average='macro'))}}, []
+
+
+def urban_publish(params, upstream, n_jobs, build_dir):
+    from ml.urban_analysis.train_urban_model import MODEL_PATH
+    _dump(joblib.load(upstream['urban.train']['model_path']), MODEL_PATH)
+    return {'model_path': MODEL_PATH}, [MODEL_PATH]
+
+
+def urban_suggestions(params, upstream, n_jobs, build_dir):
+    import pandas as pd
+    from ml.urban_analysis.serving import CACHE_PATH, UrbanSuggestionCache
+    cache = UrbanSuggestionCache.load(upstream['urban.publish']['model_path'], top_k=params['top_k'])
+    cache.restore(CACHE_PATH)
+    stats = cache.refresh(pd.read_csv(_source('urban_analysis', 'zones.csv')))
+    cache.save(CACHE_PATH)
+    return stats, [CACHE_PATH]
+
+
+class Stage:
+    """
+    One node of the build graph. ``func(params, upstream, n_jobs, build_dir)``
+    returns a JSON-able result and the files it wrote; ``code`` and
+    ``inputs`` are files whose contents are part of the stage's cache key.
+    ``optional_deps`` maps further upstream stages to the parameter that
+    makes the stage need them.
+    """
+
+    def __init__(self, name, func, deps=(), params=None, code=(), inputs=(), cores=1, optional_deps=None):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.optional_deps = dict(optional_deps or {})
+        self.params = dict(params or {})
+        self.code = [_source(path) for path in code] + [os.path.abspath(__file__)]
+        self.inputs = [_source(path) for path in inputs]
+        self.cores = cores
+
+    @property
+    def pipeline(self):
+        return self.name.split('.')[0]
+
+
+# Training stages use scikit-learn's n_jobs; everything else is single-threaded
+TRAIN_CORES = 2
+
+STAGES = [
+    Stage('traffic.dataset', traffic_dataset, params={'num_samples': 1000},
+          code=['trafficanalysis/create_traffic_dataset.py']),
+    Stage('traffic.features', traffic_features, ['traffic.dataset'],
+          code=['featurestore/store.py', 'featurestore/encoding.py', 'trafficanalysis/trafficanalysis.py']),
+    Stage('traffic.train', traffic_train, ['traffic.features'], code=['trafficanalysis/train_traffic_model.py'],
+          params={'n_estimators': 100, 'max_depth': 10, 'min_samples_split': 5, 'min_samples_leaf': 2,
+                  'random_state': 42},
+          cores=TRAIN_CORES),
+    Stage('traffic.evaluate', traffic_evaluate, ['traffic.features', 'traffic.train'],
+          code=['trafficanalysis/evaluation.py']),
+    Stage('traffic.compress', traffic_compress, ['traffic.features', 'traffic.train'],
+          params={'tolerance': 0.005}, code=['trafficanalysis/compression.py', 'trafficanalysis/forest.py']),
+    Stage('traffic.publish', traffic_publish,
+          ['traffic.dataset', 'traffic.features', 'traffic.train', 'traffic.evaluate'],
+          params={'min_r2': None, 'compressed': False}, code=['trafficanalysis/artifacts.py'],
+          optional_deps={'traffic.compress': 'compressed'}),
+
+    Stage('prediction.features', prediction_features, inputs=['newpredection/traffic_data.csv'],
+          code=['featurestore/store.py', 'featurestore/encoding.py', 'newpredection/dataset.py']),
+    Stage('prediction.train', prediction_train, ['prediction.features'],
+          code=['newpredection/train.py', 'newpredection/dataset.py'], params={'param_grid': None},
+          cores=TRAIN_CORES),
+    Stage('prediction.evaluate', prediction_evaluate, ['prediction.features', 'prediction.train']),
+    Stage('prediction.publish', prediction_publish, ['prediction.train', 'prediction.evaluate']),
+
+    Stage('sustainability.dataset', sustainability_dataset, params={'num_samples': 1000},
+          code=['sustainablitycheck/create_sustainability_dataset.py']),
+    Stage('sustainability.train', sustainability_train, ['sustainability.dataset'],
+          code=['sustainablitycheck/train_sustainability_model.py'],
+          params={'n_estimators': 100, 'random_state': 42}, cores=TRAIN_CORES),
+    Stage('sustainability.evaluate', sustainability_evaluate, ['sustainability.dataset', 'sustainability.train']),
+    Stage('sustainability.publish', sustainability_publish, ['sustainability.train', 'sustainability.evaluate']),
+
+    Stage('urban.dataset', urban_dataset, params={'num_samples': 1000},
+          code=['urban_analysis/create_urban_dataset.py']),
+    Stage('urban.features', urban_features, ['urban.dataset'],
+          code=['featurestore/store.py', 'featurestore/encoding.py', 'urban_analysis/train_urban_model.py']),
+    Stage('urban.train', urban_train, ['urban.features'], code=['urban_analysis/train_urban_model.py'],
+          params={'n_estimators': 100, 'random_state': 42}, cores=TRAIN_CORES),
+    Stage('urban.evaluate', urban_evaluate, ['urban.features', 'urban.train']),
+    Stage('urban.publish', urban_publish, ['urban.train', 'urban.evaluate']),
+    Stage('urban.suggestions', urban_suggestions, ['urban.publish'], params={'top_k': 3},
+          code=['urban_analysis/serving.py'], inputs=['urban_analysis/zones.csv']),
+]
+
+
+def _execute(func, params, upstream, n_jobs, build_dir):
+    """Run one stage in a worker, with native thread pools held to its cores"""
+    from threadpoolctl import threadpool_limits
+    started = time.perf_counter()
+    with threadpool_limits(limits=n_jobs):
+        result, outputs = func(params, upstream, n_jobs, build_dir)
+    return result, [os.path.abspath(path) for path in outputs], time.perf_counter() - started
+
+
+class Orchestrator:
+    """Schedules the stages of ``STAGES`` (or a subset) on a process pool"""
+
+    def __init__(self, stages=None, build_dir=None, cores=None, overrides=None):
+        self.stages = {stage.name: stage for stage in (stages or STAGES)}
+        self.build_dir = build_dir or BUILD_DIR
+        self.cores = max(1, cores or os.cpu_count() or 1)
+        self.overrides = overrides or {}
+        self.manifest = self._load_manifest()
+        self._hashes = {}
+
+    def _load_manifest(self):
+        try:
+            with open(os.path.join(self.build_dir, MANIFEST_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self):
+        os.makedirs(self.build_dir, exist_ok=True)
+        path = os.path.join(self.build_dir, MANIFEST_FILE)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def file_hash(self, path):
+        """Content hash of a file, memoized on its size and modification time"""
+        stat = os.stat(path)
+        key = (path, stat.st_size, stat.st_mtime_ns)
+        if key not in self._hashes:
+            digest = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+            self._hashes[key] = digest.hexdigest()
+        return self._hashes[key]
+
+    def params(self, stage):
+        params = dict(stage.params, **self.overrides.get(stage.name, {}))
+        params.pop('cores', None)
+        return params
+
+    def stage_cores(self, stage):
+        return max(1, min(int(self.overrides.get(stage.name, {}).get('cores', stage.cores)), self.cores))
+
+    def deps(self, stage):
+        """Upstream stages of ``stage`` under the current parameters"""
+        params = self.params(stage)
+        return stage.deps + [dep for dep, param in stage.optional_deps.items() if params.get(param)]
+
+    def select(self, pipelines=None):
+        """Stage names of the given pipelines (all by default) and their dependencies, in topological order"""
+        wanted = [name for name, stage in self.stages.items() if not pipelines or stage.pipeline in pipelines]
+        order, seen = [], set()
+
+        def visit(name):
+            if name not in seen:
+                seen.add(name)
+                for dep in self.deps(self.stages[name]):
+                    visit(dep)
+                order.append(name)
+
+        for name in wanted:
+            visit(name)
+        return order
+
+    def cache_key(self, stage):
+        """Hash of everything a stage's outputs depend on; its upstream stages must be complete"""
+        payload = {
+            'stage': stage.name,
+            'params': self.params(stage),
+            'code': {path: self.file_hash(path) for path in stage.code},
+            'inputs': {path: self.file_hash(path) for path in stage.inputs},
+            'upstream': {dep: {'result': self.manifest[dep]['result'], 'outputs': self.manifest[dep]['outputs']}
+                         for dep in self.deps(stage)}
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    def is_cached(self, stage, key):
+        entry = self.manifest.get(stage.name)
+        if entry is None or entry['key'] != key:
+            return False
+        return all(os.path.exists(path) and self.file_hash(path) == digest for path, digest in entry['outputs'].items())
+
+    def run(self, pipelines=None, force=False):
+        """Build the selected stages; returns {stage: 'cached' | 'built' | 'failed' | 'blocked'}"""
+        pending = self.select(pipelines)
+        status, running, used = {}, {}, 0
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=self.cores, mp_context=context) as pool:
+            while pending or running:
+                for name in list(pending):
+                    stage = self.stages[name]
+                    if any(status.get(dep) in ('failed', 'blocked') for dep in self.deps(stage)):
+                        pending.remove(name)
+                        status[name] = 'blocked'
+                        print(f"[blocked] {name}")
+                        continue
+                    if not all(status.get(dep) in ('cached', 'built') for dep in self.deps(stage)):
+                        continue
+                    key = self.cache_key(stage)
+                    if not force and self.is_cached(stage, key):
+                        pending.remove(name)
+                        status[name] = 'cached'
+                        print(f"[cached] {name}")
+                        continue
+                    cores = self.stage_cores(stage)
+                    if used + cores > self.cores:
+                        continue
+                    upstream = {dep: self.manifest[dep]['result'] for dep in self.deps(stage)}
+                    future = pool.submit(_execute, stage.func, self.params(stage), upstream, cores, self.build_dir)
+                    running[future] = (name, key, cores)
+                    used += cores
+                    pending.remove(name)
+                    print(f"[start] {name} ({cores} core{'s' if cores > 1 else ''})")
+
+                if not running:
+                    # Everything left was resolved from the cache or blocked in this pass
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, key, cores = running.pop(future)
+                    used -= cores
+                    try:
+                        result, outputs, seconds = future.result()
+                    except Exception as e:
+                        status[name] = 'failed'
+                        print(f"[failed] {name}: {e}")
+                        continue
+                    self.manifest[name] = {
+                        'key': key,
+                        'result': result,
+                        'outputs': {path: self.file_hash(path) for path in outputs},
+                        'seconds': seconds,
+                        'built_at': time.time()
+                    }
+                    self._save_manifest()
+                    status[name] = 'built'
+                    print(f"[built] {name} in {seconds:.1f}s")
+        return status
+
+
+def parse_overrides(assignments):
+    """``stage.param=value`` pairs (values parsed as JSON when possible) into {stage: {param: value}}"""
+    overrides = {}
+    for assignment in assignments:
+        target, _, value = assignment.partition('=')
+        stage, _, param = target.rpartition('.')
+        if not stage or not param:
+            raise ValueError(f"Expected stage.param=value, got {assignment}")
+        try:
+            value = json.loads(value)
+        except ValueError:
+            pass
+        overrides.setdefault(stage, {})[param] = value
+    return overrides
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the ml/ datasets, features and models")
+    parser.add_argument('pipelines', nargs='*', help="traffic, prediction, sustainability and/or urban (default: all)")
+    parser.add_argument('--cores', type=int, default=None, help="Total cores for concurrent stages (default: all)")
+    parser.add_argument('--set', action='append', default=[], metavar='STAGE.PARAM=VALUE',
+                        help="Override a stage parameter, e.g. traffic.train.n_estimators=200 "
+                             "(STAGE.cores sets the stage's share of the core budget)")
+    parser.add_argument('--force', action='store_true', help="Rebuild stages even when their inputs are unchanged")
+    parser.add_argument('--build-dir', default=None, help="Where intermediate models and the manifest are kept")
+    args = parser.parse_args(argv)
+
+    orchestrator = Orchestrator(build_dir=args.build_dir, cores=args.cores, overrides=parse_overrides(args.set))
+    unknown = set(args.pipelines) - {stage.pipeline for stage in orchestrator.stages.values()}
+    if unknown:
+        parser.error(f"Unknown pipelines: {', '.join(sorted(unknown))}")
+    unknown = set(orchestrator.overrides) - set(orchestrator.stages)
+    if unknown:
+        parser.error(f"Unknown stages: {', '.join(sorted(unknown))}")
+
+    started = time.perf_counter()
+    status = orchestrator.run(args.pipelines, force=args.force)
+    counts = {state: sum(1 for s in status.values() if s == state) for state in ('built', 'cached', 'failed', 'blocked')}
+    print(f"{len(status)} stages in {time.perf_counter() - started:.1f}s: "
+          + ", ".join(f"{count} {state}" for state, count in counts.items()))
+    return 1 if counts['failed'] or counts['blocked'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
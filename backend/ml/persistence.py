@@ -0,0 +1,257 @@
+import asyncio
+import csv
+import fcntl
+import io
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from ml.trafficanalysis.artifacts import _fsync_dir
+
+# When a commit fsyncs the file: every commit, at most once per fsync_interval, or never (left to the OS)
+FSYNC_POLICIES = ('always', 'interval', 'never')
+
+# Most rows written by one commit
+MAX_COMMIT_ROWS = 10_000
+
+
+def _in_loop(loop):
+    try:
+        return asyncio.get_running_loop() is loop
+    except RuntimeError:
+        return False
+
+
+class WriteBehindLog:
+    """
+    Append-only CSV written behind the request path.
+
+    ``append(row)`` only puts the row on an asyncio queue and returns. A
+    single writer task, started on the first append made inside a running
+    event loop, waits ``commit_interval_ms`` after the first queued row and
+    then writes everything queued by then as one group commit: the rows are
+    encoded together and appended with a single ``write`` on a worker thread,
+    under an exclusive ``flock`` so processes sharing the file never
+    interleave. Under load a commit carries many rows, so throughput grows
+    with concurrency instead of paying one disk write per request.
+
+    Every commit appends whole lines, so a crash can at most leave a torn
+    last line; it is cut off before the next commit. A missing file is
+    created with its header through a temporary file linked into place.
+    ``fsync`` is one of FSYNC_POLICIES.
+
+    Appends made outside an event loop (scripts, benchmarks) commit
+    synchronously. ``close()`` commits whatever is still queued.
+    """
+
+    def __init__(self, path, columns, commit_interval_ms=50, fsync='always', fsync_interval=1.0, window=10000):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync}")
+        self.path = os.path.abspath(path)
+        self.columns = list(columns)
+        self.commit_interval = commit_interval_ms / 1000
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self._queue = None
+        self._loop = None
+        self._writer = None
+        # Rows the writer has taken off the queue but not yet handed to a commit
+        self._batch = None
+        self._file_lock = threading.Lock()
+        self._file_columns = None
+        self._last_commit = 0.0
+        self._last_fsync = 0.0
+
+        # Statistics, commit timings kept for the most recent `window` commits
+        self.rows = 0
+        self.commits = 0
+        self.fsyncs = 0
+        self.errors = 0
+        self.repaired_bytes = 0
+        self._commit_rows = deque(maxlen=window)
+        self._commit_times = deque(maxlen=window)
+
+    @classmethod
+    def from_env(cls, path, columns):
+        """Build a log from PERSIST_COMMIT_MS, PERSIST_FSYNC and PERSIST_FSYNC_INTERVAL"""
+        return cls(
+            path, columns,
+            commit_interval_ms=float(os.environ.get('PERSIST_COMMIT_MS', 50)),
+            fsync=os.environ.get('PERSIST_FSYNC', 'always'),
+            fsync_interval=float(os.environ.get('PERSIST_FSYNC_INTERVAL', 1.0))
+        )
+
+    @property
+    def running(self):
+        return self._writer is not None and not self._writer.done()
+
+    def append(self, row):
+        """Queue one row (a dict keyed by column) for the next group commit"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        if self._loop is not None and (self._loop.is_closed() or not self._loop.is_running()):
+            # The loop the writer ran on is gone; commit what it left behind
+            self.close()
+        if loop is not None and self._loop is None:
+            self._start(loop)
+
+        if self._loop is None:
+            self._commit([row])
+        elif loop is self._loop:
+            self._queue.put_nowait(row)
+        else:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, row)
+
+    def _start(self, loop):
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._writer = loop.create_task(self._drain())
+
+    async def _drain(self):
+        """The writer task: one commit per group of queued rows"""
+        loop = asyncio.get_running_loop()
+        while True:
+            self._batch = [await self._queue.get()]
+            if self.commit_interval > 0:
+                await asyncio.sleep(self.commit_interval)
+            while not self._queue.empty() and len(self._batch) < MAX_COMMIT_ROWS:
+                self._batch.append(self._queue.get_nowait())
+            batch, self._batch = self._batch, None
+            try:
+                await loop.run_in_executor(None, self._commit, batch)
+            except Exception as e:
+                print(f"Warning: Could not persist {len(batch)} rows to {self.path}: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def flush(self):
+        """Wait until every row queued so far has been committed"""
+        if self.running:
+            await self._queue.join()
+
+    def close(self):
+        """Stop the writer and commit the rows it had not written yet"""
+        rows = []
+        if self._writer is not None:
+            if not self._writer.done() and not self._loop.is_closed():
+                if _in_loop(self._loop):
+                    self._writer.cancel()
+                else:
+                    self._loop.call_soon_threadsafe(self._writer.cancel)
+            rows.extend(self._batch or ())
+            while not self._queue.empty():
+                rows.append(self._queue.get_nowait())
+            self._writer = self._queue = self._loop = self._batch = None
+        if rows:
+            self._commit(rows)
+        if self.fsync != 'never' and self.commits and self._last_fsync < self._last_commit:
+            with self._file_lock, open(self.path, 'rb') as f:
+                os.fsync(f.fileno())
+                self._last_fsync = time.monotonic()
+                self.fsyncs += 1
+
+    def _create(self):
+        """Create the file with its header in one step, so no reader sees it headerless"""
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{self.path}.tmp-{os.getpid()}-{threading.get_ident()}'
+        with open(tmp_path, 'w', newline='') as f:
+            csv.writer(f, lineterminator='\n').writerow(self.columns)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            # Another process may have created it meanwhile; keep theirs
+            os.link(tmp_path, self.path)
+            _fsync_dir(directory)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp_path)
+
+    def _prepare(self, fd):
+        """Read the file's column order and cut off a torn last line left by a crash"""
+        size = os.fstat(fd).st_size
+        if size == 0:
+            self._file_columns = self.columns
+            os.write(fd, self._encode([dict(zip(self.columns, self.columns))]))
+            return
+        if self._file_columns is None:
+            with open(self.path, newline='') as f:
+                self._file_columns = next(csv.reader(f))
+        tail = os.pread(fd, min(size, 1 << 16), max(size - (1 << 16), 0))
+        if not tail.endswith(b'\n'):
+            end = size - len(tail) + tail.rfind(b'\n') + 1
+            if end > 0:
+                print(f"Warning: Dropping {size - end} bytes of an incomplete last row in {self.path}")
+                os.ftruncate(fd, end)
+                self.repaired_bytes += size - end
+            else:
+                # Only a header without its newline
+                os.write(fd, b'\n')
+
+    def _encode(self, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        for row in rows:
+            writer.writerow([row.get(column, '') for column in self._file_columns])
+        return buffer.getvalue().encode()
+
+    def _commit(self, rows):
+        """Append ``rows`` with one write, fsyncing as the policy asks"""
+        started = time.perf_counter()
+        with self._file_lock:
+            if not os.path.exists(self.path):
+                self._create()
+            fd = os.open(self.path, os.O_RDWR | os.O_APPEND)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                self._prepare(fd)
+                data = self._encode(rows)
+                written = 0
+                while written < len(data):
+                    written += os.write(fd, data[written:])
+                now = time.monotonic()
+                if self.fsync == 'always' or (self.fsync == 'interval' and now - self._last_fsync >= self.fsync_interval):
+                    os.fsync(fd)
+                    self._last_fsync = now
+                    self.fsyncs += 1
+            except Exception:
+                self.errors += len(rows)
+                raise
+            finally:
+                os.close(fd)
+            self._last_commit = time.monotonic()
+            self.rows += len(rows)
+            self.commits += 1
+            self._commit_rows.append(len(rows))
+            self._commit_times.append(time.perf_counter() - started)
+
+    def stats(self):
+        """Commit size and latency statistics over the recent window"""
+        def percentiles(values):
+            if not values:
+                return {}
+            values = np.asarray(values) * 1000
+            return {f'p{q}': float(np.percentile(values, q)) for q in (50, 90, 99)}
+
+        return {
+            'path': self.path,
+            'running': self.running,
+            'fsync': self.fsync,
+            'commit_interval_ms': self.commit_interval * 1000,
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+            'rows': self.rows,
+            'commits': self.commits,
+            'fsyncs': self.fsyncs,
+            'errors': self.errors,
+            'repaired_bytes': self.repaired_bytes,
+            'mean_commit_rows': float(np.mean(self._commit_rows)) if self._commit_rows else 0.0,
+            'commit_ms': percentiles(self._commit_times)
+        }
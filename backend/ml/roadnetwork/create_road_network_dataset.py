@@ -0,0 +1,62 @@
+# create_road_network_dataset.py
+import os
+import numpy as np
+import pandas as pd
+
+def create_synthetic_road_network(grid_rows=30, grid_cols=30, spacing_m=250, seed=42):
+    """
+    Create a synthetic grid city as node and edge lists.
+    Every street segment is stored once per direction, in the same layout
+    an OSM extract would be converted to (node_id, x, y / edge_id, source, target, ...).
+    """
+    rng = np.random.default_rng(seed)
+
+    # Nodes on a jittered grid, coordinates in metres
+    rows, cols = np.meshgrid(np.arange(grid_rows), np.arange(grid_cols), indexing='ij')
+    node_id = np.arange(grid_rows * grid_cols)
+    x = cols.ravel() * spacing_m + rng.normal(0, spacing_m * 0.05, node_id.size)
+    y = rows.ravel() * spacing_m + rng.normal(0, spacing_m * 0.05, node_id.size)
+    nodes = pd.DataFrame({'node_id': node_id, 'x': x.round(2), 'y': y.round(2)})
+
+    # Horizontal and vertical neighbours, then both directions
+    grid = node_id.reshape(grid_rows, grid_cols)
+    a = np.concatenate([grid[:, :-1].ravel(), grid[:-1, :].ravel()])
+    b = np.concatenate([grid[:, 1:].ravel(), grid[1:, :].ravel()])
+    source = np.concatenate([a, b])
+    target = np.concatenate([b, a])
+
+    # Road type by position: 1:Highway ring, 4:Downtown core, 2:Main Street every 5th line, else 3:Residential
+    r, c = rows.ravel(), cols.ravel()
+    on_ring = (np.minimum(r[source], r[target]) == 0) | (np.maximum(r[source], r[target]) == grid_rows - 1) | \
+              (np.minimum(c[source], c[target]) == 0) | (np.maximum(c[source], c[target]) == grid_cols - 1)
+    centre_r, centre_c = (grid_rows - 1) / 2, (grid_cols - 1) / 2
+    dist = np.hypot(r[source] - centre_r, c[source] - centre_c)
+    downtown = dist < min(grid_rows, grid_cols) / 6
+    main_street = (r[source] % 5 == 0) & (r[target] % 5 == 0) | (c[source] % 5 == 0) & (c[target] % 5 == 0)
+    road_type = np.full(source.size, 3)
+    road_type[main_street] = 2
+    road_type[downtown] = 4
+    road_type[on_ring] = 1
+
+    speed_kmh = np.select([road_type == 1, road_type == 2, road_type == 4], [80, 50, 30], default=40)
+    length_m = np.hypot(x[target] - x[source], y[target] - y[source])
+    base_volume = np.select([road_type == 1, road_type == 2, road_type == 4], [600, 400, 450], default=150)
+    vehicle_count = np.clip(rng.normal(base_volume, base_volume * 0.2), 0, 1000).astype(int)
+
+    edges = pd.DataFrame({
+        'edge_id': np.arange(source.size),
+        'source': source,
+        'target': target,
+        'length_m': length_m.round(2),
+        'speed_kmh': speed_kmh,
+        'road_type': road_type,
+        'vehicle_count': vehicle_count
+    })
+    return nodes, edges
+
+if __name__ == "__main__":
+    nodes, edges = create_synthetic_road_network()
+    output_dir = os.path.dirname(__file__)
+    nodes.to_csv(os.path.join(output_dir, 'nodes.csv'), index=False)
+    edges.to_csv(os.path.join(output_dir, 'edges.csv'), index=False)
+    print(f"Road network with {len(nodes)} nodes and {len(edges)} edges saved to {output_dir}")
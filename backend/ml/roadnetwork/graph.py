@@ -0,0 +1,191 @@
+import os
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+DATA_DIR = os.path.dirname(__file__)
+
+
+class RoadGraph:
+    """
+    Directed road network in CSR form.
+
+    Nodes are intersections and edges are road segments. Edges are stored
+    sorted by source node, so the outgoing segments of node ``i`` are
+    ``indptr[i]:indptr[i + 1]`` and every per-edge array (``targets``,
+    ``length_m``, ``road_type``...) is indexed in that same order.
+    """
+
+    def __init__(self, node_ids, x, y, sources, targets, edge_ids, edge_attributes):
+        self.node_ids = np.asarray(node_ids, dtype=np.int64)
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.n_nodes = self.node_ids.size
+
+        # Map external node ids to dense indices once, vectorized
+        self._id_order = np.argsort(self.node_ids, kind='stable')
+        self._sorted_ids = self.node_ids[self._id_order]
+        src = self.node_index(sources)
+        dst = self.node_index(targets)
+
+        order = np.argsort(src, kind='stable')
+        self.sources = src[order].astype(np.int32)
+        self.targets = dst[order].astype(np.int32)
+        self.edge_ids = np.asarray(edge_ids, dtype=np.int64)[order]
+        self.n_edges = self.sources.size
+        self.indptr = np.zeros(self.n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.sources, minlength=self.n_nodes), out=self.indptr[1:])
+        self.edge_attributes = {name: np.asarray(values)[order] for name, values in edge_attributes.items()}
+
+        self._segment_adjacency = None
+        self._node_adjacency = None
+
+    @classmethod
+    def from_csv(cls, nodes_path=None, edges_path=None):
+        """Load a node list (node_id, x, y) and an edge list (edge_id, source, target, ...)"""
+        nodes_path = nodes_path or os.path.join(DATA_DIR, 'nodes.csv')
+        edges_path = edges_path or os.path.join(DATA_DIR, 'edges.csv')
+        nodes = pd.read_csv(nodes_path)
+        edges = pd.read_csv(edges_path)
+        if 'edge_id' not in edges.columns:
+            edges['edge_id'] = np.arange(len(edges))
+        attributes = {name: edges[name].to_numpy()
+                      for name in edges.columns if name not in ('edge_id', 'source', 'target')}
+        return cls(nodes['node_id'].to_numpy(), nodes['x'].to_numpy(), nodes['y'].to_numpy(),
+                   edges['source'].to_numpy(), edges['target'].to_numpy(), edges['edge_id'].to_numpy(),
+                   attributes)
+
+    def node_index(self, node_ids):
+        """Dense indices for external node ids (array or scalar)"""
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        positions = np.searchsorted(self._sorted_ids, node_ids)
+        positions = np.minimum(positions, self.n_nodes - 1)
+        if np.any(self._sorted_ids[positions] != node_ids):
+            missing = np.atleast_1d(node_ids)[np.atleast_1d(self._sorted_ids[positions] != node_ids)]
+            raise KeyError(f"Unknown node id(s): {missing[:5].tolist()}")
+        return self._id_order[positions]
+
+    def out_edges(self, node):
+        """Edge indices leaving the node at dense index ``node``"""
+        return np.arange(self.indptr[node], self.indptr[node + 1])
+
+    def segment_features(self, time_of_day, day_of_week, weather_condition):
+        """
+        Feature matrix for TrafficAnalyzer with one row per segment, in
+        ``FEATURE_COLUMNS`` order (time_of_day, day_of_week, vehicle_count,
+        weather_condition, road_type)
+        """
+        features = np.empty((self.n_edges, 5), dtype=np.float64)
+        features[:, 0] = time_of_day
+        features[:, 1] = day_of_week
+        features[:, 2] = self.edge_attributes['vehicle_count']
+        features[:, 3] = weather_condition
+        features[:, 4] = self.edge_attributes['road_type']
+        return features
+
+    @property
+    def segment_adjacency(self):
+        """
+        Row-normalized (edges x edges) matrix with ``A[e, f] > 0`` when segment
+        ``f`` continues from the end of segment ``e`` (U-turns excluded)
+        """
+        if self._segment_adjacency is None:
+            # Segments leaving each segment's end node, via the CSR offsets
+            counts = self.indptr[self.targets + 1] - self.indptr[self.targets]
+            rows = np.repeat(np.arange(self.n_edges), counts)
+            starts = np.repeat(self.indptr[self.targets], counts)
+            offsets = np.arange(rows.size) - np.repeat(np.cumsum(counts) - counts, counts)
+            cols = starts + offsets
+            keep = self.targets[cols] != self.sources[rows]
+            rows, cols = rows[keep], cols[keep]
+            degree = np.bincount(rows, minlength=self.n_edges).astype(np.float64)
+            weights = 1.0 / degree[rows]
+            self._segment_adjacency = sparse.csr_matrix(
+                (weights, (rows, cols)), shape=(self.n_edges, self.n_edges))
+        return self._segment_adjacency
+
+    @property
+    def node_adjacency(self):
+        """Symmetric boolean (nodes x nodes) adjacency used for hop queries"""
+        if self._node_adjacency is None:
+            directed = sparse.csr_matrix(
+                (np.ones(self.n_edges, dtype=bool), self.targets, self.indptr),
+                shape=(self.n_nodes, self.n_nodes))
+            self._node_adjacency = (directed + directed.T).tocsr()
+        return self._node_adjacency
+
+    def propagate_congestion(self, congestion, alpha=0.5, iterations=3):
+        """
+        Spread congestion upstream: each segment mixes its own predicted level
+        with the mean level of the segments it feeds into,
+        ``c <- (1 - alpha) * c0 + alpha * A @ c``, repeated ``iterations`` times
+        """
+        base = np.asarray(congestion, dtype=np.float64)
+        adjacency = self.segment_adjacency
+        # Dead-end segments have no downstream neighbours and keep their own level
+        has_downstream = np.diff(adjacency.indptr) > 0
+        current = base
+        for _ in range(iterations):
+            downstream = adjacency @ current
+            current = np.where(has_downstream, (1 - alpha) * base + alpha * downstream, base)
+        return np.clip(current, 0.0, 1.0)
+
+    def hop_distances(self, node_id, k):
+        """Hop count from ``node_id`` to every node within ``k`` hops (-1 beyond), ignoring direction"""
+        adjacency = self.node_adjacency
+        hops = np.full(self.n_nodes, -1, dtype=np.int32)
+        frontier = np.atleast_1d(self.node_index(node_id))
+        hops[frontier] = 0
+        for hop in range(1, k + 1):
+            neighbours = np.unique(adjacency[frontier].indices)
+            frontier = neighbours[hops[neighbours] < 0]
+            if frontier.size == 0:
+                break
+            hops[frontier] = hop
+        return hops
+
+    def congestion_within(self, node_id, k, congestion):
+        """
+        Segments whose start node lies within ``k`` hops of ``node_id``, with
+        their hop distance and congestion level
+        """
+        hops = self.hop_distances(node_id, k)
+        edges = np.flatnonzero(hops[self.sources] >= 0)
+        return {
+            'edges': edges,
+            'edge_ids': self.edge_ids[edges],
+            'source_ids': self.node_ids[self.sources[edges]],
+            'target_ids': self.node_ids[self.targets[edges]],
+            'hops': hops[self.sources[edges]],
+            'congestion': np.asarray(congestion)[edges]
+        }
+
+
+class SegmentCongestion:
+    """
+    Predicted and propagated congestion for every segment of a RoadGraph.
+
+    Results are cached per (time_of_day, day_of_week, weather_condition)
+    bucket, since scoring every segment is the expensive step.
+    """
+
+    def __init__(self, graph, analyzer, alpha=0.5, iterations=3, max_buckets=64):
+        self.graph = graph
+        self.analyzer = analyzer
+        self.alpha = alpha
+        self.iterations = iterations
+        self.max_buckets = max_buckets
+        self._cache = {}
+
+    def levels(self, time_of_day, day_of_week, weather_condition):
+        key = (int(time_of_day), int(day_of_week), int(weather_condition), self.analyzer.model_version)
+        levels = self._cache.get(key)
+        if levels is None:
+            predicted = self.analyzer.predict_levels(self.graph.segment_features(*key[:3]))
+            levels = self.graph.propagate_congestion(predicted, self.alpha, self.iterations)
+            levels.setflags(write=False)
+            if len(self._cache) >= self.max_buckets:
+                self._cache.pop(next(iter(self._cache)))
+            self._cache[key] = levels
+        return levels
@@ -0,0 +1,152 @@
+import heapq
+import time
+from array import array
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+
+
+class RoutePlanner:
+    """
+    Congestion-aware fastest paths with A* and landmark lower bounds (ALT).
+
+    Edge cost is the free-flow travel time scaled by predicted congestion,
+    ``length / speed * (1 + congestion_penalty * congestion)``. Since that is
+    never below the free-flow time, distances to and from a few landmarks
+    computed once on free-flow times give admissible bounds for every
+    (hour, day, weather) bucket; within a bucket they are tightened by the
+    smallest congestion factor of that bucket. Edge costs are cached per bucket.
+    """
+
+    def __init__(self, graph, congestion, n_landmarks=8, congestion_penalty=2.0, max_buckets=16, seed=42):
+        self.graph = graph
+        self.congestion = congestion
+        self.congestion_penalty = congestion_penalty
+        self.max_buckets = max_buckets
+        self._weights = {}
+
+        speed_ms = graph.edge_attributes['speed_kmh'].astype(np.float64) / 3.6
+        self.free_flow_time = graph.edge_attributes['length_m'].astype(np.float64) / speed_ms
+
+        # Plain containers index faster than numpy arrays inside the search loop
+        self._indptr = array('q', graph.indptr.tobytes())
+        self._targets = array('i', graph.targets.astype(np.int32).tobytes())
+
+        self.landmarks, self._from_landmark, self._to_landmark = self._select_landmarks(n_landmarks, seed)
+
+    def _free_flow_matrix(self):
+        """Free-flow (nodes x nodes) matrix keeping the cheapest of any parallel edges"""
+        graph = self.graph
+        order = np.lexsort((self.free_flow_time, graph.targets, graph.sources))
+        src, dst, cost = graph.sources[order], graph.targets[order], self.free_flow_time[order]
+        first = np.ones(src.size, dtype=bool)
+        first[1:] = (src[1:] != src[:-1]) | (dst[1:] != dst[:-1])
+        return sparse.csr_matrix((cost[first], (src[first], dst[first])), shape=(graph.n_nodes, graph.n_nodes))
+
+    def _select_landmarks(self, n_landmarks, seed):
+        """Farthest-point landmark selection with forward and backward free-flow distances"""
+        matrix = self._free_flow_matrix()
+        reverse = matrix.T.tocsr()
+        n_landmarks = min(n_landmarks, self.graph.n_nodes)
+        rng = np.random.default_rng(seed)
+
+        landmarks = []
+        closest = np.full(self.graph.n_nodes, np.inf)
+        candidate = int(rng.integers(self.graph.n_nodes))
+        for _ in range(n_landmarks):
+            landmarks.append(candidate)
+            distances = csgraph.dijkstra(matrix, directed=True, indices=candidate)
+            closest = np.minimum(closest, np.where(np.isfinite(distances), distances, np.inf))
+            closest[landmarks] = -1
+            reachable = np.where(np.isfinite(closest), closest, -1)
+            candidate = int(np.argmax(reachable))
+
+        from_landmark = csgraph.dijkstra(matrix, directed=True, indices=landmarks)
+        to_landmark = csgraph.dijkstra(reverse, directed=True, indices=landmarks)
+        return np.asarray(landmarks), from_landmark, to_landmark
+
+    def _heuristic(self, target, factor=1.0):
+        """
+        ALT lower bound on the remaining travel time from every node to
+        ``target``, scaled by ``factor`` (the smallest cost / free-flow ratio)
+        """
+        d_from, d_to = self._from_landmark, self._to_landmark
+        with np.errstate(invalid='ignore'):
+            forward = d_from[:, [target]] - d_from
+            backward = d_to - d_to[:, [target]]
+        bound = np.maximum(forward, backward)
+        bound[~np.isfinite(bound)] = 0.0
+        return np.maximum(bound.max(axis=0), 0.0) * factor
+
+    def edge_weights(self, time_of_day, day_of_week, weather_condition):
+        """
+        Travel time of every segment for one (hour, day, weather) bucket, the
+        bucket's smallest cost / free-flow ratio and the congestion levels
+        """
+        levels = self.congestion.levels(time_of_day, day_of_week, weather_condition)
+        key = (int(time_of_day), int(day_of_week), int(weather_condition), self.congestion.analyzer.model_version)
+        cached = self._weights.get(key)
+        if cached is None:
+            cost = self.free_flow_time * (1.0 + self.congestion_penalty * levels)
+            factor = 1.0 + self.congestion_penalty * float(levels.min()) if levels.size else 1.0
+            cached = (array('d', cost.tobytes()), factor)
+            if len(self._weights) >= self.max_buckets:
+                self._weights.pop(next(iter(self._weights)))
+            self._weights[key] = cached
+        return cached[0], cached[1], levels
+
+    def route(self, origin_id, destination_id, time_of_day, day_of_week, weather_condition=1):
+        """
+        Fastest path between two node ids for a departure bucket.
+        Returns None when the destination is unreachable.
+        """
+        started = time.perf_counter()
+        graph = self.graph
+        origin, destination = (int(i) for i in graph.node_index([origin_id, destination_id]))
+        weights, factor, levels = self.edge_weights(time_of_day, day_of_week, weather_condition)
+        heuristic = array('d', self._heuristic(destination, factor).tobytes())
+        indptr, targets = self._indptr, self._targets
+
+        best = {origin: 0.0}
+        via_edge = {}
+        settled = set()
+        heap = [(heuristic[origin], 0.0, origin)]
+        while heap:
+            _, cost, node = heapq.heappop(heap)
+            if node in settled:
+                continue
+            if node == destination:
+                break
+            settled.add(node)
+            for edge in range(indptr[node], indptr[node + 1]):
+                neighbour = targets[edge]
+                if neighbour in settled:
+                    continue
+                candidate = cost + weights[edge]
+                if candidate < best.get(neighbour, float('inf')):
+                    best[neighbour] = candidate
+                    via_edge[neighbour] = edge
+                    heapq.heappush(heap, (candidate + heuristic[neighbour], candidate, neighbour))
+        else:
+            return None
+
+        edges = []
+        node = destination
+        while node != origin:
+            edge = via_edge[node]
+            edges.append(edge)
+            node = graph.sources[edge]
+        edges = np.asarray(edges[::-1], dtype=np.int64)
+        nodes = np.concatenate([[origin], graph.targets[edges]]) if edges.size else np.asarray([origin])
+
+        return {
+            'nodes': graph.node_ids[nodes],
+            'edges': graph.edge_ids[edges],
+            'travel_time_s': best[destination],
+            'free_flow_time_s': float(self.free_flow_time[edges].sum()),
+            'distance_m': float(graph.edge_attributes['length_m'][edges].sum()),
+            'mean_congestion': float(levels[edges].mean()) if edges.size else 0.0,
+            'settled_nodes': len(settled),
+            'elapsed_ms': (time.perf_counter() - started) * 1000
+        }
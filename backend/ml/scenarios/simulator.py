@@ -0,0 +1,284 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from ml.trafficanalysis.trafficanalysis import TrafficAnalyzer, FEATURE_COLUMNS
+
+ZONES_PATH = os.path.join(os.path.dirname(__file__), '..', 'urban_analysis', 'zones.csv')
+SUSTAINABILITY_DIR = os.path.join(os.path.dirname(__file__), '..', 'sustainablitycheck')
+
+SUSTAINABILITY_FEATURES = ['population_density', 'industrial_zones', 'public_transport', 'renewable_investment']
+SUSTAINABILITY_MODELS = {
+    'carbon_footprint': 'carbon_model.pkl',
+    'green_space_coverage': 'green_model.pkl',
+    'renewable_energy_usage': 'renewable_model.pkl'
+}
+
+# Valid range of every feature a scenario may change
+FEATURE_BOUNDS = {
+    'vehicle_count': (0, 1000),
+    'weather_condition': (1, 4),
+    'road_type': (1, 4),
+    'population_density': (0, None),
+    'industrial_zones': (0, None),
+    'public_transport': (0, 100),
+    'renewable_investment': (0, 100)
+}
+
+# Interventions suggested by layout.py and check.py, as feature changes
+PRESET_SCENARIOS = {
+    'congestion_pricing': {'vehicle_count': {'scale': 0.85}},
+    'expand_public_transport': {'public_transport': {'add': 20}, 'vehicle_count': {'scale': 0.92}},
+    'car_free_zones': {'vehicle_count': {'scale': 0.7}},
+    'renewable_investment': {'renewable_investment': {'add': 25}},
+    'relocate_industry': {'industrial_zones': {'scale': 0.5}}
+}
+
+# Coded categories stay whole numbers after a scale or shift
+INTEGER_FEATURES = {'weather_condition', 'road_type'}
+
+HISTOGRAM_BINS = np.linspace(0, 1, 11)
+
+# Simulators a pool worker keeps, one per traffic model and weather condition it has been sent
+WORKER_SIMULATORS = 4
+
+
+class ScenarioSimulator:
+    """
+    Vectorized what-if evaluation of planning interventions.
+
+    The baseline is every zone at every hour of every weekday. A scenario
+    scales, shifts or sets feature columns across that whole grid; a chunk of
+    scenarios is stacked into one (scenarios x rows, features) matrix and
+    scored with a single predict per model, and the simulator reports
+    before/after distributions of the outputs.
+    """
+
+    def __init__(self, zones=None, analyzer=None, weather_condition=1):
+        self.zones = zones if zones is not None else pd.read_csv(ZONES_PATH)
+        self.analyzer = analyzer if analyzer is not None else TrafficAnalyzer()
+        self.model_version = self.analyzer.model_version
+        self.weather_condition = weather_condition
+        self.sustainability_models = self._load_sustainability_models()
+
+        # Traffic grid: zone x day x hour, with zone volume shaped by the hourly profile
+        hourly = self.analyzer.get_hourly_distribution()
+        profile = np.array([hourly.get(hour, np.nan) for hour in range(24)], dtype=np.float64)
+        profile = np.nan_to_num(profile / np.nanmean(profile), nan=1.0)
+        n_zones = len(self.zones)
+        zone_idx, day, hour = (a.ravel() for a in np.meshgrid(
+            np.arange(n_zones), np.arange(1, 8), np.arange(24), indexing='ij'))
+        self.traffic_zone = zone_idx
+        self.traffic_base = np.column_stack([
+            hour,
+            day,
+            self.zones['vehicle_count'].to_numpy(dtype=np.float64)[zone_idx] * profile[hour],
+            np.full(zone_idx.size, weather_condition),
+            self.zones['road_type'].to_numpy()[zone_idx]
+        ]).astype(np.float64)
+        self.sustainability_base = self.zones[SUSTAINABILITY_FEATURES].to_numpy(dtype=np.float64)
+
+        self.baseline = None
+        self.baseline = self._score([None])[0]
+
+    def _load_sustainability_models(self):
+        """Load the sustainability regressors written by train_sustainability_model.py, if present"""
+        models = {}
+        for target, filename in SUSTAINABILITY_MODELS.items():
+            path = os.path.join(SUSTAINABILITY_DIR, filename)
+            if os.path.exists(path):
+                models[target] = joblib.load(path)
+        return models
+
+    @staticmethod
+    def resolve(scenario):
+        """Normalize a scenario: a preset name, or {'name', 'preset'?, 'changes'}"""
+        if isinstance(scenario, str):
+            scenario = {'name': scenario, 'preset': scenario}
+        changes = {}
+        preset = scenario.get('preset')
+        if preset is not None:
+            if preset not in PRESET_SCENARIOS:
+                raise ValueError(f"Unknown preset scenario: {preset}")
+            changes.update(PRESET_SCENARIOS[preset])
+        changes.update(scenario.get('changes') or {})
+        for feature, change in changes.items():
+            if feature not in FEATURE_BOUNDS:
+                raise ValueError(f"Scenario cannot change feature: {feature}")
+            if not set(change) <= {'scale', 'add', 'set'}:
+                raise ValueError(f"Unsupported change for {feature}: {change}")
+        return {'name': scenario.get('name') or preset or 'scenario', 'changes': changes}
+
+    @staticmethod
+    def _apply(base, columns, scenarios):
+        """
+        Stack ``base`` once per scenario and apply each scenario's changes with
+        broadcasting: x * scale + add, or a set value, then clip to bounds
+        """
+        n = len(scenarios)
+        scale = np.ones((n, 1, len(columns)))
+        add = np.zeros((n, 1, len(columns)))
+        value = np.full((n, 1, len(columns)), np.nan)
+        for i, scenario in enumerate(scenarios):
+            for feature, change in (scenario['changes'] if scenario else {}).items():
+                if feature in columns:
+                    j = columns.index(feature)
+                    scale[i, 0, j] = change.get('scale', 1.0)
+                    add[i, 0, j] = change.get('add', 0.0)
+                    if 'set' in change:
+                        value[i, 0, j] = change['set']
+        stacked = base[np.newaxis] * scale + add
+        stacked = np.where(np.isnan(value), stacked, value)
+        for j, column in enumerate(columns):
+            low, high = FEATURE_BOUNDS.get(column, (None, None))
+            if low is not None or high is not None:
+                np.clip(stacked[..., j], low, high, out=stacked[..., j])
+            if column in INTEGER_FEATURES:
+                np.rint(stacked[..., j], out=stacked[..., j])
+        return stacked
+
+    @staticmethod
+    def _touches(scenario, columns):
+        return scenario is not None and any(feature in columns for feature in scenario['changes'])
+
+    def _score(self, scenarios):
+        """
+        Score a chunk of scenarios with one predict per model. Scenarios that
+        leave a model's inputs untouched reuse the baseline for that model.
+        """
+        outputs = [{} for _ in scenarios]
+        models = [('congestion_level', self.traffic_base, FEATURE_COLUMNS, None)]
+        models += [(target, self.sustainability_base, SUSTAINABILITY_FEATURES, model)
+                   for target, model in self.sustainability_models.items()]
+        for target, base, columns, model in models:
+            changed = {i: k for k, i in enumerate(
+                i for i, scenario in enumerate(scenarios) if self._touches(scenario, columns))}
+            if changed or self.baseline is None:
+                stacked = self._apply(base, columns, [scenarios[i] for i in changed] if changed else [None])
+                flat = stacked.reshape(-1, len(columns))
+                if model is None:
+                    predicted = self.analyzer.predict_levels(flat)
+                else:
+                    predicted = model.predict(pd.DataFrame(flat, columns=columns))
+                predicted = predicted.reshape(len(stacked), -1)
+            for i in range(len(scenarios)):
+                if i in changed:
+                    outputs[i][target] = predicted[changed[i]]
+                elif self.baseline is not None:
+                    outputs[i][target] = self.baseline[target]
+                else:
+                    outputs[i][target] = predicted[0]
+        return outputs
+
+    def summarize(self, values, baseline):
+        """Distribution of one output before and after a scenario"""
+        def distribution(v):
+            p10, p50, p90 = np.percentile(v, [10, 50, 90])
+            return {'mean': float(v.mean()), 'p10': float(p10), 'p50': float(p50), 'p90': float(p90)}
+
+        summary = {'before': distribution(baseline), 'after': distribution(values),
+                   'mean_change': float(values.mean() - baseline.mean())}
+        if values.min() >= 0 and values.max() <= 1:
+            summary['histogram_bins'] = HISTOGRAM_BINS.tolist()
+            summary['before']['histogram'] = np.histogram(baseline, HISTOGRAM_BINS)[0].tolist()
+            summary['after']['histogram'] = np.histogram(values, HISTOGRAM_BINS)[0].tolist()
+        return summary
+
+    def evaluate(self, scenarios, chunk_rows=2_000_000):
+        """Evaluate resolved scenarios in this process, in chunks of about ``chunk_rows`` traffic rows"""
+        per_chunk = max(1, chunk_rows // len(self.traffic_base))
+        reports = []
+        for start in range(0, len(scenarios), per_chunk):
+            chunk = scenarios[start:start + per_chunk]
+            for scenario, outputs in zip(chunk, self._score(chunk)):
+                reports.append({
+                    'name': scenario['name'],
+                    'changes': scenario['changes'],
+                    'outputs': {name: self.summarize(values, self.baseline[name])
+                                for name, values in outputs.items()}
+                })
+        return reports
+
+    def source(self):
+        """What a pool worker needs to rebuild this simulator: the traffic data, model store and version"""
+        return {
+            'data_path': self.analyzer.data_path,
+            'model_dir': self.analyzer.store.root,
+            'version': self.model_version,
+            'weather_condition': self.weather_condition
+        }
+
+    def run(self, scenarios, pool=None):
+        """
+        Evaluate scenarios (preset names or dicts), spreading them over the
+        workers of ``pool`` (a ScenarioPool) when there are enough to be worth it
+        """
+        scenarios = [self.resolve(s) for s in scenarios]
+        if pool is None or pool.workers <= 1 or len(scenarios) < 2 * pool.workers:
+            return self.evaluate(scenarios)
+
+        chunks = np.array_split(np.arange(len(scenarios)), pool.workers)
+        parts = pool.map(self.source(), [[scenarios[i] for i in chunk] for chunk in chunks])
+        return [report for part in parts for report in part]
+
+
+class ScenarioPool:
+    """
+    Worker processes for large scenario batches, started once and kept for
+    the life of the service.
+
+    Every chunk of work carries the ``source`` of the simulator that split it,
+    so a worker scores it with that exact traffic model version (a tenant's,
+    or one published after the pool started) rather than whatever it loaded
+    first. Workers keep the simulators of the last few models they were sent.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._executor = None
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+            # Spawn the workers now instead of on the first request
+            for _ in range(self.workers):
+                self._executor.submit(int)
+
+    def map(self, source, chunks):
+        self.start()
+        return list(self._executor.map(_evaluate_chunk, [source] * len(chunks), chunks))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+# Simulators owned by a pool worker, keyed by source
+_worker_simulators = {}
+
+
+def _worker_simulator(source):
+    key = tuple(sorted(source.items()))
+    simulator = _worker_simulators.get(key)
+    if simulator is None:
+        analyzer = TrafficAnalyzer(data_path=source['data_path'], model_dir=source['model_dir'])
+        if source['version'] is not None and analyzer.model_version != source['version']:
+            model, scaler, metadata = analyzer.store.load(source['version'])
+            analyzer.swap_model(model, scaler, metadata['version'])
+        if analyzer.model_version != source['version']:
+            raise Exception(f"Traffic model version {source['version']} is not available in {source['model_dir']}")
+        if len(_worker_simulators) >= WORKER_SIMULATORS:
+            _worker_simulators.clear()
+        simulator = _worker_simulators[key] = ScenarioSimulator(analyzer=analyzer,
+                                                                weather_condition=source['weather_condition'])
+    return simulator
+
+
+def _evaluate_chunk(source, scenarios):
+    return _worker_simulator(source).evaluate(scenarios)
@@ -3,6 +3,8 @@ import numpy as np
 import os
 from sklearn.preprocessing import MinMaxScaler
 
+from ml.persistence import WriteBehindLog
+
 class SustainabilityAnalyzer:
     def __init__(self, data_path='sustainability_data.csv'):
         self.data_path = data_path
@@ -22,6 +24,12 @@ class SustainabilityAnalyzer:
         }
         self.scaler = MinMaxScaler()
         self.historical_data = self._load_historical_data()
+        # New rows are appended to data_path behind the request, in group commits
+        self.store = WriteBehindLog.from_env(data_path, ['timestamp'] + list(self.metrics_ranges.keys()))
+
+    def close(self):
+        """Write out the metrics still waiting for a commit"""
+        self.store.close()
         
     def _load_historical_data(self):
         """Load historical sustainability data"""
@@ -146,7 +154,7 @@ class SustainabilityAnalyzer:
                 **{k: [v] for k, v in metrics.items()}
             })
             self.historical_data = pd.concat([self.historical_data, new_row], ignore_index=True)
-            self.historical_data.to_csv(self.data_path, index=False)
+            self.store.append({'timestamp': new_row['timestamp'][0], **metrics})
         except Exception as e:
             print(f"Warning: Could not store metrics: {e}")
 
@@ -1,50 +1,69 @@
 # train_sustainability_model.py
+import os
 import pandas as pd
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error
 import joblib
 
-# Load the dataset
-df = pd.read_csv('sustainability_data.csv')
+DATA_PATH = os.path.join(os.path.dirname(__file__), 'sustainability_data.csv')
+MODEL_DIR = os.path.dirname(__file__)
 
-# Prepare features and targets
-X = df[['population_density', 'industrial_zones', 'public_transport', 'renewable_investment']]
-y_carbon = df['carbon_footprint']
-y_green = df['green_space_coverage']
-y_renewable = df['renewable_energy_usage']
+FEATURES = ['population_density', 'industrial_zones', 'public_transport', 'renewable_investment']
 
-# Split the data
-X_train, X_test, y_carbon_train, y_carbon_test = train_test_split(X, y_carbon, test_size=0.2, random_state=42)
-_, _, y_green_train, y_green_test = train_test_split(X, y_green, test_size=0.2, random_state=42)
-_, _, y_renewable_train, y_renewable_test = train_test_split(X, y_renewable, test_size=0.2, random_state=42)
+# Target column -> (model file, report label)
+TARGETS = {
+    'carbon_footprint': ('carbon_model.pkl', 'Carbon Footprint'),
+    'green_space_coverage': ('green_model.pkl', 'Green Space Coverage'),
+    'renewable_energy_usage': ('renewable_model.pkl', 'Renewable Energy Usage')
+}
 
-# Train models
-carbon_model = RandomForestRegressor(n_estimators=100, random_state=42)
-carbon_model.fit(X_train, y_carbon_train)
+DEFAULT_PARAMS = {'n_estimators': 100, 'random_state': 42}
 
-green_model = RandomForestRegressor(n_estimators=100, random_state=42)
-green_model.fit(X_train, y_green_train)
+def load_dataset(data_path=DATA_PATH):
+    """Features and the target columns"""
+    df = pd.read_csv(data_path)
+    return df[FEATURES], df[list(TARGETS)]
 
-renewable_model = RandomForestRegressor(n_estimators=100, random_state=42)
-renewable_model.fit(X_train, y_renewable_train)
+def split_dataset(X, Y, test_size=0.2):
+    # One split for all targets (the same rows each target's own split would pick)
+    return train_test_split(X, Y, test_size=test_size, random_state=42)
 
-# Evaluate models
-carbon_pred = carbon_model.predict(X_test)
-carbon_mae = mean_absolute_error(y_carbon_test, carbon_pred)
+def train_models(X_train, Y_train, params=None, n_jobs=None):
+    """One forest per target column"""
+    models = {}
+    for target in TARGETS:
+        model = RandomForestRegressor(**dict(DEFAULT_PARAMS, **(params or {})), n_jobs=n_jobs)
+        model.fit(X_train, Y_train[target])
+        model.set_params(n_jobs=None)
+        models[target] = model
+    return models
 
-green_pred = green_model.predict(X_test)
-green_mae = mean_absolute_error(y_green_test, green_pred)
+def evaluate_models(models, X_test, Y_test):
+    """Mean absolute error per target"""
+    return {target: float(mean_absolute_error(Y_test[target], model.predict(X_test))) for target, model in models.items()}
 
-renewable_pred = renewable_model.predict(X_test)
-renewable_mae = mean_absolute_error(y_renewable_test, renewable_pred)
+def save_models(models, model_dir=MODEL_DIR):
+    for target, model in models.items():
+        joblib.dump(model, os.path.join(model_dir, TARGETS[target][0]))
 
-print(f"Carbon Footprint MAE: {carbon_mae}")
-print(f"Green Space Coverage MAE: {green_mae}")
-print(f"Renewable Energy Usage MAE: {renewable_mae}")
+def main():
+    # Load the dataset
+    X, Y = load_dataset()
 
-# Save models
-joblib.dump(carbon_model, 'carbon_model.pkl')
-joblib.dump(green_model, 'green_model.pkl')
-joblib.dump(renewable_model, 'renewable_model.pkl')
-print("Models trained and saved.")
\ No newline at end of file
+    # Split the data
+    X_train, X_test, Y_train, Y_test = split_dataset(X, Y)
+
+    # Train models
+    models = train_models(X_train, Y_train)
+
+    # Evaluate models
+    for target, mae in evaluate_models(models, X_test, Y_test).items():
+        print(f"{TARGETS[target][1]} MAE: {mae}")
+
+    # Save models
+    save_models(models)
+    print("Models trained and saved.")
+
+if __name__ == "__main__":
+    main()
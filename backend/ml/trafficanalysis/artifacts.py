@@ -0,0 +1,177 @@
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+import joblib
+
+MODEL_FILE = 'traffic_congestion_model.pkl'
+SCALER_FILE = 'scaler.pkl'
+METADATA_FILE = 'metadata.json'
+CURRENT_FILE = 'CURRENT'
+
+_last_version_ns = 0
+_version_lock = threading.Lock()
+
+
+def _version_name():
+    """``%Y%m%dT%H%M%S.<nanoseconds>-<hex>``: sorts as a string in publish order, also within one second"""
+    global _last_version_ns
+    with _version_lock:
+        # Strictly increasing within the process even if the clock is coarse
+        _last_version_ns = max(time.time_ns(), _last_version_ns + 1)
+        ns = _last_version_ns
+    seconds, fraction = divmod(ns, 10 ** 9)
+    return f"{time.strftime('%Y%m%dT%H%M%S', time.localtime(seconds))}.{fraction:09d}-{uuid.uuid4().hex[:6]}"
+
+
+class ArtifactStore:
+    """
+    Versioned model artifacts with an atomic "current" pointer.
+
+    Each published version is an immutable directory holding the model, the
+    scaler it was trained with and a metadata file. A version directory is
+    fully written under a temporary name and renamed into place, and only then
+    is the ``CURRENT`` file replaced, so readers never see a half-written
+    version or a model paired with the wrong scaler.
+    """
+
+    def __init__(self, root=None):
+        if root is None:
+            root = os.path.join(os.path.dirname(__file__), 'models')
+        self.root = root
+
+    def publish(self, model, scaler, metadata=None, activate=True):
+        """Write a new version and (by default) make it current, returning its name"""
+        os.makedirs(self.root, exist_ok=True)
+        version = _version_name()
+        staging = os.path.join(self.root, f'.staging-{version}')
+        os.makedirs(staging)
+        try:
+            joblib.dump(model, os.path.join(staging, MODEL_FILE))
+            joblib.dump(scaler, os.path.join(staging, SCALER_FILE))
+            metadata = dict(metadata or {}, version=version, published_at=time.time())
+            with open(os.path.join(staging, METADATA_FILE), 'w') as f:
+                json.dump(metadata, f, indent=2)
+            _fsync_dir(staging)
+            os.rename(staging, os.path.join(self.root, version))
+            _fsync_dir(self.root)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        if activate:
+            self.activate(version)
+        return version
+
+    def activate(self, version):
+        """Atomically point CURRENT at an existing version"""
+        if not os.path.isdir(os.path.join(self.root, version)):
+            raise FileNotFoundError(f"Unknown model version: {version}")
+        tmp_path = os.path.join(self.root, f'.{CURRENT_FILE}.{uuid.uuid4().hex[:6]}')
+        with open(tmp_path, 'w') as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(self.root, CURRENT_FILE))
+        _fsync_dir(self.root)
+
+    def current_version(self):
+        """Name of the current version, or None if nothing was published yet"""
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def versions(self):
+        """All published versions, oldest first"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if not name.startswith('.') and os.path.isdir(os.path.join(self.root, name)))
+
+    def version_path(self, version):
+        return os.path.join(self.root, version)
+
+    def metadata(self, version):
+        with open(os.path.join(self.root, version, METADATA_FILE)) as f:
+            return json.load(f)
+
+    def load(self, version=None):
+        """Load (model, scaler, metadata) for a version, the current one by default"""
+        if version is None:
+            version = self.current_version()
+            if version is None:
+                raise FileNotFoundError(f"No current model version in {self.root}")
+        path = os.path.join(self.root, version)
+        model = joblib.load(os.path.join(path, MODEL_FILE))
+        scaler = joblib.load(os.path.join(path, SCALER_FILE))
+        return model, scaler, self.metadata(version)
+
+    def prune(self, keep=5):
+        """Delete the oldest versions beyond ``keep``, never the current one"""
+        current = self.current_version()
+        for version in self.versions()[:-keep] if keep > 0 else self.versions():
+            if version != current:
+                shutil.rmtree(os.path.join(self.root, version), ignore_errors=True)
+
+
+class ModelWatcher:
+    """
+    Background thread that follows an ArtifactStore's CURRENT pointer.
+
+    When the pointer changes the new version is loaded on this thread and
+    handed to ``analyzer.swap_model``, so requests never pay the load time.
+    """
+
+    def __init__(self, analyzer, store, interval=5.0):
+        self.analyzer = analyzer
+        self.store = store
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='traffic-model-watcher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def check(self):
+        """Load and swap in the current version if it differs from the served one"""
+        version = self.store.current_version()
+        if version is None or version == self.analyzer.model_version:
+            return False
+        model, scaler, _ = self.store.load(version)
+        self.analyzer.swap_model(model, scaler, version)
+        print(f"Loaded traffic model version {version}")
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Warning: Could not reload traffic model: {e}")
+
+
+def _fsync_dir(path):
+    """Persist directory entries (renames) where the platform supports it"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
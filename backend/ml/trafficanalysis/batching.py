@@ -0,0 +1,240 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from ml.trafficanalysis.trafficanalysis import TrafficAnalyzer, FEATURE_COLUMNS
+
+# Analyzer owned by each worker process, created once by _init_worker
+_worker_analyzer = None
+
+
+def _init_worker(watch_interval=None):
+    """Load the model once per worker process, optionally following newly published versions"""
+    global _worker_analyzer
+    _worker_analyzer = TrafficAnalyzer()
+    if watch_interval:
+        _worker_analyzer.start_watcher(watch_interval)
+
+
+def _predict_batch(rows):
+    """Score a batch of feature rows, with prediction intervals, inside a worker process"""
+    return _worker_analyzer.predict_intervals(rows)
+
+
+class MicroBatcher:
+    """
+    Dynamic micro-batching in front of TrafficAnalyzer.
+
+    Concurrent ``predict`` calls are queued; a collector task takes whatever
+    arrives within ``max_wait_ms`` (or up to ``max_batch_size`` items), scores
+    it with one vectorized predict on a pool of worker processes that each
+    hold the model, and resolves every caller's future. At most one batch per
+    worker is in flight, so under load requests accumulate into larger
+    batches instead of queueing inside the pool.
+
+    With ``workers=0`` batches are scored by ``analyzer`` on a thread in the
+    current process. A pool broken by a dead worker is replaced and the batch
+    retried on the new one.
+    """
+
+    def __init__(self, workers=2, max_batch_size=64, max_wait_ms=2.0, analyzer=None, window=10000,
+                 watch_interval=None):
+        self.workers = workers
+        self.watch_interval = watch_interval
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.analyzer = analyzer
+        self._queue = None
+        self._collector = None
+        self._executor = None
+        self._slots = None
+        self._pending = set()
+
+        # Statistics, latencies kept for the most recent `window` requests
+        self._requests = 0
+        self._batches = 0
+        self._errors = 0
+        self._pool_restarts = 0
+        self._batch_sizes = deque(maxlen=window)
+        self._queue_waits = deque(maxlen=window)
+        self._latencies = deque(maxlen=window)
+
+    @classmethod
+    def from_env(cls, analyzer=None, watch_interval=None):
+        """Build a batcher from TRAFFIC_BATCH_WORKERS, TRAFFIC_BATCH_MAX_SIZE and TRAFFIC_BATCH_WAIT_MS"""
+        return cls(
+            watch_interval=watch_interval,
+            workers=int(os.environ.get('TRAFFIC_BATCH_WORKERS', 2)),
+            max_batch_size=int(os.environ.get('TRAFFIC_BATCH_MAX_SIZE', 64)),
+            max_wait_ms=float(os.environ.get('TRAFFIC_BATCH_WAIT_MS', 2.0)),
+            analyzer=analyzer
+        )
+
+    @property
+    def running(self):
+        return self._collector is not None and not self._collector.done()
+
+    async def start(self):
+        """Start the worker pool and the collector task"""
+        if self.running:
+            return
+        if self.workers > 0:
+            self._executor = self._new_pool()
+            # Bring the workers up (and the model loaded) before the first request arrives
+            warm_up = np.zeros((1, len(FEATURE_COLUMNS)))
+            await asyncio.gather(*(asyncio.wrap_future(self._executor.submit(_predict_batch, warm_up))
+                                   for _ in range(self.workers)))
+        elif self.analyzer is None:
+            self.analyzer = TrafficAnalyzer()
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(max(self.workers, 1))
+        self._collector = asyncio.create_task(self._collect())
+
+    def _new_pool(self):
+        # spawn avoids forking a process that already runs threads and an event loop
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(self.watch_interval,)
+        )
+
+    def _restart_pool(self, broken):
+        """Replace a pool a worker died in; every later submit to it would fail"""
+        if self._executor is broken:
+            print("Micro-batcher worker pool is broken; starting a new one")  # Warning
+            broken.shutdown(wait=False)
+            self._executor = self._new_pool()
+            self._pool_restarts += 1
+
+    async def stop(self):
+        """Stop collecting, wait for in-flight batches and shut the pool down"""
+        if self._collector is not None:
+            self._collector.cancel()
+            try:
+                await self._collector
+            except asyncio.CancelledError:
+                pass
+            self._collector = None
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        while self._queue is not None and not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Micro-batcher stopped"))
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def predict(self, features):
+        """Queue one feature dict and wait for its congestion level and prediction interval"""
+        if not self.running:
+            raise RuntimeError("Micro-batcher is not running")
+        row = [features[column] for column in FEATURE_COLUMNS]
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((row, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self):
+        """Form batches from the queue and hand them to the pool"""
+        loop = asyncio.get_running_loop()
+        batch = []
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                deadline = loop.time() + self.max_wait
+                while len(batch) < self.max_batch_size:
+                    if not self._queue.empty():
+                        batch.append(self._queue.get_nowait())
+                        continue
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+
+                await self._slots.acquire()
+                self._dispatch(batch)
+                batch = []
+        except asyncio.CancelledError:
+            # Stopped while forming a batch: score it too (stop waits for it) so its callers get an answer.
+            # It holds no slot; its release only bumps the semaphore the next start replaces.
+            if batch:
+                self._dispatch(batch)
+            raise
+
+    def _dispatch(self, batch):
+        task = asyncio.create_task(self._run_batch(batch))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _run_batch(self, batch):
+        """Score one batch and resolve its callers' futures"""
+        dispatched = time.perf_counter()
+        rows = np.array([row for row, _, _ in batch], dtype=np.float64)
+        try:
+            if self._executor is not None:
+                executor = self._executor
+                try:
+                    predictions = await asyncio.wrap_future(executor.submit(_predict_batch, rows))
+                except BrokenProcessPool:
+                    self._restart_pool(executor)
+                    predictions = await asyncio.wrap_future(self._executor.submit(_predict_batch, rows))
+            else:
+                predictions = await asyncio.get_running_loop().run_in_executor(
+                    None, self.analyzer.predict_intervals, rows)
+        except Exception as e:
+            self._errors += len(batch)
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+
+        finished = time.perf_counter()
+        self._requests += len(batch)
+        self._batches += 1
+        self._batch_sizes.append(len(batch))
+        for i, (_, future, enqueued) in enumerate(batch):
+            self._queue_waits.append(dispatched - enqueued)
+            self._latencies.append(finished - enqueued)
+            if not future.done():
+                interval = {key: float(predictions[key][i]) for key in ('lower', 'upper', 'std')}
+                future.set_result((float(predictions['mean'][i]), interval))
+
+    def stats(self):
+        """Batch size and latency statistics over the recent window"""
+        def percentiles(values):
+            if not values:
+                return {}
+            values = np.asarray(values) * 1000
+            return {f'p{q}': float(np.percentile(values, q)) for q in (50, 90, 99)}
+
+        sizes = np.asarray(self._batch_sizes, dtype=np.int64)
+        return {
+            'running': self.running,
+            'workers': self.workers,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+            'requests': self._requests,
+            'batches': self._batches,
+            'errors': self._errors,
+            'pool_restarts': self._pool_restarts,
+            'batch_size': {
+                'mean': float(sizes.mean()) if sizes.size else 0.0,
+                'max': int(sizes.max()) if sizes.size else 0,
+                'histogram': {str(k): int(v) for k, v in zip(*np.unique(sizes, return_counts=True))}
+            },
+            'queue_wait_ms': percentiles(self._queue_waits),
+            'latency_ms': percentiles(self._latencies)
+        }
@@ -0,0 +1,290 @@
+import io
+import os
+import time
+
+import joblib
+import numpy as np
+
+from ml.trafficanalysis.forest import FlatForest, tree_mean
+
+# Smallest and largest threshold an int16 cut can hold
+INT16_MIN, INT16_MAX = np.iinfo(np.int16).min, np.iinfo(np.int16).max
+
+# Relative error of unscaling up to which a raw value still counts as an integer
+GRID_TOLERANCE = 1e-9
+
+
+class CompressedForest:
+    """
+    A subset of a fitted forest's trees with compact nodes, for features that
+    only take integer values (all of the traffic model's do).
+
+    Each split's scaled float64 threshold is turned into the largest raw
+    integer that still goes left under sklearn's float32 comparison, and kept
+    as int16; leaf values are float32 and child indices int32. On integer
+    inputs a tree therefore routes every row exactly like the original tree.
+    For inputs with non-integer raw values (e.g. scaled scenario counts) each
+    split also keeps its threshold rounded down to float32, which decides a
+    float32 input exactly like the float64 one; such batches take that path.
+    Like the model it replaces it takes scaled rows (``predict``), and it is
+    its own ``FlatForest`` (``tree_predictions``), so ``TrafficAnalyzer``
+    serves it unchanged.
+    """
+
+    def __init__(self, estimators, mean, scale, feature_importances=None):
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        features, thresholds, splits, lefts, rights, values, roots = [], [], [], [], [], [], []
+        offset = 0
+        depth = 0
+        for estimator in estimators:
+            tree = estimator.tree_
+            count = tree.node_count
+            nodes = np.arange(count)
+            is_leaf = tree.children_left < 0
+            feature = np.where(is_leaf, 0, tree.feature)
+            cut = integer_cuts(tree.threshold, feature, self.mean, self.scale)
+            features.append(feature)
+            thresholds.append(np.where(is_leaf, INT16_MAX, cut))
+            splits.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, nodes, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, nodes, tree.children_right) + offset)
+            values.append(tree.value[:, 0, 0])
+            roots.append(offset)
+            depth = max(depth, tree.max_depth)
+            offset += count
+
+        self.feature = np.concatenate(features).astype(np.int8)
+        self.threshold = np.concatenate(thresholds).astype(np.int16)
+        self.split = float32_floor(np.concatenate(splits))
+        self.left = np.concatenate(lefts).astype(np.int32)
+        self.right = np.concatenate(rights).astype(np.int32)
+        self.value = np.concatenate(values).astype(np.float32)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.max_depth = depth
+        if feature_importances is None:
+            feature_importances = np.mean([e.feature_importances_ for e in estimators], axis=0)
+        self.feature_importances_ = np.asarray(feature_importances, dtype=np.float64)
+        self.feature_importances_ /= max(self.feature_importances_.sum(), np.finfo(np.float64).tiny)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def node_count(self):
+        return len(self.feature)
+
+    @property
+    def nbytes(self):
+        """Size of the packed node arrays (what is pickled)"""
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.split, self.left, self.right,
+                                      self.value, self.roots))
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.pop('_routing', None)
+        return state
+
+    def routing(self):
+        """
+        Index-width copies of the split arrays, built on first use: numpy
+        gathers with narrow indices convert them on every step, which costs
+        more than the traversal itself for small batches
+        """
+        routing = self.__dict__.get('_routing')
+        if routing is None:
+            routing = self._routing = (self.feature.astype(np.intp), self.threshold.astype(np.int64),
+                                       self.left.astype(np.intp), self.right.astype(np.intp))
+        return routing
+
+    def tree_predictions(self, X):
+        """(trees x rows) matrix of per-tree outputs for scaled rows ``X``"""
+        X = np.asarray(X, dtype=np.float64)
+        n_rows, n_features = X.shape
+        feature, threshold, left, right = self.routing()
+        # Back to the raw integer grid the cuts live on, unless some value is off it
+        raw = X * self.scale + self.mean
+        grid = np.rint(raw)
+        if np.all(np.abs(raw - grid) <= GRID_TOLERANCE * np.maximum(np.abs(grid), 1)):
+            flat = grid.astype(np.int64).ravel()
+        else:
+            flat = X.astype(np.float32).ravel()
+            threshold = self.split
+        row_offset = np.arange(n_rows, dtype=np.intp) * n_features
+        node = np.repeat(self.roots.astype(np.intp)[:, np.newaxis], n_rows, axis=1)
+        for _ in range(self.max_depth):
+            go_left = flat[row_offset + feature[node]] <= threshold[node]
+            node = np.where(go_left, left[node], right[node])
+        return self.value[node].astype(np.float64)
+
+    def predict(self, X):
+        return tree_mean(self.tree_predictions(X))
+
+
+def float32_floor(values):
+    """Largest float32 not above each float64 value; x <= it exactly when float32 x <= the value"""
+    rounded = values.astype(np.float32)
+    return np.where(rounded > values, np.nextafter(rounded, np.float32(-np.inf)), rounded)
+
+
+def integer_cuts(thresholds, features, mean, scale):
+    """
+    For splits ``scaled(x)[feature] <= threshold``, the largest integer raw
+    value that goes left when scaled and compared in float32 like sklearn
+    """
+    mean, scale = mean[features], scale[features]
+
+    def goes_left(k):
+        return ((k - mean) / scale).astype(np.float32) <= thresholds
+
+    cut = np.floor(np.nan_to_num(thresholds * scale + mean, posinf=INT16_MAX, neginf=INT16_MIN))
+    cut = np.clip(cut, INT16_MIN, INT16_MAX)
+    # The float64 estimate can be off by one around the float32 rounding
+    for _ in range(2):
+        up = goes_left(cut + 1) & (cut < INT16_MAX)
+        cut = np.where(up, cut + 1, cut)
+        down = ~goes_left(cut) & (cut > INT16_MIN)
+        cut = np.where(down, cut - 1, cut)
+    return cut.astype(np.int64)
+
+
+def r2_score(y, prediction):
+    total = ((y - y.mean()) ** 2).sum()
+    return 1 - ((y - prediction) ** 2).sum() / total if total > 0 else float('nan')
+
+
+def select_trees(tree_predictions, y, tolerance=0.005):
+    """
+    Greedy forward selection: repeatedly add the tree that most improves the
+    R² of the subset mean, until it is within ``tolerance`` of the full
+    forest's R². Returns the selected tree indices (in forest order), the
+    subset's R² and the full forest's.
+    """
+    full_r2 = r2_score(y, tree_mean(tree_predictions))
+    n_trees = len(tree_predictions)
+    selected = []
+    total = np.zeros(tree_predictions.shape[1])
+    remaining = np.ones(n_trees, dtype=bool)
+    r2 = -np.inf
+    while remaining.any() and r2 < full_r2 - tolerance:
+        # Mean of the subset with each remaining tree added, scored all at once
+        candidates = (total + tree_predictions) / (len(selected) + 1)
+        errors = ((candidates - y) ** 2).sum(axis=1)
+        errors[~remaining] = np.inf
+        best = int(np.argmin(errors))
+        selected.append(best)
+        remaining[best] = False
+        total += tree_predictions[best]
+        r2 = r2_score(y, total / len(selected))
+    return sorted(selected), float(r2), float(full_r2)
+
+
+def compress_forest(model, scaler, X_scaled, y, tolerance=0.005):
+    """
+    Compress ``model`` to the smallest greedy tree subset whose R² on the
+    held-out rows ``X_scaled``/``y`` is within ``tolerance`` of the full
+    forest's. Returns the CompressedForest and the selection summary.
+    """
+    full = FlatForest.from_model(model)
+    selected, r2, full_r2 = select_trees(full.tree_predictions(X_scaled), np.asarray(y, dtype=np.float64), tolerance)
+    compressed = CompressedForest([model.estimators_[i] for i in selected], scaler.mean_, scaler.scale_)
+    return compressed, {'trees': selected, 'selection_r2': r2, 'full_r2': full_r2, 'tolerance': tolerance}
+
+
+def split_holdout(holdout, random_state=42):
+    """Halve held-out row indices into the rows trees are selected on and the rows the result is scored on"""
+    order = np.random.RandomState(random_state).permutation(len(holdout))
+    half = len(holdout) // 2
+    return np.sort(holdout[order[:half]]), np.sort(holdout[order[half:]])
+
+
+def _pickled(obj):
+    buffer = io.BytesIO()
+    joblib.dump(obj, buffer)
+    return buffer.getvalue()
+
+
+def _latency(predict, X, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        predict(X)
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings) * 1000)
+
+
+def compression_report(model, compressed, X_scaled, y, batch_size=256, repeat=50):
+    """Size, load time, latency and accuracy of the full and the compressed forest on the same rows"""
+    report = {}
+    full = FlatForest.from_model(model)
+    for name, estimator, forest in (('full', model, full), ('compressed', compressed, compressed)):
+        payload = _pickled(estimator)
+        started = time.perf_counter()
+        joblib.load(io.BytesIO(payload))
+        load_ms = (time.perf_counter() - started) * 1000
+        batch = np.resize(X_scaled, (batch_size, X_scaled.shape[1]))
+        prediction = forest.predict(X_scaled)
+        report[name] = {
+            'trees': forest.n_trees,
+            'nodes': int(len(forest.value)),
+            'pickle_bytes': len(payload),
+            'load_ms': load_ms,
+            'single_row_ms': _latency(forest.predict, X_scaled[:1], repeat),
+            f'batch_{batch_size}_ms': _latency(forest.predict, batch, max(5, repeat // 5)),
+            'r2': float(r2_score(y, prediction)),
+            'rmse': float(np.sqrt(np.mean((y - prediction) ** 2)))
+        }
+    report['max_abs_difference'] = float(np.max(np.abs(compressed.predict(X_scaled) - full.predict(X_scaled))))
+    return report
+
+
+def main(tolerance=0.005, activate=True):
+    """Compress the current traffic model version and publish the result as a new version"""
+    from sklearn.model_selection import train_test_split
+    from ml.featurestore.store import FeatureStore
+    from ml.trafficanalysis.artifacts import ArtifactStore
+    from ml.trafficanalysis.trafficanalysis import TRAFFIC_FEATURES
+
+    store = ArtifactStore()
+    model, scaler, metadata = store.load()
+    if isinstance(model, CompressedForest):
+        raise SystemExit(f"Version {metadata['version']} is already compressed")
+    data_path = metadata.get('data_path') or os.path.join(os.path.dirname(__file__), 'traffic_data.csv')
+    features = FeatureStore().materialize(TRAFFIC_FEATURES, data_path)
+    X = (np.asarray(features.X, dtype=np.float64) - scaler.mean_) / scaler.scale_
+    y = np.asarray(features.y, dtype=np.float64)
+    # The rows train_traffic_model.py held out of training
+    _, holdout = train_test_split(np.arange(len(X)), test_size=0.2, random_state=42)
+    # Score on rows the greedy selection never saw
+    selection_rows, evaluation_rows = split_holdout(holdout)
+
+    compressed, selection = compress_forest(model, scaler, X[selection_rows], y[selection_rows], tolerance)
+    report = compression_report(model, compressed, X[evaluation_rows], y[evaluation_rows])
+    for name in ('full', 'compressed'):
+        print(f"{name:>10}: " + ", ".join(f"{key}={value:.4g}" if isinstance(value, float) else f"{key}={value}"
+                                          for key, value in report[name].items()))
+    print(f"Max prediction difference on evaluation rows: {report['max_abs_difference']:.4g}")
+
+    version = store.publish(compressed, scaler, {
+        'data_path': data_path,
+        'feature_version': features.version,
+        'compressed_from': metadata['version'],
+        'update': 'compression',
+        'trees': compressed.n_trees,
+        'test_r2': report['compressed']['r2'],
+        'selection': selection,
+        'compression': report
+    }, activate=activate)
+    store.prune()
+    print(f"Compressed model version {version} published to {store.version_path(version)}")
+    return version
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Compress the current traffic model version")
+    parser.add_argument('--tolerance', type=float, default=0.005, help="Allowed R² loss on the held-out rows")
+    parser.add_argument('--no-activate', action='store_true', help="Publish without making it current")
+    args = parser.parse_args()
+    main(args.tolerance, activate=not args.no_activate)
@@ -1,11 +1,7 @@
 import pandas as pd
 import numpy as np
 import os
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
-import matplotlib.pyplot as plt
-import seaborn as sns
+from sklearn.pipeline import make_pipeline
 
 def create_synthetic_traffic_data(num_samples=1000):
     """Create synthetic traffic data for model training"""
@@ -75,58 +71,33 @@ def create_synthetic_traffic_data(num_samples=1000):
 
 def evaluate_model_accuracy(data_path='traffic_data.csv'):
     """
-    Evaluate traffic prediction model accuracy using various metrics
+    Evaluate the persisted traffic prediction model using various metrics,
+    on the 20% of rows held out of training. The report is cached per model
+    and data hash; the plot is written next to it by a separate process.
     """
-    # Load data
-    df = pd.read_csv(data_path)
-    
-    # Split features and target
-    X = df.drop('congestion_level', axis=1)
-    y = df['congestion_level']
-    
-    # Train-test split
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    
-    # Train model
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
-    model.fit(X_train, y_train)
-    
-    # Make predictions
-    y_pred = model.predict(X_test)
-    
-    # Calculate metrics
-    metrics = {
-        'MSE': mean_squared_error(y_test, y_pred),
-        'RMSE': np.sqrt(mean_squared_error(y_test, y_pred)),
-        'MAE': mean_absolute_error(y_test, y_pred),
-        'R2': r2_score(y_test, y_pred)
-    }
-    
-    # Feature importance
+    from ml.trafficanalysis.evaluation import ModelEvaluator
+
+    evaluator = ModelEvaluator()
+    try:
+        report = evaluator.evaluate(data_path)
+        if report.get('plot_future') is not None:
+            try:
+                report['plot_future'].result()
+            except Exception as e:
+                print(f"Warning: Could not render accuracy plot: {e}")
+    finally:
+        evaluator.close()
+
+    metrics = report['metrics']
     feature_importance = pd.DataFrame({
-        'feature': X.columns,
-        'importance': model.feature_importances_
+        'feature': list(report['feature_importance']),
+        'importance': list(report['feature_importance'].values())
     }).sort_values('importance', ascending=False)
-    
-    # Generate plots
-    plt.figure(figsize=(12, 6))
-    
-    # Actual vs Predicted
-    plt.subplot(1, 2, 1)
-    plt.scatter(y_test, y_pred, alpha=0.5)
-    plt.plot([y_test.min(), y_test.max()], [y_test.min(), y_test.max()], 'r--', lw=2)
-    plt.xlabel('Actual Congestion Level')
-    plt.ylabel('Predicted Congestion Level')
-    plt.title('Actual vs Predicted Values')
-    
-    # Feature Importance
-    plt.subplot(1, 2, 2)
-    sns.barplot(x='importance', y='feature', data=feature_importance)
-    plt.title('Feature Importance')
-    
-    plt.tight_layout()
-    plt.savefig('model_accuracy.png')
-    
+
+    # The served model expects scaled input; pair it with its scaler so
+    # predict_traffic can keep passing raw features
+    analyzer = evaluator.analyzer
+    model = make_pipeline(analyzer.scaler, analyzer.model)
     return metrics, feature_importance, model
 
 def predict_traffic(model, time_of_day, day_of_week, vehicle_count, weather_condition, road_type):
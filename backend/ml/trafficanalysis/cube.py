@@ -0,0 +1,277 @@
+import fcntl
+import hashlib
+import io
+import os
+import tempfile
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+import pandas as pd
+
+# Cube axes: day_of_week (1-7), time_of_day (0-23), weather_condition (1-4), road_type (1-4)
+DAYS, HOURS, WEATHER_CONDITIONS, ROAD_TYPES = 7, 24, 4, 4
+AXES = ('day_of_week', 'time_of_day', 'weather_condition', 'road_type')
+
+# Statistics accumulated per cell
+STATS = ('count', 'vehicle_sum', 'vehicle_sumsq', 'congestion_sum', 'congestion_sumsq')
+SHAPE = (DAYS, HOURS, WEATHER_CONDITIONS, ROAD_TYPES, len(STATS))
+COUNT, VEHICLE_SUM, VEHICLE_SUMSQ, CONGESTION_SUM, CONGESTION_SUMSQ = range(len(STATS))
+
+# Header slots (uint64) in front of the cube
+MAGIC, SEQUENCE, READY, OFFSET, SIZE, MTIME_NS, SIGNATURE, SKIPPED = range(8)
+HEADER_BYTES = 64
+CUBE_MAGIC = 0x43554245_00000001
+
+# Bytes of the file prefix hashed to tell an append from a rewrite
+SIGNATURE_BYTES = 64 * 1024
+
+# Rows per chunk when reading appended data
+CHUNK_ROWS = 100_000
+
+# Seconds a reader waits on an odd sequence before assuming the writer died
+WRITER_TIMEOUT = 2.0
+
+
+def _signature(path, length):
+    with open(path, 'rb') as f:
+        prefix = f.read(min(length, SIGNATURE_BYTES))
+    return int.from_bytes(hashlib.sha1(prefix).digest()[:8], 'little')
+
+
+def cell_statistics(day_of_week, time_of_day, weather_condition, road_type, vehicle_count, congestion_level):
+    """
+    Cube-shaped statistics of a batch of rows, and how many rows fell
+    outside the cube's axes (those are left out)
+    """
+    index = [np.asarray(a, dtype=np.int64) for a in (day_of_week, time_of_day, weather_condition, road_type)]
+    index[0] -= 1
+    index[2] -= 1
+    index[3] -= 1
+    inside = np.ones(len(index[0]), dtype=bool)
+    for values, size in zip(index, SHAPE[:4]):
+        inside &= (values >= 0) & (values < size)
+    cells = np.ravel_multi_index([values[inside] for values in index], SHAPE[:4])
+    vehicles = np.asarray(vehicle_count, dtype=np.float64)[inside]
+    congestion = np.asarray(congestion_level, dtype=np.float64)[inside]
+
+    n_cells = int(np.prod(SHAPE[:4]))
+    stats = np.empty((n_cells, len(STATS)))
+    stats[:, COUNT] = np.bincount(cells, minlength=n_cells)
+    stats[:, VEHICLE_SUM] = np.bincount(cells, weights=vehicles, minlength=n_cells)
+    stats[:, VEHICLE_SUMSQ] = np.bincount(cells, weights=vehicles * vehicles, minlength=n_cells)
+    stats[:, CONGESTION_SUM] = np.bincount(cells, weights=congestion, minlength=n_cells)
+    stats[:, CONGESTION_SUMSQ] = np.bincount(cells, weights=congestion * congestion, minlength=n_cells)
+    return stats.reshape(SHAPE), int((~inside).sum())
+
+
+class CongestionCube:
+    """
+    Count, sum and sum of squares of vehicle_count and congestion_level per
+    day x hour x weather x road type cell of a traffic CSV, in one
+    ``multiprocessing.shared_memory`` block shared by every process serving
+    the same file.
+
+    The first process to need the cube builds it from the feature store;
+    afterwards ``refresh`` only stats the file, and rows appended since the
+    recorded byte offset are parsed and added to the cells. A rewritten file
+    (shorter, or with a different prefix) is rebuilt. Writers serialize on a
+    file lock and bump a sequence number to odd while they change the block
+    and back to even when done (a seqlock), so readers never block: they copy
+    the block and retry if the sequence moved underneath them. Hourly and
+    daily aggregates are sums over axes of that copy.
+
+    Where shared memory is unavailable the cube lives in process memory.
+    """
+
+    def __init__(self, data_path, feature_store=None, shared=True):
+        self.data_path = os.path.abspath(data_path)
+        self.feature_store = feature_store
+        digest = hashlib.sha1(self.data_path.encode()).hexdigest()[:16]
+        self.name = f'urbandev-cube-{digest}'
+        self.lock_path = os.path.join(tempfile.gettempdir(), f'{self.name}.lock')
+        self.owner = False
+        self._shm = None
+        size = HEADER_BYTES + int(np.prod(SHAPE)) * 8
+        buffer = None
+        if shared:
+            try:
+                buffer = self._attach(size)
+            except OSError as e:
+                print(f"Warning: shared memory unavailable for the congestion cube, using process memory: {e}")
+        if buffer is None:
+            buffer = memoryview(bytearray(size))
+        self.header = np.ndarray((HEADER_BYTES // 8,), dtype=np.uint64, buffer=buffer)
+        self.cube = np.ndarray(SHAPE, dtype=np.float64, buffer=buffer, offset=HEADER_BYTES)
+
+    def _attach(self, size):
+        try:
+            self._shm = shared_memory.SharedMemory(self.name, create=True, size=size)
+            self.owner = True
+        except FileExistsError:
+            self._shm = shared_memory.SharedMemory(self.name)
+        # Processes started from one another share a resource tracker, which
+        # would otherwise unlink the block when any of them exits; only the
+        # creator unlinks it, in close(). A block left behind by a crash is
+        # adopted by the next process and revalidated against the file.
+        resource_tracker.unregister(self._shm._name, 'shared_memory')
+        return self._shm.buf
+
+    def close(self):
+        """Detach, and unlink the block if this process created it"""
+        if self._shm is not None:
+            self.header = self.cube = None
+            self._shm.close()
+            if self.owner:
+                try:
+                    # unlink() unregisters the block from the tracker, so register it back first
+                    resource_tracker.register(self._shm._name, 'shared_memory')
+                    self._shm.unlink()
+                except FileNotFoundError:
+                    pass
+            self._shm = None
+
+    @property
+    def ready(self):
+        return bool(self.header[READY]) and int(self.header[MAGIC]) == CUBE_MAGIC
+
+    def refresh(self):
+        """Bring the cube up to date with the file; a stat when nothing changed"""
+        if not os.path.exists(self.data_path):
+            raise FileNotFoundError(f"Traffic data file not found at: {self.data_path}")
+        stat = os.stat(self.data_path)
+        if self.ready and (int(self.header[SIZE]), int(self.header[MTIME_NS])) == (stat.st_size, stat.st_mtime_ns):
+            return False
+
+        with open(self.lock_path, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                # Another process may have caught up while we waited
+                stat = os.stat(self.data_path)
+                if self.ready and (int(self.header[SIZE]), int(self.header[MTIME_NS])) == (stat.st_size, stat.st_mtime_ns):
+                    return False
+                offset = int(self.header[OFFSET])
+                appended = (self.ready and stat.st_size >= offset
+                            and _signature(self.data_path, offset) == int(self.header[SIGNATURE]))
+                if appended:
+                    self._append(stat)
+                else:
+                    self._rebuild(stat)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        return True
+
+    def _write(self, cube, offset, stat, skipped, replace):
+        """Apply new statistics under the seqlock"""
+        signature = _signature(self.data_path, offset)
+        self.header[SEQUENCE] += np.uint64(1)
+        if replace:
+            self.cube[...] = cube
+        else:
+            self.cube += cube
+        self.header[OFFSET] = offset
+        self.header[SIZE] = stat.st_size
+        self.header[MTIME_NS] = stat.st_mtime_ns
+        self.header[SIGNATURE] = signature
+        self.header[SKIPPED] = skipped
+        self.header[MAGIC] = CUBE_MAGIC
+        self.header[READY] = 1
+        self.header[SEQUENCE] += np.uint64(1)
+
+    def _rebuild(self, stat):
+        """Whole-file statistics from the feature store's parsed matrix"""
+        from ml.featurestore.store import FeatureStore
+        from ml.trafficanalysis.trafficanalysis import TRAFFIC_FEATURES
+        store = self.feature_store if self.feature_store is not None else FeatureStore()
+        features = store.materialize(TRAFFIC_FEATURES, self.data_path)
+        # The matrix covers the file as it was when it was materialized
+        size = next(s['size'] for s in features.schema['sources'] if s['path'] == self.data_path)
+        cube, skipped = cell_statistics(*(features.column(axis) for axis in AXES),
+                                        features.column('vehicle_count'), features.y)
+        self._write(cube, size, stat, skipped, replace=True)
+        if size < stat.st_size:
+            self._append(os.stat(self.data_path))
+
+    def _append(self, stat):
+        """Add the complete rows written after the recorded offset"""
+        offset = int(self.header[OFFSET])
+        with open(self.data_path, 'rb') as f:
+            header = f.readline()
+            f.seek(max(offset, len(header)))
+            data = f.read(stat.st_size - max(offset, len(header)))
+        # A row still being written is picked up next time
+        data = data[:data.rfind(b'\n') + 1]
+        end = max(offset, len(header)) + len(data)
+        cube = np.zeros(SHAPE)
+        skipped = int(self.header[SKIPPED])
+        if data:
+            for chunk in pd.read_csv(io.BytesIO(header + data), chunksize=CHUNK_ROWS):
+                chunk_cube, chunk_skipped = cell_statistics(*(chunk[axis] for axis in AXES),
+                                                            chunk['vehicle_count'], chunk['congestion_level'])
+                cube += chunk_cube
+                skipped += chunk_skipped
+        self._write(cube, end, stat, skipped, replace=False)
+
+    def snapshot(self):
+        """A consistent copy of the cube, retrying while a writer is active"""
+        started = time.perf_counter()
+        while True:
+            before = int(self.header[SEQUENCE])
+            if before % 2 == 0:
+                cube = self.cube.copy()
+                if int(self.header[SEQUENCE]) == before:
+                    return cube
+            elif time.perf_counter() - started > WRITER_TIMEOUT:
+                self._recover()
+            time.sleep(0)
+
+    def _recover(self):
+        """Rebuild a cube left mid-write by a process that died holding the seqlock"""
+        with open(self.lock_path, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                # A live writer holds the file lock, so an odd sequence here was abandoned
+                if int(self.header[SEQUENCE]) % 2 == 1:
+                    self.header[SEQUENCE] += np.uint64(1)
+                    self._rebuild(os.stat(self.data_path))
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def hourly_distribution(self):
+        """Hours present in the data and their mean vehicle counts"""
+        self.refresh()
+        by_hour = self.snapshot().sum(axis=(0, 2, 3))
+        present = np.flatnonzero(by_hour[:, COUNT])
+        return present, by_hour[present, VEHICLE_SUM] / by_hour[present, COUNT]
+
+    def daily_distribution(self):
+        """Days (1-7) present in the data and their mean vehicle counts"""
+        self.refresh()
+        by_day = self.snapshot().sum(axis=(1, 2, 3))
+        present = np.flatnonzero(by_day[:, COUNT])
+        return present + 1, by_day[present, VEHICLE_SUM] / by_day[present, COUNT]
+
+    def slot_congestion(self):
+        """
+        Day x hour slots present in the data (day index 0-6, hour), with the
+        mean and standard deviation of congestion_level in each
+        """
+        self.refresh()
+        slots = self.snapshot().sum(axis=(2, 3))
+        days, hours = np.nonzero(slots[:, :, COUNT])
+        counts = slots[days, hours, COUNT]
+        mean = slots[days, hours, CONGESTION_SUM] / counts
+        variance = np.maximum(slots[days, hours, CONGESTION_SUMSQ] / counts - mean * mean, 0)
+        return days, hours, mean, np.sqrt(variance)
+
+    def stats(self):
+        header = self.header
+        return {
+            'name': self.name,
+            'shared': self._shm is not None,
+            'owner': self.owner,
+            'ready': self.ready,
+            'rows': int(self.cube[..., COUNT].sum()) if self.ready else 0,
+            'skipped_rows': int(header[SKIPPED]),
+            'offset': int(header[OFFSET])
+        }
@@ -0,0 +1,218 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+
+from ml.trafficanalysis.artifacts import MODEL_FILE, SCALER_FILE
+from ml.trafficanalysis.trafficanalysis import TrafficAnalyzer, FEATURE_COLUMNS
+
+# Bump when the report layout or metric definitions change, so cached reports are recomputed
+REPORT_VERSION = 2
+
+# The split train_traffic_model.py holds out of training
+HOLDOUT_SIZE = 0.2
+HOLDOUT_SEED = 42
+
+REPORT_DIR = os.path.join(os.path.dirname(__file__), 'reports')
+
+# Points drawn in the actual-vs-predicted scatter; larger holdout sets are sampled down
+MAX_PLOT_POINTS = 5000
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def artifact_paths(analyzer):
+    """Model and scaler files behind the analyzer's served model"""
+    if analyzer.model_version is not None:
+        path = analyzer.store.version_path(analyzer.model_version)
+        return os.path.join(path, MODEL_FILE), os.path.join(path, SCALER_FILE)
+    return analyzer.model_path, analyzer.scaler_path
+
+
+def error_sums(y_true, y_pred):
+    """
+    Additive statistics of one prediction pass; every metric below is derived
+    from them, and sums from several folds combine into the overall metrics
+    """
+    error = y_pred - y_true
+    return {
+        'n': int(y_true.size),
+        'sse': float(error @ error),
+        'sae': float(np.abs(error).sum()),
+        'sum_y': float(y_true.sum()),
+        'sum_y2': float(y_true @ y_true)
+    }
+
+
+def metrics_from_sums(sums):
+    n = sums['n']
+    mse = sums['sse'] / n
+    total = sums['sum_y2'] - sums['sum_y'] ** 2 / n
+    return {
+        'MSE': mse,
+        'RMSE': float(np.sqrt(mse)),
+        'MAE': sums['sae'] / n,
+        'R2': 1 - sums['sse'] / total if total > 0 else float('nan')
+    }
+
+
+def holdout_rows(n_rows):
+    """Indices of the rows train_traffic_model.py held out of training"""
+    from sklearn.model_selection import train_test_split
+    _, holdout = train_test_split(np.arange(n_rows), test_size=HOLDOUT_SIZE, random_state=HOLDOUT_SEED)
+    return holdout
+
+
+def _score_chunk(model_path, scaler_path, X, y):
+    """Predict one chunk of rows in a worker, loading the persisted model there instead of pickling it over"""
+    model = joblib.load(model_path)
+    scaler = joblib.load(scaler_path)
+    y_pred = model.predict((X - scaler.mean_) / scaler.scale_)
+    return y_pred, error_sums(y, y_pred)
+
+
+def _render_plots(path, y_true, y_pred, importance):
+    """Write the actual-vs-predicted and feature importance figure (runs in a worker process)"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig, (scatter, bars) = plt.subplots(1, 2, figsize=(12, 6))
+    scatter.scatter(y_true, y_pred, alpha=0.5, s=8)
+    low, high = float(np.min(y_true)), float(np.max(y_true))
+    scatter.plot([low, high], [low, high], 'r--', lw=2)
+    scatter.set_xlabel('Actual Congestion Level')
+    scatter.set_ylabel('Predicted Congestion Level')
+    scatter.set_title('Actual vs Predicted Values')
+
+    features = sorted(importance, key=importance.get)
+    bars.barh(features, [importance[f] for f in features])
+    bars.set_title('Feature Importance')
+
+    fig.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+    return path
+
+
+class ModelEvaluator:
+    """
+    Evaluates the persisted traffic model on a dataset without refitting it.
+
+    By default only the rows training held out are scored (the same
+    ``train_test_split(test_size=0.2, random_state=42)`` split as
+    train_traffic_model.py), so the metrics are held-out metrics; pass
+    ``holdout=False`` for a dataset the model never saw. The scored rows are
+    split into ``chunks`` contiguous chunks that are predicted in parallel
+    worker processes, one prediction pass in total. Per-chunk and overall
+    metrics come from the same additive error sums (the chunks are a
+    partition of one pass, not cross-validation folds). Reports are cached
+    under ``reports/<model hash>-<data hash>``, so re-evaluating an
+    unchanged model on unchanged data only reads the report back. Plots are
+    rendered by a separate process while the report is returned.
+    """
+
+    def __init__(self, analyzer=None, report_dir=None, chunks=5, n_jobs=-1):
+        self.analyzer = analyzer if analyzer is not None else TrafficAnalyzer()
+        self.report_dir = report_dir or REPORT_DIR
+        self.chunks = chunks
+        self.n_jobs = n_jobs
+        self._plotter = None
+
+    def report_key(self, data_path, holdout=True):
+        model_path, scaler_path = artifact_paths(self.analyzer)
+        model_hash = hashlib.sha256((file_hash(model_path) + file_hash(scaler_path)).encode()).hexdigest()
+        rows = 'holdout' if holdout else 'all'
+        return f"v{REPORT_VERSION}-{model_hash[:16]}-{file_hash(data_path)[:16]}-{rows}"
+
+    def evaluate(self, data_path=None, force=False, plot=True, holdout=True):
+        """
+        Evaluation report for the held-out rows of ``data_path`` (the
+        analyzer's dataset by default), or for all of its rows with
+        ``holdout=False``. With ``plot``, ``report['plot_future']`` resolves
+        once the figure is written.
+        """
+        data_path = data_path or self.analyzer.data_path
+        if self.analyzer.model is None:
+            raise Exception("Model not trained or loaded")
+        key = self.report_key(data_path, holdout)
+        report_path = os.path.join(self.report_dir, key, 'report.json')
+        if not force and os.path.exists(report_path):
+            with open(report_path) as f:
+                report = json.load(f)
+            report['cached'] = True
+            return report
+
+        started = time.perf_counter()
+        df = pd.read_csv(data_path)
+        X = df[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+        y = df['congestion_level'].to_numpy(dtype=np.float64)
+        if holdout:
+            rows = holdout_rows(len(df))
+            X, y = X[rows], y[rows]
+        model_path, scaler_path = artifact_paths(self.analyzer)
+        bounds = np.linspace(0, len(y), min(self.chunks, len(y)) + 1).astype(int)
+        results = Parallel(n_jobs=self.n_jobs)(
+            delayed(_score_chunk)(model_path, scaler_path, X[start:end], y[start:end])
+            for start, end in zip(bounds[:-1], bounds[1:]))
+
+        y_pred = np.concatenate([predictions for predictions, _ in results])
+        chunk_metrics = [metrics_from_sums(sums) for _, sums in results]
+        total = {name: sum(sums[name] for _, sums in results) for name in results[0][1]}
+        importance = self.analyzer.get_feature_importance()
+        report = {
+            'report_version': REPORT_VERSION,
+            'key': key,
+            'model_version': self.analyzer.model_version,
+            'data_path': os.path.abspath(data_path),
+            'rows': int(len(y)),
+            'holdout': holdout,
+            'metrics': metrics_from_sums(total),
+            'chunks': chunk_metrics,
+            'chunk_spread': {name: float(np.std([chunk[name] for chunk in chunk_metrics]))
+                             for name in chunk_metrics[0]},
+            'feature_importance': importance,
+            'evaluated_at': time.time(),
+            'elapsed_seconds': time.perf_counter() - started,
+            'plot': None
+        }
+
+        os.makedirs(os.path.dirname(report_path), exist_ok=True)
+        if plot:
+            report['plot'] = os.path.join(os.path.dirname(report_path), 'model_accuracy.png')
+        tmp_path = f'{report_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        os.replace(tmp_path, report_path)
+
+        report['cached'] = False
+        if plot:
+            sample = np.random.default_rng(0).permutation(len(y))[:MAX_PLOT_POINTS]
+            report['plot_future'] = self._plot_executor().submit(
+                _render_plots, report['plot'], y[sample], y_pred[sample], importance)
+        return report
+
+    def _plot_executor(self):
+        if self._plotter is None:
+            self._plotter = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+        return self._plotter
+
+    def close(self):
+        """Wait for pending plots and stop the plotting process"""
+        if self._plotter is not None:
+            self._plotter.shutdown(wait=True)
+            self._plotter = None
@@ -0,0 +1,100 @@
+import numpy as np
+
+# Above this many rows sklearn's compiled traversal (RandomForestRegressor.apply)
+# beats stepping all trees through numpy gathers
+APPLY_MIN_ROWS = 512
+
+
+class FlatForest:
+    """
+    Every tree of a fitted forest packed into one set of node arrays.
+
+    Rows descend all trees together: each step gathers the split feature and
+    threshold of the current node of every (tree, row) pair and moves to the
+    left or right child, so a batch is scored with ``max_depth`` vectorized
+    steps instead of one call per estimator. Leaves point to themselves, so
+    pairs that reach a leaf early simply stay there.
+
+    Splits compare float32 inputs against the float64 thresholds, as sklearn
+    does, so per-tree outputs and their mean match the fitted forest exactly.
+    Large batches take the leaf indices from ``model.apply`` instead and look
+    the outputs up in the same packed value array.
+    """
+
+    def __init__(self, estimators, model=None):
+        self.model = model
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        depth = 0
+        for estimator in estimators:
+            tree = estimator.tree_
+            count = tree.node_count
+            nodes = np.arange(count)
+            is_leaf = tree.children_left < 0
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, nodes, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, nodes, tree.children_right) + offset)
+            values.append(tree.value[:, 0, 0])
+            roots.append(offset)
+            depth = max(depth, tree.max_depth)
+            offset += count
+
+        self.feature = np.concatenate(features).astype(np.intp)
+        self.threshold = np.concatenate(thresholds)
+        self.left = np.concatenate(lefts).astype(np.intp)
+        self.right = np.concatenate(rights).astype(np.intp)
+        self.value = np.concatenate(values)
+        self.roots = np.asarray(roots, dtype=np.intp)
+        self.max_depth = depth
+
+    @classmethod
+    def from_model(cls, model):
+        return cls(model.estimators_, model)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def tree_predictions(self, X):
+        """(trees x rows) matrix of per-tree outputs for already scaled rows ``X``"""
+        X = np.asarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        if self.model is not None and n_rows >= APPLY_MIN_ROWS:
+            leaves = self.model.apply(X)
+            return self.value[leaves.T + self.roots[:, np.newaxis]]
+
+        # Flat offset of each row in X, and the current node of every (tree, row) pair
+        row_offset = np.arange(n_rows, dtype=np.intp) * n_features
+        node = np.repeat(self.roots[:, np.newaxis], n_rows, axis=1)
+        flat = X.ravel().astype(np.float64)
+        for _ in range(self.max_depth):
+            go_left = flat[row_offset + self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.value[node]
+
+    def predict(self, X):
+        return tree_mean(self.tree_predictions(X))
+
+
+def tree_mean(tree_predictions):
+    """
+    Mean over trees accumulated in tree order, exactly like
+    RandomForestRegressor.predict (a plain sum pairs terms up for a single row)
+    """
+    return np.cumsum(tree_predictions, axis=0)[-1] / len(tree_predictions)
+
+
+def prediction_intervals(tree_predictions, coverage=0.9):
+    """
+    Mean, spread and a central ``coverage`` interval of the per-tree outputs,
+    one per row, treating the trees as samples of the predictive distribution
+    """
+    tail = (1 - coverage) / 2 * 100
+    lower, upper = np.percentile(tree_predictions, [tail, 100 - tail], axis=0)
+    return {
+        'mean': tree_mean(tree_predictions),
+        'std': tree_predictions.std(axis=0),
+        'lower': lower,
+        'upper': upper
+    }
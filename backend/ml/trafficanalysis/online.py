@@ -0,0 +1,220 @@
+import io
+import multiprocessing
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from ml.trafficanalysis.artifacts import ArtifactStore
+from ml.trafficanalysis.compression import CompressedForest
+from ml.trafficanalysis.trafficanalysis import FEATURE_COLUMNS
+
+TARGET_COLUMN = 'congestion_level'
+OBSERVATION_COLUMNS = FEATURE_COLUMNS + [TARGET_COLUMN]
+
+
+class ObservationLog:
+    """
+    Append-only CSV of newly observed traffic rows.
+
+    Readers remember the byte offset they consumed up to, so each update
+    parses only what was appended since, never the whole history.
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = os.path.join(os.path.dirname(__file__), 'observations.csv')
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, rows):
+        """Append observations (a DataFrame or a list of dicts) to the log"""
+        df = pd.DataFrame(rows, columns=OBSERVATION_COLUMNS)
+        with self._lock:
+            write_header = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            # One write call per batch, so a concurrent reader never sees half a row
+            with open(self.path, 'a') as f:
+                f.write(df.to_csv(index=False, header=write_header))
+        return len(df)
+
+    def read_from(self, offset=0):
+        """Rows appended after ``offset``, and the offset to resume from next time"""
+        if not os.path.exists(self.path):
+            return pd.DataFrame(columns=OBSERVATION_COLUMNS), 0
+        with open(self.path, 'rb') as f:
+            header = f.readline()
+            if os.path.getsize(self.path) < offset:
+                # The log was truncated or replaced; start over
+                offset = 0
+            f.seek(max(offset, len(header)))
+            data = f.read()
+        # Only consume complete lines; a row still being written is picked up next time
+        data = data[:data.rfind(b'\n') + 1]
+        end = max(offset, len(header)) + len(data)
+        if not data:
+            return pd.DataFrame(columns=OBSERVATION_COLUMNS), end
+        return pd.read_csv(io.BytesIO(header + data))[OBSERVATION_COLUMNS], end
+
+
+class IncrementalTrainer:
+    """
+    Grows the current traffic forest with trees fitted on new observations.
+
+    Each update loads the current version, fits ``trees_per_update`` extra
+    trees on the rows appended to the observation log since that version
+    (``warm_start``), drops the oldest trees beyond ``max_trees`` so the forest
+    follows recent traffic, and publishes model and the unchanged scaler as a
+    new version. The most recent ``validation_fraction`` of the new rows is
+    held out; the update is only activated when it scores at least as well
+    as the previous model there, within ``tolerance``.
+    """
+
+    def __init__(self, store=None, log=None, trees_per_update=10, max_trees=200, min_rows=100,
+                 validation_fraction=0.2, tolerance=0.01):
+        self.store = store or ArtifactStore()
+        self.log = log or ObservationLog()
+        self.trees_per_update = trees_per_update
+        self.max_trees = max_trees
+        self.min_rows = min_rows
+        self.validation_fraction = validation_fraction
+        self.tolerance = tolerance
+
+    def update(self):
+        """Run one incremental update; returns the new version's metadata, or None if there was too little data"""
+        started = time.perf_counter()
+        model, scaler, metadata = self.store.load()
+        if isinstance(model, CompressedForest):
+            raise ValueError(f"Version {metadata['version']} is a compressed forest and cannot be grown; "
+                             f"update version {metadata.get('compressed_from')} and compress the result instead")
+        # Versions from a full retrain start at the beginning of the log
+        offset = metadata.get('observations_offset', 0) if metadata.get('observations_path') == self.log.path else 0
+        rows, end = self.log.read_from(offset)
+        if len(rows) < self.min_rows:
+            return None
+
+        # Scale with the version's own scaler, kept fixed so model and scaler stay paired
+        X = (rows[FEATURE_COLUMNS].to_numpy(dtype=np.float64) - scaler.mean_) / scaler.scale_
+        y = rows[TARGET_COLUMN].to_numpy(dtype=np.float64)
+        n_validation = max(1, int(len(rows) * self.validation_fraction))
+        X_train, y_train = X[:-n_validation], y[:-n_validation]
+        X_val, y_val = X[-n_validation:], y[-n_validation:]
+        previous_r2 = float(model.score(X_val, y_val))
+
+        # A fixed seed would hand the new trees the same seed positions on every update once the
+        # forest is at max_trees; offset it by the number of updates since the full retrain instead
+        updates = metadata.get('incremental_updates', 0) + 1
+        base_seed = metadata.get('base_random_state', model.random_state)
+        if isinstance(base_seed, int):
+            model.set_params(random_state=base_seed + updates)
+
+        # Fit only the new trees, then forget the oldest beyond the cap
+        model.set_params(warm_start=True, n_estimators=len(model.estimators_) + self.trees_per_update)
+        model.fit(X_train, y_train)
+        if len(model.estimators_) > self.max_trees:
+            model.estimators_ = model.estimators_[-self.max_trees:]
+        model.set_params(warm_start=False, n_estimators=len(model.estimators_))
+        validation_r2 = float(model.score(X_val, y_val))
+
+        accepted = validation_r2 >= previous_r2 - self.tolerance
+        result = {
+            'base_version': metadata['version'],
+            'update': 'incremental',
+            'incremental_updates': updates,
+            'base_random_state': base_seed if isinstance(base_seed, int) else None,
+            'observations_path': self.log.path,
+            'observations_offset': end,
+            'new_rows': int(len(rows)),
+            'trees': len(model.estimators_),
+            'validation_rows': int(n_validation),
+            'validation_r2': validation_r2,
+            'previous_validation_r2': previous_r2,
+            'accepted': accepted,
+            'train_seconds': time.perf_counter() - started
+        }
+        result['version'] = self.store.publish(model, scaler, result, activate=accepted)
+        self.store.prune()
+        return result
+
+
+def _run_scheduler(interval, stop_event, store_root, log_path, options):
+    trainer = IncrementalTrainer(ArtifactStore(store_root), ObservationLog(log_path), **options)
+    while not stop_event.wait(interval):
+        try:
+            result = trainer.update()
+            if result is not None:
+                print(f"Incremental traffic model {result['version']}: "
+                      f"validation R² {result['validation_r2']:.4f} "
+                      f"(previous {result['previous_validation_r2']:.4f}), "
+                      f"{'activated' if result['accepted'] else 'rejected'}")
+        except Exception as e:
+            print(f"Warning: Incremental traffic model update failed: {e}")
+
+
+class RetrainScheduler:
+    """
+    Runs IncrementalTrainer.update every ``interval`` seconds in a separate
+    process, so fitting never competes with request handling for the GIL.
+    Services pick the published versions up through their ModelWatcher.
+    """
+
+    def __init__(self, interval=300.0, store_root=None, log_path=None, **options):
+        self.interval = interval
+        self.store_root = store_root
+        self.log_path = log_path
+        self.options = options
+        self._context = multiprocessing.get_context('spawn')
+        self._stop = None
+        self._process = None
+
+    @classmethod
+    def from_env(cls):
+        """Build a scheduler from TRAFFIC_RETRAIN_INTERVAL, TRAFFIC_RETRAIN_TREES and TRAFFIC_RETRAIN_MAX_TREES"""
+        return cls(
+            interval=float(os.environ.get('TRAFFIC_RETRAIN_INTERVAL', 300)),
+            trees_per_update=int(os.environ.get('TRAFFIC_RETRAIN_TREES', 10)),
+            max_trees=int(os.environ.get('TRAFFIC_RETRAIN_MAX_TREES', 200))
+        )
+
+    @property
+    def running(self):
+        return self._process is not None and self._process.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop = self._context.Event()
+        self._process = self._context.Process(
+            target=_run_scheduler,
+            args=(self.interval, self._stop, self.store_root, self.log_path, self.options),
+            name='traffic-retrain-scheduler',
+            daemon=True
+        )
+        self._process.start()
+
+    def stop(self, timeout=30):
+        if self._process is None:
+            return
+        self._stop.set()
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process = None
+
+    def status(self):
+        return {
+            'running': self.running,
+            'interval': self.interval,
+            'options': self.options
+        }
+
+
+if __name__ == "__main__":
+    result = IncrementalTrainer().update()
+    if result is None:
+        print("Not enough new observations for an update.")
+    else:
+        print(f"Model version {result['version']} published: "
+              f"validation R² {result['validation_r2']:.4f} (previous {result['previous_validation_r2']:.4f}), "
+              f"{'activated' if result['accepted'] else 'not activated'}")
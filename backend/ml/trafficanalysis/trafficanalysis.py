@@ -6,82 +6,209 @@ from sklearn.ensemble import RandomForestRegressor
 import joblib
 import os
 
+from ml.trafficanalysis.artifacts import ArtifactStore, ModelWatcher
+from ml.trafficanalysis.forest import FlatForest, prediction_intervals
+from ml.trafficanalysis.compression import CompressedForest
+from ml.trafficanalysis.cube import CongestionCube
+from ml.featurestore.store import FeatureSpec, FeatureStore
+
+# Column order the scaler and model were fitted with
+FEATURE_COLUMNS = ['time_of_day', 'day_of_week', 'vehicle_count', 'weather_condition', 'road_type']
+
+# Feature matrix layout shared by training and the serving-side aggregates
+TRAFFIC_FEATURES = FeatureSpec('traffic_analysis', numeric=FEATURE_COLUMNS, target='congestion_level', fill=None)
+
+# day_of_week runs from 1 (Monday) to 7
+DAY_NAMES = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+# Share of the per-tree predictions covered by the reported prediction interval
+INTERVAL_COVERAGE = 0.9
+
+class ModelState:
+    """
+    A model, the scaler it was trained with and the arrays derived from them.
+
+    The analyzer holds exactly one state and replaces it with a single
+    attribute assignment, so a request always sees a matching model/scaler pair.
+    """
+
+    def __init__(self, model, scaler, version=None):
+        n_features = len(FEATURE_COLUMNS)
+        mean = scaler.mean_ if scaler.mean_ is not None else np.zeros(n_features)
+        scale = scaler.scale_ if scaler.scale_ is not None else np.ones(n_features)
+        self.model = model
+        self.scaler = scaler
+        self.version = version
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.feature_importance = dict(zip(FEATURE_COLUMNS, model.feature_importances_.tolist()))
+        # A compressed forest already is the packed form the analyzer serves from
+        self.forest = model if isinstance(model, CompressedForest) else FlatForest.from_model(model)
+
+
 class TrafficAnalyzer:
-    def __init__(self):
-        self.model = None
-        self.scaler = StandardScaler()  # Initialize scaler
+    def __init__(self, data_path=None, model_dir=None, feature_store=None):
+        self._state = None
         self.model_path = os.path.join(os.path.dirname(__file__), 'traffic_congestion_model.pkl')
         self.scaler_path = os.path.join(os.path.dirname(__file__), 'scaler.pkl')
+        self.store = ArtifactStore(model_dir)
+        self.features = feature_store if feature_store is not None else FeatureStore()
+        self.watcher = None
+        if data_path is None:
+            data_path = os.path.join(os.path.dirname(__file__), 'traffic_data.csv')
+        self.data_path = data_path
+        # Day x hour x weather x road aggregates of data_path, attached on first use
+        self._cube = None
         self.load_model()
 
+    @property
+    def model(self):
+        return self._state.model if self._state is not None else None
+
+    @property
+    def scaler(self):
+        return self._state.scaler if self._state is not None else None
+
+    @property
+    def model_version(self):
+        return self._state.version if self._state is not None else None
+
     def load_model(self):
-        """Load the trained model and scaler if they exist"""
+        """Load the current published model and scaler, falling back to the legacy files"""
         try:
-            if os.path.exists(self.model_path) and os.path.exists(self.scaler_path):
+            if self.store.current_version() is not None:
+                print(f"Loading model version {self.store.current_version()} from {self.store.root}")  # Debug print
+                model, scaler, metadata = self.store.load()
+                self.swap_model(model, scaler, metadata['version'])
+            elif os.path.exists(self.model_path) and os.path.exists(self.scaler_path):
                 print(f"Loading model from {self.model_path}")  # Debug print
-                self.model = joblib.load(self.model_path)
+                model = joblib.load(self.model_path)
                 print(f"Loading scaler from {self.scaler_path}")  # Debug print
-                self.scaler = joblib.load(self.scaler_path)
+                scaler = joblib.load(self.scaler_path)
+                self.swap_model(model, scaler)
             else:
-                print("Model or scaler file not found. Using new StandardScaler.")  # Debug print
+                print("Model or scaler file not found.")  # Debug print
         except Exception as e:
             print(f"Error loading model or scaler: {str(e)}")  # Debug print
 
+    def swap_model(self, model, scaler, version=None):
+        """Atomically replace the served model and scaler"""
+        self._state = ModelState(model, scaler, version)
+
+    def start_watcher(self, interval=5.0):
+        """Reload the model in the background whenever a new version is published"""
+        if self.watcher is None:
+            self.watcher = ModelWatcher(self, self.store, interval)
+        self.watcher.start()
+
+    def stop_watcher(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+
+    def close(self):
+        """Stop the model watcher and detach from the shared aggregate cube"""
+        self.stop_watcher()
+        if self._cube is not None:
+            self._cube.close()
+            self._cube = None
+
+    @property
+    def cube(self):
+        """The shared CongestionCube of data_path"""
+        if self._cube is None:
+            self._cube = CongestionCube(self.data_path, self.features)
+        return self._cube
+
     def train(self, data_path):
         """Train the traffic analysis model"""
-        # Load and preprocess data
-        df = pd.read_csv(data_path)
-
-        # Assuming columns: time_of_day, day_of_week, vehicle_count, weather_condition, road_type
-        X = df[['time_of_day', 'day_of_week', 'vehicle_count', 'weather_condition', 'road_type']]
-        y = df['congestion_level']
+        # Feature matrix from the feature store (parsed once per version of the CSV)
+        features = self.features.materialize(TRAFFIC_FEATURES, data_path)
+        X = np.asarray(features.X, dtype=np.float64)
+        y = np.asarray(features.y)
 
         # Split data
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
         # Scale features
-        X_train_scaled = self.scaler.fit_transform(X_train)
+        scaler = StandardScaler()
+        X_train_scaled = scaler.fit_transform(X_train)
 
         # Train model
-        self.model = RandomForestRegressor(n_estimators=100, random_state=42)
-        self.model.fit(X_train_scaled, y_train)
-
-        # Save model
-        joblib.dump(self.model, self.model_path)
+        model = RandomForestRegressor(n_estimators=100, random_state=42)
+        model.fit(X_train_scaled, y_train)
 
         # Test accuracy
-        X_test_scaled = self.scaler.transform(X_test)
-        score = self.model.score(X_test_scaled, y_test)
+        X_test_scaled = scaler.transform(X_test)
+        score = model.score(X_test_scaled, y_test)
+
+        # Publish model and scaler together, then serve them
+        version = self.store.publish(model, scaler, {'data_path': data_path, 'test_r2': score})
+        self.swap_model(model, scaler, version)
         return score
 
-    def predict_congestion(self, features):
+    def predict_levels(self, rows):
         """
-        Predict traffic congestion level
-        features: dict containing time_of_day, day_of_week, vehicle_count, weather_condition, road_type
+        Predict congestion levels for many rows in one vectorized pass
+        rows: list of feature dicts, or an (n, 5) array in FEATURE_COLUMNS order
         """
-        if self.model is None:
+        state = self._state
+        if state is None:
             raise Exception("Model not trained or loaded")
+        return state.model.predict(self._scaled_rows(rows, state))
+
+    def _scaled_rows(self, rows, state):
+        if len(rows) and isinstance(rows[0], dict):
+            rows = [[features[column] for column in FEATURE_COLUMNS] for features in rows]
+        X = np.array(rows, dtype=np.float64).reshape(-1, len(FEATURE_COLUMNS))
+        X -= state.mean
+        X /= state.scale
+        return X
+
+    def predict_tree_levels(self, rows):
+        """(trees x rows) matrix of every tree's congestion level for many rows"""
+        state = self._state
+        if state is None:
+            raise Exception("Model not trained or loaded")
+        return state.forest.tree_predictions(self._scaled_rows(rows, state))
 
-        # Convert features to DataFrame
-        df = pd.DataFrame([features])
-
-        # Scale features
-        scaled_features = self.scaler.transform(df)
-
-        # Predict
-        prediction = self.model.predict(scaled_features)[0]
+    def predict_intervals(self, rows, coverage=INTERVAL_COVERAGE):
+        """
+        Congestion levels with the spread of the individual trees' predictions:
+        arrays 'mean' (equal to predict_levels), 'std', 'lower' and 'upper'
+        """
+        return prediction_intervals(self.predict_tree_levels(rows), coverage)
 
-        # Get feature importance
-        feature_importance = dict(zip(df.columns, self.model.feature_importances_))
+    def predict_congestion(self, features):
+        """
+        Predict traffic congestion level
+        features: dict containing time_of_day, day_of_week, vehicle_count, weather_condition, road_type
+        """
+        result = self.predict_intervals([features])
+        interval = {key: float(result[key][0]) for key in ('lower', 'upper', 'std')}
+        return self.describe_prediction(float(result['mean'][0]), interval)
 
+    def describe_prediction(self, prediction, interval=None):
+        """Build the full analysis response around a predicted congestion level and its interval"""
         return {
             'congestion_level': float(prediction),
-            'feature_importance': feature_importance,
+            'prediction_interval': interval,
+            'feature_importance': self.get_feature_importance(),
             'congestion_category': self._get_congestion_category(prediction),
             'hourly_distribution': self.get_hourly_distribution(),
             'historical_accuracy': self.get_historical_accuracy()
         }
 
+    def get_feature_importance(self):
+        """Feature importances of the loaded model keyed by feature name"""
+        if self._state is None:
+            raise Exception("Model not trained or loaded")
+        return dict(self._state.feature_importance)
+
+    def congestion_categories(self, predictions):
+        """_get_congestion_category for an array of predictions"""
+        labels = np.array(['Low', 'Moderate', 'High'], dtype=object)
+        return labels[np.searchsorted([0.3, 0.6], np.asarray(predictions, dtype=np.float64), side='right')]
+
     def _get_congestion_category(self, prediction):
         """Convert numerical prediction to category"""
         if prediction < 0.3:
@@ -94,43 +221,30 @@ class TrafficAnalyzer:
     def analyze_trends(self, data_path=None):
         """Analyze traffic patterns and trends"""
         if data_path is None:
-            data_path = os.path.join(os.path.dirname(__file__), 'traffic_data.csv')
+            data_path = self.data_path
 
     def get_hourly_distribution(self):
         """Get hourly traffic distribution"""
-        data_path = os.path.join(os.path.dirname(__file__), 'traffic_data.csv')
-        if not os.path.exists(data_path):
-            raise FileNotFoundError(f"Traffic data file not found at: {data_path}")
+        hours, volumes = self.hourly_distribution_arrays()
+        return dict(zip(hours.tolist(), volumes.tolist()))
 
-        df = pd.read_csv(data_path)
-        hourly_data = df.groupby('time_of_day')['vehicle_count'].mean().to_dict()
-        return hourly_data
+    def hourly_distribution_arrays(self):
+        """Hours present in the data and their mean vehicle counts, as parallel arrays"""
+        return self.cube.hourly_distribution()
 
     def get_historical_accuracy(self):
         """Get historical accuracy of traffic predictions"""
-        data_path = os.path.join(os.path.dirname(__file__), 'traffic_data.csv')
-        if not os.path.exists(data_path):
-            raise FileNotFoundError(f"Traffic data file not found at: {data_path}")
-
-        df = pd.read_csv(data_path)
-
-        # Create timestamp from time_of_day and day_of_week
-        days = {1: 'Mon', 2: 'Tue', 3: 'Wed', 4: 'Thu', 5: 'Fri', 6: 'Sat', 7: 'Sun'}
-        df['timestamp'] = df.apply(lambda row: f"{days[int(row['day_of_week'])]} {int(row['time_of_day']):02d}:00", axis=1)
-
-        # Calculate baseline prediction (mean congestion level per timestamp)
-        historical_means = df.groupby('timestamp')['congestion_level'].mean()
+        timestamps, accuracy = self.historical_accuracy_arrays()
+        return dict(zip(timestamps, accuracy.tolist()))
 
-        # Calculate accuracy per timestamp
-        accuracy_data = {}
-        for timestamp in historical_means.index:
-            group_data = df[df['timestamp'] == timestamp]
-            true_values = group_data['congestion_level']
-            predicted_value = historical_means[timestamp]
-
-            # Calculate accuracy as 1 - MAE (normalized)
-            mae = np.mean(np.abs(true_values - predicted_value))
-            accuracy = 1 - min(mae, 1)  # Ensure accuracy is between 0 and 1
-            accuracy_data[timestamp] = float(accuracy)  # Ensure JSON serializable
-
-        return accuracy_data
+    def historical_accuracy_arrays(self):
+        """
+        Accuracy of the per day-and-hour baseline (1 - RMSE against the mean
+        congestion of that slot, floored at 0), as parallel arrays of
+        "Mon 08:00" style timestamps (sorted) and accuracies
+        """
+        # The RMSE around a slot's mean is its standard deviation, read off the cube's sums
+        days, hours, _, rmse = self.cube.slot_congestion()
+        timestamps = [f"{DAY_NAMES[day]} {hour:02d}:00" for day, hour in zip(days.tolist(), hours.tolist())]
+        order = sorted(range(len(timestamps)), key=timestamps.__getitem__)
+        return [timestamps[i] for i in order], 1 - np.minimum(rmse[order], 1)
@@ -1,68 +1,95 @@
 import os
-import pandas as pd
+import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.ensemble import RandomForestRegressor
-import joblib
-from create_traffic_dataset import create_synthetic_traffic_data
 
-def train_model():
-    """Train the traffic congestion prediction model"""
-    # First generate synthetic data if it doesn't exist
-    data_path = os.path.join(os.path.dirname(__file__), 'traffic_data.csv')
+from ml.trafficanalysis.artifacts import ArtifactStore
+from ml.trafficanalysis.create_traffic_dataset import create_synthetic_traffic_data
+from ml.trafficanalysis.trafficanalysis import FEATURE_COLUMNS, TRAFFIC_FEATURES
+from ml.featurestore.store import FeatureStore
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), 'traffic_data.csv')
+
+DEFAULT_PARAMS = {
+    'n_estimators': 100,
+    'max_depth': 10,
+    'min_samples_split': 5,
+    'min_samples_leaf': 2,
+    'random_state': 42
+}
+
+def ensure_dataset(data_path=DATA_PATH, num_samples=1000):
+    """Generate synthetic traffic data if the dataset doesn't exist"""
     if not os.path.exists(data_path):
         print("Generating synthetic traffic data...")
-        df = create_synthetic_traffic_data()
+        df = create_synthetic_traffic_data(num_samples=num_samples)
         df.to_csv(data_path, index=False)
     else:
         print("Loading existing traffic data...")
-        df = pd.read_csv(data_path)
+    return data_path
+
+def fit_model(X, y, params=None, n_jobs=None, test_size=0.2):
+    """Fit the scaler and forest on a train split; returns model, scaler, holdout row indices and scores"""
+    rows = np.arange(len(X))
+    train_rows, test_rows = train_test_split(rows, test_size=test_size, random_state=42)
+    X_train, X_test, y_train, y_test = X[train_rows], X[test_rows], y[train_rows], y[test_rows]
 
-    print("Data shape:", df.shape)
-    
-    # Prepare features and target
-    X = df[['time_of_day', 'day_of_week', 'vehicle_count', 'weather_condition', 'road_type']]
-    y = df['congestion_level']
-    
-    # Split data
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    
     # Scale features
     scaler = StandardScaler()
     X_train_scaled = scaler.fit_transform(X_train)
     X_test_scaled = scaler.transform(X_test)
-    
+
     # Train model
-    print("Training Random Forest model...")
-    model = RandomForestRegressor(
-        n_estimators=100,
-        max_depth=10,
-        min_samples_split=5,
-        min_samples_leaf=2,
-        random_state=42
-    )
+    model = RandomForestRegressor(**dict(DEFAULT_PARAMS, **(params or {})), n_jobs=n_jobs)
     model.fit(X_train_scaled, y_train)
-    
-    # Evaluate model
-    train_score = model.score(X_train_scaled, y_train)
-    test_score = model.score(X_test_scaled, y_test)
-    print(f"Train R² score: {train_score:.4f}")
-    print(f"Test R² score: {test_score:.4f}")
-    
+    model.set_params(n_jobs=None)
+
+    scores = {
+        'train_r2': float(model.score(X_train_scaled, y_train)),
+        'test_r2': float(model.score(X_test_scaled, y_test))
+    }
+    return model, scaler, test_rows, scores
+
+def publish_model(model, scaler, metadata, store=None):
+    """
+    Publish model and scaler together as a new version; running services
+    pick it up through their model watcher
+    """
+    store = store or ArtifactStore()
+    version = store.publish(model, scaler, metadata)
+    store.prune()
+    return store, version
+
+def train_model():
+    """Train the traffic congestion prediction model"""
+    # First generate synthetic data if it doesn't exist
+    data_path = ensure_dataset()
+
+    # Prepare features and target from the feature store
+    features = FeatureStore().materialize(TRAFFIC_FEATURES, data_path)
+    X = np.asarray(features.X, dtype=np.float64)
+    y = np.asarray(features.y)
+    print("Data shape:", X.shape, "feature version:", features.version)
+
+    # Train and evaluate model
+    print("Training Random Forest model...")
+    model, scaler, _, scores = fit_model(X, y)
+    print(f"Train R² score: {scores['train_r2']:.4f}")
+    print(f"Test R² score: {scores['test_r2']:.4f}")
+
     # Feature importance
-    feature_importance = dict(zip(X.columns, model.feature_importances_))
+    feature_importance = dict(zip(FEATURE_COLUMNS, model.feature_importances_))
     print("\nFeature Importance:")
     for feature, importance in sorted(feature_importance.items(), key=lambda x: x[1], reverse=True):
         print(f"{feature}: {importance:.4f}")
-    
-    # Save model and scaler
-    model_path = os.path.join(os.path.dirname(__file__), 'traffic_congestion_model.pkl')
-    scaler_path = os.path.join(os.path.dirname(__file__), 'scaler.pkl')
-    
-    joblib.dump(model, model_path)
-    joblib.dump(scaler, scaler_path)
-    print(f"\nModel saved to {model_path}")
-    print(f"Scaler saved to {scaler_path}")
+
+    store, version = publish_model(model, scaler, dict({
+        'data_path': data_path,
+        'feature_version': features.version,
+        'rows': int(len(X))
+    }, **scores))
+    print(f"\nModel version {version} published to {store.version_path(version)}")
 
 if __name__ == "__main__":
     train_model()
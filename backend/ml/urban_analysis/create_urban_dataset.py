@@ -1,23 +1,27 @@
 # create_urban_dataset.py
+import os
 import pandas as pd
 import numpy as np
 
-# Create a synthetic dataset
-np.random.seed(42)
-num_samples = 1000
+DATA_PATH = os.path.join(os.path.dirname(__file__), 'urban_data.csv')
 
-data = {
-    'area_type': np.random.choice(['downtown', 'suburban', 'industrial'], num_samples),
-    'population_density': np.random.randint(100, 1000, num_samples),
-    'traffic_flow': np.random.randint(50, 500, num_samples),
-    'green_spaces': np.random.randint(0, 100, num_samples),
-    'public_transport': np.random.randint(0, 100, num_samples),
-    'optimization_suggestion': np.random.choice(['increase_green_spaces', 'optimize_traffic', 'expand_public_transport'], num_samples)
-}
+def create_urban_data(num_samples=1000):
+    """Create a synthetic dataset"""
+    np.random.seed(42)
 
-# Create DataFrame
-df = pd.DataFrame(data)
+    data = {
+        'area_type': np.random.choice(['downtown', 'suburban', 'industrial'], num_samples),
+        'population_density': np.random.randint(100, 1000, num_samples),
+        'traffic_flow': np.random.randint(50, 500, num_samples),
+        'green_spaces': np.random.randint(0, 100, num_samples),
+        'public_transport': np.random.randint(0, 100, num_samples),
+        'optimization_suggestion': np.random.choice(['increase_green_spaces', 'optimize_traffic', 'expand_public_transport'], num_samples)
+    }
 
-# Save to CSV
-df.to_csv('urban_data.csv', index=False)
-print("Synthetic dataset created and saved to urban_data.csv.")
\ No newline at end of file
+    # Create DataFrame
+    return pd.DataFrame(data)
+
+if __name__ == "__main__":
+    # Save to CSV
+    create_urban_data().to_csv(DATA_PATH, index=False)
+    print("Synthetic dataset created and saved to urban_data.csv.")
@@ -1,11 +1,23 @@
 import random
 from typing import Dict, List, Union
 
-def analyze_urban_area(area: str) -> Dict[str, Union[float, List[str]]]:
+from ml.urban_analysis.serving import SUGGESTION_TEXT
+
+def analyze_urban_area(area: str, suggestion_cache=None) -> Dict[str, Union[float, List[str]]]:
     """
     Analyze urban area and return metrics and suggestions.
-    For now, using mock data for demonstration.
+    Metrics are still mock data; with a ``suggestion_cache`` the suggestions
+    for a zone or area type come from the urban optimization classifier.
     """
+    analysis = _mock_analysis(area)
+    scored = suggestion_cache.suggestions_for(area) if suggestion_cache is not None else None
+    if scored:
+        analysis = dict(analysis,
+                        suggestions=[SUGGESTION_TEXT.get(label, label) for label, _ in scored],
+                        suggestion_scores={label: probability for label, probability in scored})
+    return analysis
+
+def _mock_analysis(area: str) -> Dict[str, Union[float, List[str]]]:
     # Mock analysis based on area type
     analysis_data = {
         "downtown": {
@@ -0,0 +1,203 @@
+import hashlib
+import os
+import sys
+import threading
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from ml.featurestore.store import FeatureStore
+from ml.urban_analysis.train_urban_model import DATA_PATH, MODEL_PATH, URBAN_FEATURES
+
+CACHE_PATH = os.path.join(os.path.dirname(__file__), 'suggestions.npz')
+
+# Rows per predict_proba call, so a full refresh of a large city stays within memory
+SCORE_CHUNK_ROWS = 50_000
+
+# What each optimization_suggestion class asks the planners to do
+SUGGESTION_TEXT = {
+    'expand_public_transport': "Expand public transport coverage",
+    'increase_green_spaces': "Increase green spaces",
+    'optimize_traffic': "Optimize traffic flow and signal timing"
+}
+
+
+def _file_digest(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+class ZoneScores:
+    """
+    Class probabilities and the top-k classes of every scored zone, sorted
+    by zone id, with the hash of the features each row was scored from.
+    Replaced as a whole on refresh, so readers always see one consistent
+    scoring pass.
+    """
+
+    def __init__(self, zone_ids, hashes, names, area_types, proba, top_k):
+        self.zone_ids = zone_ids
+        self.hashes = hashes
+        self.names = names
+        self.area_types = area_types
+        self.proba = proba
+        # (zones x k) class indices, most likely first
+        self.top = np.argsort(-proba, axis=1, kind='stable')[:, :top_k].astype(np.int16)
+
+    @classmethod
+    def empty(cls, n_classes, top_k):
+        return cls(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint64), np.empty(0, dtype=object),
+                   np.empty(0, dtype=object), np.empty((0, n_classes), dtype=np.float32), top_k)
+
+    def __len__(self):
+        return len(self.zone_ids)
+
+
+class UrbanSuggestionCache:
+    """
+    Serves the urban optimization classifier from precomputed zone scores.
+
+    The classifier is loaded once. ``refresh(zones)`` hashes each zone's
+    feature columns and re-scores only the zones that are new or whose
+    hash changed, in one vectorized ``predict_proba`` per chunk; the other
+    rows are carried over. Lookups (``zone_suggestions``,
+    ``area_suggestions``) then only read the cached probabilities.
+    """
+
+    def __init__(self, model, features, top_k=3, model_version=None):
+        self.model = model
+        self.features = features
+        self.top_k = top_k
+        self.model_version = model_version
+        self.classes = np.asarray(model.classes_, dtype=object)
+        self.raw_columns = list(features.schema['numeric']) + list(features.schema['categories'])
+        self.scores = ZoneScores.empty(len(self.classes), top_k)
+        self.last_refresh = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, model_path=MODEL_PATH, data_path=DATA_PATH, feature_store=None, top_k=3):
+        """The classifier and its training feature layout, or None if no model has been trained"""
+        if not os.path.exists(model_path):
+            print(f"No urban optimization model at {model_path}; run train_urban_model.py")
+            return None
+        features = (feature_store or FeatureStore()).materialize(URBAN_FEATURES, data_path)
+        return cls(joblib.load(model_path), features, top_k, model_version=_file_digest(model_path))
+
+    def feature_hashes(self, zones):
+        """One uint64 per zone over the columns the classifier reads"""
+        return pd.util.hash_pandas_object(zones[self.raw_columns], index=False).to_numpy()
+
+    def score(self, zones):
+        """Class probabilities for ``zones`` (float32, one row per zone)"""
+        proba = np.empty((len(zones), len(self.classes)), dtype=np.float32)
+        for start in range(0, len(zones), SCORE_CHUNK_ROWS):
+            chunk = zones.iloc[start:start + SCORE_CHUNK_ROWS]
+            proba[start:start + len(chunk)] = self.model.predict_proba(self.features.encode(chunk))
+        return proba
+
+    def refresh(self, zones):
+        """Bring the cache in line with ``zones``; returns zone, re-scored and removed counts"""
+        started = time.perf_counter()
+        zones = zones.sort_values('zone_id', kind='stable').reset_index(drop=True)
+        zone_ids = zones['zone_id'].to_numpy(dtype=np.int64)
+        hashes = self.feature_hashes(zones)
+
+        with self._lock:
+            previous = self.scores
+            # Rows whose zone was already scored from identical features
+            position = np.searchsorted(previous.zone_ids, zone_ids)
+            position = np.minimum(position, max(len(previous) - 1, 0))
+            if len(previous):
+                known = (previous.zone_ids[position] == zone_ids) & (previous.hashes[position] == hashes)
+            else:
+                known = np.zeros(len(zones), dtype=bool)
+
+            proba = np.empty((len(zones), len(self.classes)), dtype=np.float32)
+            proba[known] = previous.proba[position[known]]
+            changed = np.flatnonzero(~known)
+            if changed.size:
+                proba[changed] = self.score(zones.iloc[changed])
+
+            self.scores = ZoneScores(zone_ids, hashes, zones['name'].to_numpy(dtype=object),
+                                     zones['area_type'].to_numpy(dtype=object), proba, self.top_k)
+            self.last_refresh = time.time()
+        return {
+            'zones': int(len(zones)),
+            'rescored': int(changed.size),
+            'removed': int(len(previous) - np.isin(previous.zone_ids, zone_ids).sum()),
+            'seconds': time.perf_counter() - started
+        }
+
+    def _top(self, proba, order=None):
+        """(label, probability) pairs of the ``top_k`` most likely classes"""
+        if order is None:
+            order = np.argsort(-proba, kind='stable')[:self.top_k]
+        return [(self.classes[i], float(proba[i])) for i in order]
+
+    def zone_suggestions(self, zone):
+        """Top suggestions for one zone, by id or name; None if it is not cached"""
+        scores = self.scores
+        if isinstance(zone, str):
+            matches = np.flatnonzero(scores.names == zone)
+        else:
+            position = np.searchsorted(scores.zone_ids, zone)
+            matches = [position] if position < len(scores) and scores.zone_ids[position] == zone else []
+        if len(matches) == 0:
+            return None
+        return self._top(scores.proba[matches[0]], scores.top[matches[0]])
+
+    def area_suggestions(self, area_type):
+        """Top suggestions over all zones of an area type (mean probabilities); None if there are none"""
+        scores = self.scores
+        mask = scores.area_types == area_type
+        if not mask.any():
+            return None
+        return self._top(scores.proba[mask].mean(axis=0))
+
+    def suggestions_for(self, area):
+        """Suggestions for a zone name or id, else for an area type"""
+        return self.zone_suggestions(area) or self.area_suggestions(area)
+
+    def save(self, path=CACHE_PATH):
+        """Write the cached scores next to the model version they came from"""
+        scores = self.scores
+        tmp_path = f'{path}.tmp-{os.getpid()}.npz'
+        np.savez(tmp_path, zone_ids=scores.zone_ids, hashes=scores.hashes, names=scores.names.astype(str),
+                 area_types=scores.area_types.astype(str), proba=scores.proba,
+                 classes=self.classes.astype(str), model_version=np.asarray(self.model_version or ''))
+        os.replace(tmp_path, path)
+
+    def restore(self, path=CACHE_PATH):
+        """Adopt scores saved by ``save`` if they were made by this model version; returns whether it did"""
+        if not os.path.exists(path):
+            return False
+        with np.load(path) as saved:
+            if str(saved['model_version']) != (self.model_version or '') or \
+                    saved['classes'].tolist() != self.classes.tolist():
+                return False
+            self.scores = ZoneScores(saved['zone_ids'], saved['hashes'], saved['names'].astype(object),
+                                     saved['area_types'].astype(object), saved['proba'], self.top_k)
+        return True
+
+
+def main(zones_path=None, cache_path=CACHE_PATH):
+    """Nightly refresh: re-score the zones that changed since the saved cache and save it"""
+    cache = UrbanSuggestionCache.load()
+    if cache is None:
+        raise SystemExit(1)
+    restored = cache.restore(cache_path)
+    zones = pd.read_csv(zones_path or os.path.join(os.path.dirname(__file__), 'zones.csv'))
+    stats = cache.refresh(zones)
+    cache.save(cache_path)
+    print(f"{stats['zones']} zones, {stats['rescored']} re-scored ({'from saved cache' if restored else 'cold'}), "
+          f"{stats['removed']} removed in {stats['seconds']:.2f}s; saved to {cache_path}")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
@@ -0,0 +1,138 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR = os.path.dirname(__file__)
+
+ZONE_METRICS = ['congestion_score', 'green_space_ratio', 'public_transport_coverage']
+
+
+def _expand_ranges(starts, ends):
+    """Concatenate ``arange(start, end)`` for every pair without a Python loop"""
+    lengths = ends - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(total)
+
+
+def _str_order(boxes, capacity):
+    """Sort-Tile-Recursive order: x slabs of whole nodes, then y within each slab"""
+    count = len(boxes)
+    centre_x = (boxes[:, 0] + boxes[:, 2]) / 2
+    centre_y = (boxes[:, 1] + boxes[:, 3]) / 2
+    n_nodes = -(-count // capacity)
+    slab_size = capacity * int(np.ceil(np.sqrt(n_nodes)))
+    by_x = np.argsort(centre_x, kind='stable')
+    slab = np.empty(count, dtype=np.int64)
+    slab[by_x] = np.arange(count) // slab_size
+    return np.lexsort((centre_y, slab))
+
+
+class STRTree:
+    """
+    Static R-tree over axis-aligned boxes, bulk-loaded with Sort-Tile-Recursive.
+
+    Every level is a flat array of boxes plus, for inner levels, the
+    contiguous range of children each node covers in the level below, so a
+    query tests a whole level with one vectorized comparison.
+    """
+
+    def __init__(self, boxes, capacity=16):
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        self.capacity = capacity
+
+        order = _str_order(boxes, capacity) if len(boxes) else np.empty(0, dtype=np.int64)
+        self.item_ids = order
+        self.item_boxes = boxes[order]
+
+        # levels[0] is the root; each entry holds (boxes, child_start, child_end)
+        levels = []
+        level_boxes = self.item_boxes
+        while len(level_boxes) > capacity:
+            starts = np.arange(0, len(level_boxes), capacity)
+            ends = np.minimum(starts + capacity, len(level_boxes))
+            node_boxes = np.column_stack([
+                np.minimum.reduceat(level_boxes[:, 0], starts),
+                np.minimum.reduceat(level_boxes[:, 1], starts),
+                np.maximum.reduceat(level_boxes[:, 2], starts),
+                np.maximum.reduceat(level_boxes[:, 3], starts)
+            ])
+            # Pack the parents themselves in STR order; their child ranges move with them
+            parent_order = _str_order(node_boxes, capacity)
+            levels.append((node_boxes[parent_order], starts[parent_order], ends[parent_order]))
+            level_boxes = node_boxes[parent_order]
+        self.levels = levels[::-1]
+
+    def __len__(self):
+        return len(self.item_ids)
+
+    def _search(self, hits_fn):
+        """Descend level by level, keeping only entries whose box passes ``hits_fn``"""
+        if len(self.item_ids) == 0:
+            return np.empty(0, dtype=np.int64)
+        if self.levels:
+            boxes, starts, ends = self.levels[0]
+            candidates = np.flatnonzero(hits_fn(boxes))
+            for boxes, next_starts, next_ends in self.levels[1:]:
+                children = _expand_ranges(starts[candidates], ends[candidates])
+                candidates = children[hits_fn(boxes[children])]
+                starts, ends = next_starts, next_ends
+            items = _expand_ranges(starts[candidates], ends[candidates])
+        else:
+            items = np.arange(len(self.item_ids))
+        return self.item_ids[items[hits_fn(self.item_boxes[items])]]
+
+    def query_bbox(self, min_x, min_y, max_x, max_y):
+        """Ids of the boxes intersecting the query rectangle"""
+        return self._search(lambda b: (b[:, 0] <= max_x) & (b[:, 2] >= min_x) &
+                                      (b[:, 1] <= max_y) & (b[:, 3] >= min_y))
+
+    def query_radius(self, x, y, radius):
+        """Ids of the boxes within ``radius`` of the point (x, y)"""
+        def within(b):
+            dx = np.maximum(np.maximum(b[:, 0] - x, x - b[:, 2]), 0)
+            dy = np.maximum(np.maximum(b[:, 1] - y, y - b[:, 3]), 0)
+            return dx * dx + dy * dy <= radius * radius
+        return self._search(within)
+
+
+class ZoneIndex:
+    """Planning zones with an STR-tree over their bounding boxes"""
+
+    def __init__(self, zones, capacity=16):
+        self.zones = zones.reset_index(drop=True)
+        self.boxes = self.zones[['min_x', 'min_y', 'max_x', 'max_y']].to_numpy(dtype=np.float64)
+        self.area = (self.boxes[:, 2] - self.boxes[:, 0]) * (self.boxes[:, 3] - self.boxes[:, 1])
+        self.metrics = self.zones[ZONE_METRICS].to_numpy(dtype=np.float64)
+        self.tree = STRTree(self.boxes, capacity)
+
+    @classmethod
+    def from_csv(cls, path=None):
+        return cls(pd.read_csv(path or os.path.join(DATA_DIR, 'zones.csv')))
+
+    def query_bbox(self, min_x, min_y, max_x, max_y):
+        return self.tree.query_bbox(min_x, min_y, max_x, max_y)
+
+    def query_radius(self, x, y, radius):
+        return self.tree.query_radius(x, y, radius)
+
+    def aggregate(self, hits):
+        """Area-weighted means of the zone metrics over the hit set"""
+        hits = np.sort(hits)
+        weights = self.area[hits]
+        total = weights.sum()
+        if hits.size == 0 or total <= 0:
+            means = np.full(len(ZONE_METRICS), np.nan)
+        else:
+            means = weights @ self.metrics[hits] / total
+        area_types, counts = np.unique(self.zones['area_type'].to_numpy()[hits], return_counts=True)
+        return {
+            'zone_count': int(hits.size),
+            'total_area_m2': float(total),
+            **{metric: float(value) for metric, value in zip(ZONE_METRICS, means)},
+            'area_type_counts': dict(zip(area_types.tolist(), counts.tolist())),
+            'zones': hits
+        }
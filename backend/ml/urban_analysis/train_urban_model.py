@@ -1,32 +1,56 @@
 # train_urban_model.py
-import pandas as pd
+import os
+import numpy as np
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score
 import joblib
 
-# Load the dataset
-df = pd.read_csv('urban_data.csv')
+from ml.featurestore.store import FeatureSpec, FeatureStore
 
-# Convert categorical variables to numerical
-df = pd.get_dummies(df, columns=['area_type'], drop_first=True)
+DATA_PATH = os.path.join(os.path.dirname(__file__), 'urban_data.csv')
+MODEL_PATH = os.path.join(os.path.dirname(__file__), 'urban_optimization_model.pkl')
 
-# Prepare features and target
-X = df.drop('optimization_suggestion', axis=1)
-y = df['optimization_suggestion']
+# Same columns as pd.get_dummies(df, columns=['area_type'], drop_first=True) minus the target
+URBAN_FEATURES = FeatureSpec(
+    'urban_optimization',
+    numeric=['population_density', 'traffic_flow', 'green_spaces', 'public_transport'],
+    categorical=['area_type'],
+    target='optimization_suggestion',
+    drop_first=True,
+    fill=None,
+    categorical_target=True
+)
 
-# Split the data
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+DEFAULT_PARAMS = {'n_estimators': 100, 'random_state': 42}
 
-# Train the model
-model = RandomForestClassifier(n_estimators=100, random_state=42)
-model.fit(X_train, y_train)
+def fit_model(X, y, params=None, n_jobs=None, test_size=0.2):
+    """Fit the classifier on a train split; returns model, holdout row indices and test accuracy"""
+    rows = np.arange(len(X))
+    train_rows, test_rows = train_test_split(rows, test_size=test_size, random_state=42)
 
-# Evaluate the model
-y_pred = model.predict(X_test)
-accuracy = accuracy_score(y_test, y_pred)
-print(f"Model accuracy: {accuracy * 100:.2f}%")
+    model = RandomForestClassifier(**dict(DEFAULT_PARAMS, **(params or {})), n_jobs=n_jobs)
+    model.fit(X[train_rows], y[train_rows])
+    model.set_params(n_jobs=None)
 
-# Save the model
-joblib.dump(model, 'urban_optimization_model.pkl')
-print("Model trained and saved to urban_optimization_model.pkl.")
\ No newline at end of file
+    accuracy = accuracy_score(y[test_rows], model.predict(X[test_rows]))
+    return model, test_rows, float(accuracy)
+
+def main():
+    # Load the feature matrix (area_type one-hot encoded with a recorded vocabulary)
+    features = FeatureStore().materialize(URBAN_FEATURES, DATA_PATH)
+
+    # Prepare features and target
+    X = np.asarray(features.X)
+    y = features.target_labels()
+
+    # Train and evaluate the model
+    model, _, accuracy = fit_model(X, y)
+    print(f"Model accuracy: {accuracy * 100:.2f}%")
+
+    # Save the model
+    joblib.dump(model, MODEL_PATH)
+    print(f"Model trained and saved to {MODEL_PATH}.")
+
+if __name__ == "__main__":
+    main()
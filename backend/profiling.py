@@ -0,0 +1,194 @@
+import asyncio
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse, PlainTextResponse
+
+PROFILE_HEADER = b'x-profile'
+
+
+class RequestProfiler:
+    """
+    Opt-in cProfile capture for individual requests.
+
+    A request is profiled when header triggering is enabled and it carries
+    ``X-Profile: 1``, or when it is picked by the sampling rate. Profiles are
+    written to ``profile_dir`` as pstats dumps with a JSON sidecar, and only
+    the ``max_profiles`` most recent ones are kept.
+    """
+
+    def __init__(self, profile_dir=None, sample_rate=0.0, header_enabled=False, max_profiles=50):
+        if profile_dir is None:
+            profile_dir = os.path.join(os.path.dirname(__file__), 'profiles')
+        self.profile_dir = profile_dir
+        self.sample_rate = sample_rate
+        self.header_enabled = header_enabled
+        self.max_profiles = max_profiles
+        # cProfile hooks the whole thread, so only one request is captured at a time
+        self._busy = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Build a profiler from PROFILING_ENABLED, PROFILE_SAMPLE_RATE, PROFILE_DIR and PROFILE_MAX_FILES"""
+        return cls(
+            profile_dir=os.environ.get('PROFILE_DIR'),
+            sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', 0.0)),
+            header_enabled=os.environ.get('PROFILING_ENABLED', '').lower() in ('1', 'true', 'yes'),
+            max_profiles=int(os.environ.get('PROFILE_MAX_FILES', 50))
+        )
+
+    @property
+    def active(self):
+        return self.header_enabled or self.sample_rate > 0
+
+    def should_profile(self, scope):
+        """Decide whether the request described by an ASGI scope gets profiled"""
+        if self.header_enabled:
+            for name, value in scope.get('headers', ()):
+                if name == PROFILE_HEADER:
+                    return value.strip() in (b'1', b'true')
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def save(self, profile, metadata):
+        """Persist a finished profile and prune the oldest ones beyond the limit"""
+        os.makedirs(self.profile_dir, exist_ok=True)
+        slug = re.sub(r'[^a-zA-Z0-9]+', '-', metadata['path']).strip('-') or 'root'
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{slug}-{uuid.uuid4().hex[:8]}"
+        metadata = dict(metadata, id=profile_id)
+
+        profile.dump_stats(os.path.join(self.profile_dir, profile_id + '.prof'))
+        with open(os.path.join(self.profile_dir, profile_id + '.json'), 'w') as f:
+            json.dump(metadata, f)
+        self._prune()
+        return profile_id
+
+    def _prune(self):
+        """Remove the oldest profiles so at most max_profiles remain"""
+        for metadata in self.list_profiles()[self.max_profiles:]:
+            for suffix in ('.prof', '.json'):
+                try:
+                    os.remove(os.path.join(self.profile_dir, metadata['id'] + suffix))
+                except FileNotFoundError:
+                    pass
+
+    def list_profiles(self):
+        """Return metadata of stored profiles, newest first"""
+        if not os.path.isdir(self.profile_dir):
+            return []
+        profiles = []
+        for name in os.listdir(self.profile_dir):
+            if name.endswith('.json'):
+                try:
+                    with open(os.path.join(self.profile_dir, name)) as f:
+                        profiles.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return sorted(profiles, key=lambda p: p['started_at'], reverse=True)
+
+    def profile_path(self, profile_id):
+        """Return the pstats file for a profile id, or None if it does not exist"""
+        if not re.fullmatch(r'[a-zA-Z0-9-]+', profile_id):
+            return None
+        path = os.path.join(self.profile_dir, profile_id + '.prof')
+        return path if os.path.exists(path) else None
+
+    def format_profile(self, profile_id, sort='cumulative', limit=50):
+        """Render a stored profile as a pstats text report"""
+        path = self.profile_path(profile_id)
+        if path is None:
+            return None
+        stream = io.StringIO()
+        stats = pstats.Stats(path, stream=stream)
+        stats.sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that runs selected requests under cProfile.
+
+    Unprofiled requests only pay for the ``active`` check (and a header scan
+    when header triggering is on). Other coroutines interleaved on the event
+    loop while a profile is running show up in that profile as well.
+
+    cProfile only sees the event-loop thread, so only ``async def`` routes are
+    profiled in full. Plain ``def`` routes (``/api/scenarios/simulate``,
+    ``/api/urban-zones/suggestions/refresh``) and work handed to threads or
+    processes run elsewhere and show up only as the wait for them.
+    """
+
+    def __init__(self, app, profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if (scope['type'] != 'http' or not self.profiler.active
+                or not self.profiler.should_profile(scope)
+                or not self.profiler._busy.acquire(blocking=False)):
+            await self.app(scope, receive, send)
+            return
+
+        status = {}
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+
+        profile = cProfile.Profile()
+        started_at = time.time()
+        start = time.perf_counter()
+        try:
+            profile.enable()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                profile.disable()
+        finally:
+            self.profiler._busy.release()
+            metadata = {
+                'method': scope['method'],
+                'path': scope['path'],
+                'status_code': status.get('code'),
+                'duration_ms': (time.perf_counter() - start) * 1000,
+                'started_at': started_at
+            }
+            try:
+                # Writing and pruning profiles is disk I/O; keep it off the event loop
+                await asyncio.get_running_loop().run_in_executor(None, self.profiler.save, profile, metadata)
+            except Exception as e:
+                print(f"Warning: Could not store profile: {e}")
+
+
+profiler = RequestProfiler.from_env()
+router = APIRouter()
+
+
+@router.get("/api/profiles")
+async def list_profiles():
+    return profiler.list_profiles()
+
+
+@router.get("/api/profiles/{profile_id}")
+async def get_profile(profile_id: str, format: str = 'text', sort: str = 'cumulative', limit: int = 50):
+    if format == 'pstats':
+        path = profiler.profile_path(profile_id)
+        if path is None:
+            raise HTTPException(status_code=404, detail="Profile not found")
+        return FileResponse(path, media_type='application/octet-stream', filename=profile_id + '.prof')
+    try:
+        report = profiler.format_profile(profile_id, sort=sort, limit=limit)
+    except KeyError:
+        raise HTTPException(status_code=400, detail=f"Unknown sort key: {sort}")
+    if report is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(report)
@@ -0,0 +1,253 @@
+import gzip
+import io
+import json
+import math
+import os
+import struct
+
+import numpy as np
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = int(os.environ.get('RESPONSE_COMPRESS_MIN_BYTES', 16 * 1024))
+
+# Fast settings; large numeric payloads compress well even at low levels
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+LAYOUTS = ('rows', 'columns')
+
+JSON_MEDIA_TYPE = 'application/json'
+ARROW_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+NPY_MEDIA_TYPE = 'application/x-npy'
+FLOAT32_MEDIA_TYPE = 'application/x-float32'
+
+# Per numeric column: name length (uint16), value count (uint32), name (UTF-8), little-endian float32 values
+FLOAT32_FRAME = struct.Struct('<HI')
+
+
+def _default(obj):
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.kind == 'f' and not np.isfinite(obj).all():
+            return np.where(np.isfinite(obj), obj.astype(object), None).tolist()
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return _finite(obj.item())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _finite(content):
+    """``content`` with NaN and infinite floats replaced by None, as orjson writes them"""
+    if isinstance(content, float):
+        return content if math.isfinite(content) else None
+    if isinstance(content, dict):
+        return {key: _finite(value) for key, value in content.items()}
+    if isinstance(content, (list, tuple)):
+        return [_finite(value) for value in content]
+    return content
+
+
+def dumps(content):
+    """
+    Serialize to compact JSON bytes. Numpy arrays and scalars are written
+    directly (by orjson when it is installed, as lists otherwise), so
+    columnar payloads never go through per-row Python objects. NaN and
+    infinities are written as null on both paths.
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    try:
+        return json.dumps(content, default=_default, ensure_ascii=False, allow_nan=False,
+                          separators=(',', ':')).encode('utf-8')
+    except ValueError:
+        # A non-finite Python float; only then walk the content to null them
+        return json.dumps(_finite(content), default=_default, ensure_ascii=False, allow_nan=False,
+                          separators=(',', ':')).encode('utf-8')
+
+
+def accepted_encodings(request):
+    """Content codings the client accepts (ignoring ones it refuses with q=0)"""
+    if request is None:
+        return set()
+    encodings = set()
+    for item in request.headers.get('accept-encoding', '').split(','):
+        coding, _, params = item.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        if coding:
+            encodings.add(coding.strip().lower())
+    return encodings
+
+
+def compress(body, request):
+    """Compress a body with brotli or gzip when it is large enough and the client accepts it"""
+    if len(body) < COMPRESS_MIN_BYTES:
+        return body, None
+    encodings = accepted_encodings(request)
+    if brotli is not None and 'br' in encodings:
+        return brotli.compress(body, quality=BROTLI_QUALITY), 'br'
+    if 'gzip' in encodings:
+        return gzip.compress(body, compresslevel=GZIP_LEVEL), 'gzip'
+    return body, None
+
+
+def json_response(content, request=None, status_code=200, headers=None):
+    """A JSON Response serialized with ``dumps`` and compressed for ``request`` if worthwhile"""
+    body = dumps(content)
+    headers = dict(headers or {})
+    if len(body) >= COMPRESS_MIN_BYTES:
+        headers['Vary'] = ', '.join(filter(None, [headers.get('Vary'), 'Accept-Encoding']))
+    body, encoding = compress(body, request)
+    if encoding is not None:
+        headers['Content-Encoding'] = encoding
+    return Response(content=body, status_code=status_code, headers=headers, media_type='application/json')
+
+
+def check_layout(layout):
+    if layout not in LAYOUTS:
+        raise HTTPException(status_code=422, detail=f"layout must be one of {', '.join(LAYOUTS)}")
+    return layout
+
+
+def rows(columns):
+    """Row-wise records (a list of dicts) from a dict of equal-length columns"""
+    names = list(columns)
+    values = [v.tolist() if isinstance(v, np.ndarray) else list(v) for v in columns.values()]
+    return [dict(zip(names, row)) for row in zip(*values)]
+
+
+def tabular(columns, layout):
+    """``columns`` as parallel arrays ('columns') or as a list of records ('rows')"""
+    return columns if check_layout(layout) == 'columns' else rows(columns)
+
+
+def media_types():
+    """Media types the columnar endpoints can produce here (Arrow needs pyarrow)"""
+    types = [JSON_MEDIA_TYPE, NPY_MEDIA_TYPE, FLOAT32_MEDIA_TYPE]
+    if pa is not None:
+        types.insert(1, ARROW_MEDIA_TYPE)
+    return types
+
+
+def negotiate(request):
+    """
+    The response media type for the request's Accept header: the available
+    type with the highest q-value, in header order on ties, JSON for
+    wildcards or no header. Raises 406 when nothing acceptable is available.
+    """
+    accept = request.headers.get('accept', '') if request is not None else ''
+    if not accept.strip():
+        return JSON_MEDIA_TYPE
+    available = media_types()
+    candidates = []
+    for position, item in enumerate(accept.split(',')):
+        media, _, params = item.partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            candidates.append((-quality, position, media.strip().lower()))
+    for _, _, media in sorted(candidates):
+        if media in ('*/*', 'application/*'):
+            return JSON_MEDIA_TYPE
+        if media in available:
+            return media
+    raise HTTPException(status_code=406, detail=f"Acceptable media types: {', '.join(available)}")
+
+
+def _is_numeric(values):
+    return isinstance(values, np.ndarray) and values.dtype.kind in 'biuf'
+
+
+def _arrow_body(columns, metadata):
+    # Numeric numpy columns are wrapped without copying
+    arrays = [pa.array(values) if _is_numeric(values) else pa.array(list(values), type=pa.string())
+              for values in columns.values()]
+    batch = pa.RecordBatch.from_arrays(arrays, names=list(columns))
+    if metadata:
+        batch = batch.replace_schema_metadata({key: json.dumps(value) for key, value in metadata.items()})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def _npy_body(columns):
+    # One structured array, so np.load gives a record array pd.DataFrame accepts as is
+    arrays = [np.asarray(values) for values in columns.values()]
+    record = np.empty(len(arrays[0]) if arrays else 0, dtype=[(name, a.dtype) for name, a in zip(columns, arrays)])
+    for name, values in zip(columns, arrays):
+        record[name] = values
+    buffer = io.BytesIO()
+    np.save(buffer, record, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def _float32_body(columns):
+    parts = []
+    for name, values in columns.items():
+        if not _is_numeric(values):
+            continue
+        data = np.ascontiguousarray(values, dtype='<f4')
+        encoded = name.encode('utf-8')
+        parts += [FLOAT32_FRAME.pack(len(encoded), data.size), encoded, memoryview(data).cast('B')]
+    return b''.join(parts)
+
+
+def read_float32_frames(body):
+    """Decode an application/x-float32 body into {column: float32 array} (views into ``body``)"""
+    columns, offset = {}, 0
+    while offset < len(body):
+        name_length, count = FLOAT32_FRAME.unpack_from(body, offset)
+        offset += FLOAT32_FRAME.size
+        name = bytes(body[offset:offset + name_length]).decode('utf-8')
+        offset += name_length
+        columns[name] = np.frombuffer(body, dtype='<f4', count=count, offset=offset)
+        offset += 4 * count
+    return columns
+
+
+def binary_response(columns, media_type, metadata=None):
+    """
+    ``columns`` (name -> numpy array, or a list of strings) as an Arrow IPC
+    stream, a structured ``.npy`` or float32 frames. Float32 frames carry
+    the numeric columns only; ``metadata`` goes into the Arrow schema.
+    """
+    if media_type == ARROW_MEDIA_TYPE:
+        body = _arrow_body(columns, metadata)
+    elif media_type == NPY_MEDIA_TYPE:
+        body = _npy_body(columns)
+    elif media_type == FLOAT32_MEDIA_TYPE:
+        body = _float32_body(columns)
+    else:
+        raise ValueError(f"Unsupported media type: {media_type}")
+    return Response(content=body, media_type=media_type, headers={'Vary': 'Accept'})
+
+
+def columnar_response(columns, request, media_type, layout='rows'):
+    """Parallel columns in the negotiated ``media_type``; JSON in the requested layout"""
+    if media_type == JSON_MEDIA_TYPE:
+        return json_response(tabular(columns, layout), request, headers={'Vary': 'Accept'})
+    return binary_response(columns, media_type)
@@ -0,0 +1,341 @@
+import asyncio
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from fastapi import APIRouter, HTTPException, Request
+
+from ml.trafficanalysis.compression import CompressedForest
+from ml.trafficanalysis.trafficanalysis import TrafficAnalyzer
+from ml.trafficanalysis.online import ObservationLog
+from ml.sustainablitycheck.check import SustainabilityAnalyzer
+
+TENANT_HEADER = 'x-tenant-id'
+DEFAULT_TENANT = 'default'
+
+# Public per-node arrays of a fitted sklearn tree, used to size its node storage
+TREE_NODE_ARRAYS = ('children_left', 'children_right', 'feature', 'threshold', 'impurity',
+                    'n_node_samples', 'weighted_n_node_samples')
+
+# /api/tenants/<tenant>/<route> is served by /api/<route> for that tenant
+TENANT_PATH = re.compile(r'^/api/tenants/([A-Za-z0-9_-]+)(/.+)$')
+TENANT_ID = re.compile(r'[A-Za-z0-9_-]+')
+
+
+class TenantContext:
+    """The analyzers serving one city, with their data under one directory"""
+
+    def __init__(self, tenant_id, traffic, sustainability, observations, pinned=False):
+        self.tenant_id = tenant_id
+        self.traffic = traffic
+        self.sustainability = sustainability
+        self.observations = observations
+        self.pinned = pinned
+        self.leases = 0
+        self.retired = False
+        self._estimate = None
+
+    @property
+    def memory_bytes(self):
+        """estimate_bytes, recomputed after a hot reload or new sustainability rows"""
+        key = (self.traffic.model_version, id(self.traffic._state), len(self.sustainability.historical_data))
+        if self._estimate is None or self._estimate[0] != key:
+            self._estimate = (key, estimate_bytes(self))
+        return self._estimate[1]
+
+    @classmethod
+    def load(cls, tenant_id, path, watch_interval=0):
+        """
+        Build a tenant from its directory: ``models/`` holds its published
+        traffic model versions, next to ``traffic_data.csv`` and
+        ``sustainability_data.csv``
+        """
+        traffic = TrafficAnalyzer(data_path=os.path.join(path, 'traffic_data.csv'),
+                                  model_dir=os.path.join(path, 'models'))
+        if traffic.model_version is None:
+            # Never fall back to the default city's legacy model files
+            raise Exception(f"Tenant {tenant_id} has no published traffic model")
+        if watch_interval > 0:
+            traffic.start_watcher(watch_interval)
+        return cls(tenant_id, traffic,
+                   SustainabilityAnalyzer(os.path.join(path, 'sustainability_data.csv')),
+                   ObservationLog(os.path.join(path, 'observations.csv')))
+
+    def close(self):
+        self.traffic.close()
+        self.sustainability.close()
+
+
+def estimate_bytes(context):
+    """Approximate resident size of a tenant: its forest (sklearn trees and/or the flat arrays) and sustainability history"""
+    total = 0
+    state = context.traffic._state
+    if state is not None:
+        # A compressed model has no sklearn trees; it is its own flat forest
+        if not isinstance(state.model, CompressedForest):
+            estimators = state.model.estimators_
+            if len(estimators):
+                tree = estimators[0].tree_
+                node_bytes = sum(getattr(tree, name).itemsize for name in TREE_NODE_ARRAYS)
+                value_bytes = tree.value.itemsize * tree.n_outputs * tree.max_n_classes
+                total += sum(e.tree_.node_count for e in estimators) * (node_bytes + value_bytes)
+        arrays = list(vars(state.forest).values()) + list(vars(state.forest).get('_routing') or ())
+        total += sum(a.nbytes for a in arrays if isinstance(a, np.ndarray))
+    total += int(context.sustainability.historical_data.memory_usage(deep=True).sum())
+    return int(total)
+
+
+class TenantStats:
+    def __init__(self):
+        self.hits = 0
+        self.loads = 0
+        self.shared_loads = 0
+        self.failed_loads = 0
+        self.evictions = 0
+        self.last_load_seconds = None
+        self.last_used = None
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+class TenantRegistry:
+    """
+    Lazily loaded per-city analyzers, kept within a memory budget.
+
+    Each tenant lives in ``<root>/<tenant id>`` (see ``TenantContext.load``)
+    and is loaded on its first request. Requests that arrive while a tenant
+    is loading wait for that same load instead of starting their own. When
+    the loaded tenants exceed ``memory_budget`` bytes, the least recently used
+    ones are dropped. Each request leases its context (``acquire``/``release``)
+    and an evicted context is only closed once its last lease is released, so
+    requests still holding it finish normally. The default tenant is the service's own analyzers; it is pinned and never
+    evicted.
+    """
+
+    def __init__(self, root=None, memory_budget=1 << 30, watch_interval=0, load_workers=2):
+        if root is None:
+            root = os.path.join(os.path.dirname(__file__), 'tenants')
+        self.root = root
+        self.memory_budget = memory_budget
+        self.watch_interval = watch_interval
+        self._loaded = OrderedDict()
+        self._loading = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=load_workers, thread_name_prefix='tenant-loader')
+
+    @classmethod
+    def from_env(cls):
+        """Build a registry from TENANTS_DIR, TENANT_MEMORY_BUDGET_MB and TRAFFIC_MODEL_WATCH_INTERVAL"""
+        return cls(
+            root=os.environ.get('TENANTS_DIR'),
+            memory_budget=int(float(os.environ.get('TENANT_MEMORY_BUDGET_MB', 1024)) * (1 << 20)),
+            watch_interval=float(os.environ.get('TRAFFIC_MODEL_WATCH_INTERVAL', 5))
+        )
+
+    def register(self, context):
+        """Serve an already built tenant (the default one), pinned in memory"""
+        context.pinned = True
+        with self._lock:
+            self._loaded[context.tenant_id] = context
+            self._stats.setdefault(context.tenant_id, TenantStats())
+
+    def tenant_path(self, tenant_id):
+        return os.path.join(self.root, tenant_id)
+
+    def known_tenants(self):
+        tenants = set(self._loaded)
+        if os.path.isdir(self.root):
+            tenants.update(name for name in os.listdir(self.root)
+                           if TENANT_ID.fullmatch(name) and os.path.isdir(self.tenant_path(name)))
+        return sorted(tenants)
+
+    def _resolve(self, tenant_id):
+        """The loaded tenant, or the future of its (possibly shared) load"""
+        with self._lock:
+            stats = self._stats.setdefault(tenant_id, TenantStats())
+            stats.last_used = time.time()
+            context = self._loaded.get(tenant_id)
+            if context is not None:
+                self._loaded.move_to_end(tenant_id)
+                stats.hits += 1
+                context.leases += 1
+                return context, None
+            future = self._loading.get(tenant_id)
+            if future is not None:
+                stats.shared_loads += 1
+                return None, future
+            if not TENANT_ID.fullmatch(tenant_id) or not os.path.isdir(self.tenant_path(tenant_id)):
+                raise KeyError(f"Unknown tenant: {tenant_id}")
+            stats.loads += 1
+            future = self._executor.submit(self._load, tenant_id)
+            self._loading[tenant_id] = future
+            return None, future
+
+    def get(self, tenant_id):
+        """A lease on the tenant's context, loading it first if needed (blocking); ``release`` it when done"""
+        while True:
+            context, future = self._resolve(tenant_id)
+            if context is not None:
+                return context
+            # Resolve again: the loaded context may have been evicted before it was leased
+            future.result()
+
+    async def acquire(self, tenant_id):
+        """``get`` awaiting the load without blocking the event loop"""
+        while True:
+            context, future = self._resolve(tenant_id)
+            if context is not None:
+                return context
+            await asyncio.wrap_future(future)
+
+    def release(self, context):
+        """Return a lease; the last one on an evicted context closes it (on a loader thread)"""
+        with self._lock:
+            context.leases -= 1
+            if not context.retired or context.leases > 0:
+                return
+        try:
+            self._executor.submit(context.close)
+        except RuntimeError:
+            # Registry already shut down
+            context.close()
+
+    def _retire(self, context):
+        """Mark an unloaded context; returns it when nothing leases it and it can be closed now (lock held)"""
+        context.retired = True
+        return context if context.leases == 0 else None
+
+    def _load(self, tenant_id):
+        started = time.perf_counter()
+        try:
+            context = TenantContext.load(tenant_id, self.tenant_path(tenant_id), self.watch_interval)
+        except Exception:
+            with self._lock:
+                self._loading.pop(tenant_id, None)
+                self._stats[tenant_id].failed_loads += 1
+            raise
+        with self._lock:
+            self._loaded[tenant_id] = context
+            self._loading.pop(tenant_id, None)
+            self._stats[tenant_id].last_load_seconds = time.perf_counter() - started
+            evicted = self._evict(keep=tenant_id)
+            closable = [old for old in evicted if self._retire(old) is not None]
+        for old in closable:
+            old.close()
+        print(f"Loaded tenant {tenant_id} ({context.memory_bytes / (1 << 20):.1f} MB)"
+              + (f", evicted {[old.tenant_id for old in evicted]}" if evicted else ""))  # Debug print
+        return context
+
+    def _evict(self, keep):
+        """Drop least recently used tenants until the budget holds (called with the lock held)"""
+        evicted = []
+        for tenant_id in list(self._loaded):
+            if self.memory_bytes() <= self.memory_budget:
+                break
+            context = self._loaded[tenant_id]
+            if context.pinned or tenant_id == keep:
+                continue
+            del self._loaded[tenant_id]
+            self._stats[tenant_id].evictions += 1
+            evicted.append(context)
+        return evicted
+
+    def evict(self, tenant_id):
+        """Unload a tenant; returns whether it was loaded"""
+        with self._lock:
+            context = self._loaded.get(tenant_id)
+            if context is None or context.pinned:
+                return False
+            del self._loaded[tenant_id]
+            self._stats[tenant_id].evictions += 1
+            closable = self._retire(context)
+        if closable is not None:
+            closable.close()
+        return True
+
+    def memory_bytes(self):
+        return sum(context.memory_bytes for context in self._loaded.values())
+
+    def stats(self):
+        with self._lock:
+            tenants = {}
+            for tenant_id in self.known_tenants():
+                context = self._loaded.get(tenant_id)
+                stats = self._stats.get(tenant_id, TenantStats())
+                tenants[tenant_id] = dict(
+                    stats.to_dict(),
+                    loaded=context is not None,
+                    loading=tenant_id in self._loading,
+                    pinned=context.pinned if context is not None else False,
+                    memory_bytes=context.memory_bytes if context is not None else 0,
+                    model_version=context.traffic.model_version if context is not None else None
+                )
+            return {
+                'memory_budget_bytes': self.memory_budget,
+                'memory_bytes': self.memory_bytes(),
+                'loaded': list(self._loaded),
+                'tenants': tenants
+            }
+
+    def close(self):
+        with self._lock:
+            contexts = [c for c in self._loaded.values() if not c.pinned and self._retire(c) is not None]
+            self._loaded = OrderedDict((k, c) for k, c in self._loaded.items() if c.pinned)
+        for context in contexts:
+            context.close()
+        self._executor.shutdown(wait=False)
+
+
+class TenantMiddleware:
+    """
+    ASGI middleware routing ``/api/tenants/<tenant>/<route>`` to ``/api/<route>``
+    and recording the tenant in the scope. Requests without the prefix are
+    resolved from the ``X-Tenant-ID`` header by ``current_tenant``.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            match = TENANT_PATH.match(scope['path'])
+            if match is not None:
+                path = '/api' + match.group(2)
+                scope = dict(scope, path=path, raw_path=path.encode(), tenant_id=match.group(1))
+        await self.app(scope, receive, send)
+
+
+def tenant_id_of(request):
+    tenant_id = request.scope.get('tenant_id')
+    if tenant_id is None:
+        tenant_id = request.headers.get(TENANT_HEADER) or DEFAULT_TENANT
+    return tenant_id
+
+
+async def current_tenant(request: Request):
+    """Dependency leasing the request's tenant until the response is sent (404 for unknown tenants)"""
+    try:
+        context = await tenant_registry.acquire(tenant_id_of(request))
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Could not load tenant: {e}")
+    try:
+        yield context
+    finally:
+        tenant_registry.release(context)
+
+
+tenant_registry = TenantRegistry.from_env()
+router = APIRouter()
+
+
+@router.get("/api/tenants")
+async def get_tenant_stats():
+    return tenant_registry.stats()
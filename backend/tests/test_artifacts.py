@@ -0,0 +1,89 @@
+import os
+import threading
+
+import pytest
+
+from ml.trafficanalysis.artifacts import CURRENT_FILE, ArtifactStore, ModelWatcher
+
+
+class Analyzer:
+    model_version = None
+
+    def swap_model(self, model, scaler, version=None):
+        self.model, self.scaler, self.model_version = model, scaler, version
+
+
+def test_publish_makes_a_complete_version_current(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    assert store.current_version() is None
+    version = store.publish({'model': 1}, {'scaler': 1}, {'test_r2': 0.9})
+    assert store.current_version() == version
+    model, scaler, metadata = store.load()
+    assert (model, scaler) == ({'model': 1}, {'scaler': 1})
+    assert metadata['version'] == version and metadata['test_r2'] == 0.9
+    assert sorted(os.listdir(tmp_path)) == sorted([version, CURRENT_FILE])
+
+
+def test_failed_publish_leaves_no_trace(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    version = store.publish({'model': 1}, {'scaler': 1})
+    with pytest.raises(Exception):
+        store.publish(lambda: None, {'scaler': 2})
+    assert store.versions() == [version]
+    assert store.current_version() == version
+    assert not [name for name in os.listdir(tmp_path) if name.startswith('.')]
+
+
+def test_versions_published_within_one_second_sort_in_publish_order(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    published = [store.publish({'model': i}, {'scaler': i}, activate=False) for i in range(8)]
+    assert store.versions() == published
+    store.activate(published[0])
+    store.prune(keep=3)
+    assert store.versions() == [published[0]] + published[-3:]
+
+def test_activate_rejects_unknown_versions(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    version = store.publish({'model': 1}, {'scaler': 1})
+    with pytest.raises(FileNotFoundError):
+        store.activate('missing')
+    assert store.current_version() == version
+
+
+def test_readers_never_see_a_mismatched_pair(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    store.publish({'model': 0}, {'scaler': 0})
+    done = threading.Event()
+    errors = []
+
+    def read():
+        while not done.is_set():
+            try:
+                model, scaler, metadata = store.load()
+                if model['model'] != scaler['scaler'] or metadata['version'] is None:
+                    errors.append((model, scaler))
+            except Exception as e:
+                errors.append(e)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    for i in range(1, 30):
+        store.publish({'model': i}, {'scaler': i})
+    done.set()
+    for reader in readers:
+        reader.join()
+    assert errors == []
+
+
+def test_watcher_swaps_in_the_current_version(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    analyzer = Analyzer()
+    watcher = ModelWatcher(analyzer, store)
+    assert not watcher.check()
+    version = store.publish({'model': 1}, {'scaler': 1})
+    assert watcher.check()
+    assert analyzer.model_version == version and analyzer.model == {'model': 1}
+    assert not watcher.check()
+    store.publish({'model': 2}, {'scaler': 2}, activate=False)
+    assert not watcher.check()
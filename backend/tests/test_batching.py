@@ -0,0 +1,38 @@
+import asyncio
+
+import numpy as np
+
+from ml.trafficanalysis.batching import MicroBatcher
+from ml.trafficanalysis.trafficanalysis import FEATURE_COLUMNS
+
+
+class FakeAnalyzer:
+    def __init__(self):
+        self.batches = []
+
+    def predict_intervals(self, rows):
+        self.batches.append(len(rows))
+        mean = rows[:, 0]
+        return {'mean': mean, 'lower': mean - 1, 'upper': mean + 1, 'std': np.ones(len(rows))}
+
+
+def features(value):
+    return dict.fromkeys(FEATURE_COLUMNS, value)
+
+
+def test_requests_in_a_forming_batch_are_answered_at_stop():
+    analyzer = FakeAnalyzer()
+    # A long wait keeps the collector holding a partly formed batch when stop cancels it
+    batcher = MicroBatcher(workers=0, max_batch_size=64, max_wait_ms=60_000, analyzer=analyzer)
+
+    async def run():
+        await batcher.start()
+        requests = [asyncio.ensure_future(batcher.predict(features(i))) for i in range(3)]
+        await asyncio.sleep(0.01)
+        await batcher.stop()
+        return await asyncio.wait_for(asyncio.gather(*requests), 1)
+
+    results = asyncio.run(run())
+    assert [mean for mean, _ in results] == [0.0, 1.0, 2.0]
+    assert results[2][1] == {'lower': 1.0, 'upper': 3.0, 'std': 1.0}
+    assert analyzer.batches == [3]
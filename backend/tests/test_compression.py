@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from ml.trafficanalysis.compression import CompressedForest, split_holdout
+
+
+@pytest.fixture(scope='module')
+def forest():
+    rng = np.random.default_rng(0)
+    raw = np.column_stack([rng.integers(0, 24, 2000), rng.integers(1, 8, 2000), rng.integers(50, 500, 2000),
+                           rng.integers(1, 5, 2000), rng.integers(1, 5, 2000)]).astype(np.float64)
+    mean, scale = raw.mean(axis=0), raw.std(axis=0)
+    y = raw[:, 2] / 500 + rng.normal(0, 0.05, len(raw))
+    model = RandomForestRegressor(n_estimators=10, random_state=0).fit((raw - mean) / scale, y)
+    return model, CompressedForest(model.estimators_, mean, scale), raw[:300], mean, scale
+
+
+def tree_outputs(model, X):
+    return np.array([estimator.predict(X) for estimator in model.estimators_]).astype(np.float32)
+
+
+def test_integer_rows_route_like_the_original_trees(forest):
+    model, compressed, raw, mean, scale = forest
+    X = (raw - mean) / scale
+    np.testing.assert_array_equal(compressed.tree_predictions(X), tree_outputs(model, X))
+
+
+def test_non_integer_rows_are_not_rounded(forest):
+    model, compressed, raw, mean, scale = forest
+    raw = raw.copy()
+    raw[:, 2] *= 1.137
+    X = (raw - mean) / scale
+    np.testing.assert_array_equal(compressed.tree_predictions(X), tree_outputs(model, X))
+
+
+def test_holdout_halves_are_disjoint_and_cover_it():
+    holdout = np.arange(0, 1001, 5)
+    selection, evaluation = split_holdout(holdout)
+    assert not set(selection) & set(evaluation)
+    assert sorted(np.concatenate([selection, evaluation])) == list(holdout)
+    assert abs(len(selection) - len(evaluation)) <= 1
@@ -0,0 +1,108 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ml.featurestore.store import FeatureStore
+from ml.trafficanalysis.create_traffic_dataset import create_synthetic_traffic_data
+from ml.trafficanalysis.cube import COUNT, VEHICLE_SUM, CongestionCube
+
+
+@pytest.fixture
+def traffic(tmp_path):
+    path = tmp_path / 'traffic_data.csv'
+    create_synthetic_traffic_data(num_samples=2000).to_csv(path, index=False)
+    return path
+
+
+@pytest.fixture(params=[True, False], ids=['shared', 'process'])
+def cube(request, traffic, tmp_path):
+    cube = CongestionCube(str(traffic), FeatureStore(str(tmp_path / 'features')), shared=request.param)
+    yield cube
+    cube.close()
+
+
+def assert_matches_groupby(cube, data):
+    hours, volume = cube.hourly_distribution()
+    expected = data.groupby('time_of_day')['vehicle_count'].mean()
+    np.testing.assert_array_equal(hours, expected.index)
+    np.testing.assert_allclose(volume, expected.to_numpy())
+
+    days, means = cube.daily_distribution()
+    expected = data.groupby('day_of_week')['vehicle_count'].mean()
+    np.testing.assert_array_equal(days, expected.index)
+    np.testing.assert_allclose(means, expected.to_numpy())
+
+    days, hours, mean, std = cube.slot_congestion()
+    expected = data.groupby(['day_of_week', 'time_of_day'])['congestion_level'].agg(['mean', 'std', 'count'])
+    np.testing.assert_array_equal(days + 1, expected.index.get_level_values(0))
+    np.testing.assert_array_equal(hours, expected.index.get_level_values(1))
+    np.testing.assert_allclose(mean, expected['mean'].to_numpy())
+    population_std = expected['std'].fillna(0) * np.sqrt((expected['count'] - 1) / expected['count'])
+    np.testing.assert_allclose(std, population_std.to_numpy(), atol=1e-6)
+
+
+def test_cube_matches_groupby(cube, traffic):
+    assert_matches_groupby(cube, pd.read_csv(traffic))
+
+
+def test_appended_rows_are_added_and_partial_lines_wait(cube, traffic):
+    cube.hourly_distribution()
+    extra = create_synthetic_traffic_data(num_samples=300).sample(frac=1, random_state=1)
+    text = extra.to_csv(index=False, header=False)
+    cut = text.index('\n', len(text) // 2) + 5
+    with open(traffic, 'a') as f:
+        f.write(text[:cut])
+    complete = text[:text.rindex('\n', 0, cut) + 1].count('\n')
+    data = pd.concat([pd.read_csv(traffic, nrows=2000), extra.iloc[:complete]])
+    assert_matches_groupby(cube, data)
+
+    with open(traffic, 'a') as f:
+        f.write(text[cut:])
+    assert_matches_groupby(cube, pd.read_csv(traffic))
+
+
+def test_rewritten_file_is_rebuilt(cube, traffic):
+    cube.hourly_distribution()
+    create_synthetic_traffic_data(num_samples=500).iloc[::-1].to_csv(traffic, index=False)
+    assert_matches_groupby(cube, pd.read_csv(traffic))
+
+
+def test_second_process_view_attaches_to_the_same_block(traffic, tmp_path):
+    first = CongestionCube(str(traffic), FeatureStore(str(tmp_path / 'features')))
+    second = CongestionCube(str(traffic), FeatureStore(str(tmp_path / 'features')))
+    try:
+        first.refresh()
+        assert first.owner and not second.owner
+        assert second.ready and not second.refresh()
+        np.testing.assert_array_equal(second.snapshot(), first.snapshot())
+    finally:
+        second.close()
+        first.close()
+
+
+def test_snapshots_are_never_torn(cube, traffic):
+    data = pd.read_csv(traffic)
+    data['vehicle_count'] = 5
+    data.to_csv(traffic, index=False)
+    cube.refresh()
+    rows = data.head(50).to_csv(index=False, header=False)
+    done = threading.Event()
+
+    def append():
+        for _ in range(100):
+            with open(traffic, 'a') as f:
+                f.write(rows)
+            cube.refresh()
+        done.set()
+
+    writer = threading.Thread(target=append)
+    writer.start()
+    snapshots = 0
+    while not done.is_set() or snapshots == 0:
+        snapshot = cube.snapshot()
+        np.testing.assert_array_equal(snapshot[..., VEHICLE_SUM], 5 * snapshot[..., COUNT])
+        snapshots += 1
+    writer.join()
+    assert cube.snapshot()[..., COUNT].sum() == len(data) + 100 * 50
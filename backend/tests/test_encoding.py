@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ml.featurestore.encoding import CategoricalEncoder, encode_chunks
+from ml.newpredection.dataset import preprocess_data
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({
+        'hour': rng.integers(0, 24, 200),
+        'day_of_week': rng.integers(1, 8, 200),
+        'weather_condition': rng.choice(['clear', 'rain', 'snow'], 200),
+        'traffic_flow': rng.integers(100, 1000, 200)
+    })
+    frame.loc[3, 'hour'] = 123456789
+    return frame
+
+
+def reference(data):
+    encoded = pd.get_dummies(data.ffill(), drop_first=True)
+    return encoded.drop('traffic_flow', axis=1), encoded['traffic_flow']
+
+
+def test_onehot_matches_get_dummies(data):
+    X, y = preprocess_data(data.copy(), 'traffic_flow')
+    X_ref, y_ref = reference(data.copy())
+    pd.testing.assert_frame_equal(X, X_ref)
+    pd.testing.assert_series_equal(y, y_ref)
+    assert X.loc[3, 'hour'] == 123456789
+
+
+def test_chunked_input_matches_whole_frame(data):
+    X, y = preprocess_data(data.copy(), 'traffic_flow')
+    chunks = [data.iloc[i:i + 37].copy() for i in range(0, len(data), 37)]
+    X_chunks, y_chunks = preprocess_data(iter(chunks), 'traffic_flow')
+    pd.testing.assert_frame_equal(X_chunks, X)
+    pd.testing.assert_series_equal(y_chunks, y)
+
+
+def test_encoder_round_trip(data):
+    X, _, encoder = preprocess_data(data.copy(), 'traffic_flow', return_encoder=True)
+    restored = CategoricalEncoder.from_dict(encoder.to_dict())
+    X_restored, _ = preprocess_data(data.copy(), 'traffic_flow', encoder=restored)
+    pd.testing.assert_frame_equal(X_restored, X)
+
+
+def test_codes_and_sparse_agree_with_onehot(data):
+    X, _ = preprocess_data(data.copy(), 'traffic_flow')
+    X_codes, _ = preprocess_data(data.copy(), 'traffic_flow', encoding='codes')
+    X_sparse, _ = preprocess_data(data.copy(), 'traffic_flow', encoding='sparse')
+    assert X_codes['hour'].dtype == np.int64
+    np.testing.assert_array_equal(X_sparse.toarray(), X.to_numpy(dtype=np.float64))
+
+
+def test_store_path_stays_float32(data):
+    encoder = CategoricalEncoder(['weather_condition'], drop_first=True)
+    numeric, codes, y = encode_chunks([data.copy()], encoder, ['hour', 'day_of_week'], target='traffic_flow')
+    assert numeric.dtype == np.float32 and y.dtype == np.float64
+    assert codes.shape == (len(data), 1)
@@ -0,0 +1,86 @@
+import asyncio
+import csv
+
+import pytest
+
+from ml.persistence import WriteBehindLog
+
+COLUMNS = ['timestamp', 'carbon_footprint', 'green_space_coverage']
+
+
+def read_rows(path):
+    with open(path, newline='') as f:
+        return list(csv.reader(f))
+
+
+def row(i):
+    return {'timestamp': f't{i}', 'carbon_footprint': i, 'green_space_coverage': i / 10}
+
+
+def test_synchronous_appends_create_the_file_with_its_header(tmp_path):
+    log = WriteBehindLog(str(tmp_path / 'metrics.csv'), COLUMNS)
+    log.append(row(1))
+    log.append(row(2))
+    assert read_rows(log.path) == [COLUMNS, ['t1', '1', '0.1'], ['t2', '2', '0.2']]
+    assert log.commits == 2 and log.fsyncs == 2
+
+
+def test_torn_last_line_is_cut_before_the_next_commit(tmp_path):
+    path = tmp_path / 'metrics.csv'
+    path.write_text('timestamp,carbon_footprint,green_space_coverage\nt0,0,0.0\nt1,1,')
+    log = WriteBehindLog(str(path), COLUMNS)
+    log.append(row(2))
+    assert read_rows(path) == [COLUMNS, ['t0', '0', '0.0'], ['t2', '2', '0.2']]
+    assert log.repaired_bytes == len('t1,1,')
+
+
+def test_header_without_newline_is_completed(tmp_path):
+    path = tmp_path / 'metrics.csv'
+    path.write_text('timestamp,carbon_footprint,green_space_coverage')
+    log = WriteBehindLog(str(path), COLUMNS)
+    log.append(row(1))
+    assert read_rows(path) == [COLUMNS, ['t1', '1', '0.1']]
+    assert log.repaired_bytes == 0
+
+
+def test_rows_follow_the_files_column_order(tmp_path):
+    path = tmp_path / 'metrics.csv'
+    path.write_text('green_space_coverage,timestamp\n')
+    WriteBehindLog(str(path), COLUMNS).append(row(1))
+    assert read_rows(path) == [['green_space_coverage', 'timestamp'], ['0.1', 't1']]
+
+
+def test_concurrent_appends_are_group_committed(tmp_path):
+    log = WriteBehindLog(str(tmp_path / 'metrics.csv'), COLUMNS, commit_interval_ms=20)
+
+    async def requests():
+        async def handle(i):
+            await asyncio.sleep(0)
+            log.append(row(i))
+        await asyncio.gather(*(handle(i) for i in range(200)))
+        await log.flush()
+
+    asyncio.run(requests())
+    log.close()
+    rows = read_rows(log.path)
+    assert rows[0] == COLUMNS
+    assert sorted(r[0] for r in rows[1:]) == sorted(f't{i}' for i in range(200))
+    assert log.rows == 200 and log.commits < 10
+
+
+def test_close_commits_rows_still_queued(tmp_path):
+    log = WriteBehindLog(str(tmp_path / 'metrics.csv'), COLUMNS, commit_interval_ms=10_000)
+
+    async def requests():
+        for i in range(5):
+            log.append(row(i))
+        await asyncio.sleep(0)
+
+    asyncio.run(requests())
+    log.close()
+    assert len(read_rows(log.path)) == 6
+
+
+def test_unknown_fsync_policy_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        WriteBehindLog(str(tmp_path / 'metrics.csv'), COLUMNS, fsync='sometimes')
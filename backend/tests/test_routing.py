@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from scipy import sparse
+from scipy.sparse import csgraph
+
+from ml.roadnetwork.graph import RoadGraph
+from ml.roadnetwork.routing import RoutePlanner
+
+
+class FixedCongestion:
+    """Random per-segment congestion per bucket, in place of SegmentCongestion"""
+
+    class analyzer:
+        model_version = 'test'
+
+    def __init__(self, n_edges):
+        self.n_edges = n_edges
+
+    def levels(self, time_of_day, day_of_week, weather_condition):
+        rng = np.random.default_rng(time_of_day * 100 + day_of_week * 10 + weather_condition)
+        return rng.uniform(0, 1, self.n_edges)
+
+
+@pytest.fixture(scope='module')
+def planner():
+    rng = np.random.default_rng(7)
+    n_nodes, n_edges = 300, 1200
+    node_ids = np.arange(1000, 1000 + n_nodes)
+    sources = rng.choice(node_ids, n_edges)
+    targets = rng.choice(node_ids, n_edges)
+    # Nodes 0-9 have no incoming edges, so some pairs are unreachable
+    targets = np.where(np.isin(targets, node_ids[:10]), node_ids[10], targets)
+    graph = RoadGraph(node_ids, rng.uniform(0, 1, n_nodes), rng.uniform(0, 1, n_nodes), sources, targets,
+                      np.arange(n_edges), {'length_m': rng.uniform(50, 2000, n_edges),
+                                           'speed_kmh': rng.choice([30, 50, 80], n_edges)})
+    return RoutePlanner(graph, FixedCongestion(graph.n_edges), n_landmarks=4)
+
+
+def dijkstra(planner, origin, bucket):
+    graph = planner.graph
+    weights = np.frombuffer(planner.edge_weights(*bucket)[0], dtype=np.float64)
+    order = np.lexsort((weights, graph.targets, graph.sources))
+    src, dst, cost = graph.sources[order], graph.targets[order], weights[order]
+    first = np.ones(src.size, dtype=bool)
+    first[1:] = (src[1:] != src[:-1]) | (dst[1:] != dst[:-1])
+    matrix = sparse.csr_matrix((cost[first], (src[first], dst[first])), shape=(graph.n_nodes, graph.n_nodes))
+    return csgraph.dijkstra(matrix, directed=True, indices=origin)
+
+
+@pytest.mark.parametrize('bucket', [(8, 2, 1), (17, 5, 3)])
+def test_alt_matches_dijkstra(planner, bucket):
+    graph = planner.graph
+    weights = np.frombuffer(planner.edge_weights(*bucket)[0], dtype=np.float64)
+    position = {edge_id: i for i, edge_id in enumerate(graph.edge_ids)}
+    rng = np.random.default_rng(bucket[0])
+    for origin in rng.choice(graph.n_nodes, 10, replace=False):
+        expected = dijkstra(planner, origin, bucket)
+        for destination in rng.choice(graph.n_nodes, 20, replace=False):
+            result = planner.route(graph.node_ids[origin], graph.node_ids[destination], *bucket)
+            if not np.isfinite(expected[destination]):
+                assert result is None
+                continue
+            assert result['travel_time_s'] == pytest.approx(expected[destination], rel=1e-9, abs=1e-9)
+            edges = [position[edge_id] for edge_id in result['edges']]
+            assert weights[edges].sum() == pytest.approx(result['travel_time_s'])
+            assert result['nodes'][0] == graph.node_ids[origin]
+            assert result['nodes'][-1] == graph.node_ids[destination]
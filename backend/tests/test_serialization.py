@@ -0,0 +1,89 @@
+import gzip
+import io
+import json
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import serialization
+from serialization import (FLOAT32_MEDIA_TYPE, JSON_MEDIA_TYPE, NPY_MEDIA_TYPE, binary_response, columnar_response,
+                           json_response, negotiate, read_float32_frames)
+
+
+def request(**headers):
+    return Request({'type': 'http', 'headers': [(name.replace('_', '-').encode(), value.encode())
+                                                for name, value in headers.items()]})
+
+
+@pytest.mark.parametrize('accept, expected', [
+    ('', JSON_MEDIA_TYPE),
+    ('*/*', JSON_MEDIA_TYPE),
+    ('application/*', JSON_MEDIA_TYPE),
+    ('application/x-npy', NPY_MEDIA_TYPE),
+    ('application/x-npy;q=0.5, application/x-float32', FLOAT32_MEDIA_TYPE),
+    ('application/x-float32, application/x-npy', FLOAT32_MEDIA_TYPE),
+    ('text/html, application/x-npy;q=0.1', NPY_MEDIA_TYPE),
+    ('application/x-npy;q=0, */*;q=0.1', JSON_MEDIA_TYPE),
+])
+def test_negotiate(accept, expected):
+    assert negotiate(request(accept=accept)) == expected
+
+
+def test_negotiate_rejects_unavailable_types():
+    with pytest.raises(HTTPException) as excinfo:
+        negotiate(request(accept='text/html, application/x-npy;q=0'))
+    assert excinfo.value.status_code == 406
+
+
+def test_arrow_is_offered_only_with_pyarrow():
+    accept = request(accept='application/vnd.apache.arrow.stream')
+    if serialization.pa is None:
+        with pytest.raises(HTTPException):
+            negotiate(accept)
+    else:
+        assert negotiate(accept) == serialization.ARROW_MEDIA_TYPE
+
+
+COLUMNS = {'hour': np.arange(24), 'volume': np.linspace(0, 1, 24), 'label': [f'h{i}' for i in range(24)]}
+
+
+def test_npy_round_trip():
+    response = binary_response(COLUMNS, NPY_MEDIA_TYPE)
+    record = np.load(io.BytesIO(response.body), allow_pickle=False)
+    np.testing.assert_array_equal(record['hour'], COLUMNS['hour'])
+    np.testing.assert_array_equal(record['volume'], COLUMNS['volume'])
+    assert record['label'].tolist() == COLUMNS['label']
+    assert response.headers['vary'] == 'Accept'
+
+
+def test_float32_frames_carry_numeric_columns_only():
+    decoded = read_float32_frames(binary_response(COLUMNS, FLOAT32_MEDIA_TYPE).body)
+    assert list(decoded) == ['hour', 'volume']
+    np.testing.assert_array_equal(decoded['volume'], COLUMNS['volume'].astype(np.float32))
+
+
+def test_json_layouts():
+    numeric = {'hour': COLUMNS['hour'], 'volume': COLUMNS['volume']}
+    by_rows = json.loads(columnar_response(numeric, request(), JSON_MEDIA_TYPE).body)
+    by_columns = json.loads(columnar_response(numeric, request(), JSON_MEDIA_TYPE, layout='columns').body)
+    assert by_rows[3] == {'hour': 3, 'volume': COLUMNS['volume'][3]}
+    assert by_columns['hour'] == list(range(24))
+
+
+def test_large_json_is_compressed_when_accepted():
+    content = {'values': np.arange(20000)}
+    plain = json_response(content, request())
+    assert 'content-encoding' not in plain.headers
+    compressed = json_response(content, request(accept_encoding='gzip, br;q=0'))
+    assert compressed.headers['content-encoding'] == 'gzip'
+    assert gzip.decompress(compressed.body) == plain.body
+    assert 'Accept-Encoding' in compressed.headers['vary']
+
+
+def test_non_finite_floats_are_written_as_null():
+    content = {'mean': float('nan'), 'values': np.array([1.5, np.inf, np.nan]), 'std': np.float64(-np.inf),
+               'rows': [{'level': float('inf')}], 'hours': np.arange(2)}
+    assert json.loads(serialization.dumps(content)) == {
+        'mean': None, 'values': [1.5, None, None], 'std': None, 'rows': [{'level': None}], 'hours': [0, 1]}
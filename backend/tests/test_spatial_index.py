@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from ml.urban_analysis.spatial_index import STRTree
+
+
+def random_boxes(rng, n):
+    corner = rng.uniform(0, 1000, (n, 2))
+    size = rng.uniform(0, 25, (n, 2))
+    return np.column_stack([corner, corner + size])
+
+
+@pytest.mark.parametrize('n, capacity', [(0, 16), (5, 16), (16, 16), (17, 16), (3000, 16), (3000, 4)])
+def test_bbox_query_matches_brute_force(n, capacity):
+    rng = np.random.default_rng(n + capacity)
+    boxes = random_boxes(rng, n)
+    tree = STRTree(boxes, capacity)
+    assert len(tree) == n
+    for _ in range(50):
+        x0, y0 = rng.uniform(-50, 1000, 2)
+        x1, y1 = x0 + rng.uniform(0, 300), y0 + rng.uniform(0, 300)
+        expected = np.flatnonzero((boxes[:, 0] <= x1) & (boxes[:, 2] >= x0) &
+                                  (boxes[:, 1] <= y1) & (boxes[:, 3] >= y0)) if n else []
+        np.testing.assert_array_equal(np.sort(tree.query_bbox(x0, y0, x1, y1)), expected)
+
+
+@pytest.mark.parametrize('n, capacity', [(5, 16), (3000, 16), (3000, 4)])
+def test_radius_query_matches_brute_force(n, capacity):
+    rng = np.random.default_rng(n * capacity)
+    boxes = random_boxes(rng, n)
+    tree = STRTree(boxes, capacity)
+    for _ in range(50):
+        x, y = rng.uniform(0, 1000, 2)
+        radius = rng.uniform(0, 150)
+        dx = np.maximum(np.maximum(boxes[:, 0] - x, x - boxes[:, 2]), 0)
+        dy = np.maximum(np.maximum(boxes[:, 1] - y, y - boxes[:, 3]), 0)
+        expected = np.flatnonzero(dx * dx + dy * dy <= radius * radius)
+        np.testing.assert_array_equal(np.sort(tree.query_radius(x, y, radius)), expected)
@@ -0,0 +1,66 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from tenancy import TenantContext, TenantRegistry
+
+
+class FakeContext:
+    def __init__(self, tenant_id, memory_bytes=100):
+        self.tenant_id = tenant_id
+        self.memory_bytes = memory_bytes
+        self.traffic = SimpleNamespace(model_version=None)
+        self.pinned = False
+        self.leases = 0
+        self.retired = False
+        self.closed = 0
+
+    def close(self):
+        self.closed += 1
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    for tenant_id in ('north', 'south'):
+        (tmp_path / tenant_id).mkdir()
+    monkeypatch.setattr(TenantContext, 'load', classmethod(lambda cls, tenant_id, path, watch: FakeContext(tenant_id)))
+    registry = TenantRegistry(root=str(tmp_path), memory_budget=150)
+    yield registry
+    registry.close()
+
+
+def test_evicted_context_stays_open_until_its_last_lease_is_released(registry):
+    north = registry.get('north')
+    again = registry.get('north')
+    assert again is north and north.leases == 2
+
+    # Loading south goes over the budget and evicts north while it is leased
+    south = registry.get('south')
+    assert registry.stats()['loaded'] == ['south']
+    assert north.retired and north.closed == 0
+
+    registry.release(north)
+    assert north.closed == 0
+    registry.release(again)
+    registry._executor.shutdown(wait=True)
+    assert north.closed == 1 and south.closed == 0
+
+
+def test_unleased_context_is_closed_on_eviction(registry):
+    north = registry.get('north')
+    registry.release(north)
+    assert registry.evict('north')
+    assert north.closed == 1
+
+
+def test_acquire_reloads_a_tenant_evicted_before_it_was_leased(registry):
+    first = registry.get('north')
+    registry.release(first)
+    registry.evict('north')
+
+    async def acquire():
+        return await registry.acquire('north')
+
+    second = asyncio.run(acquire())
+    assert second is not first and second.leases == 1 and not second.retired